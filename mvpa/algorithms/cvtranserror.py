@@ -17,9 +17,11 @@ from mvpa.support.copy import deepcopy
 from mvpa.measures.base import DatasetMeasure
 from mvpa.datasets.base import Dataset
 from mvpa.datasets.splitters import NoneSplitter
-from mvpa.base import warning
+from mvpa.base import warning, externals
 from mvpa.misc.state import StateVariable, Harvestable
 from mvpa.misc.transformers import grand_mean
+from mvpa.misc.parallel import get_nproc, map_workers, random_key, reseed
+from mvpa.kernels.base import precompute_kernels
 
 if __debug__:
     from mvpa.base import debug
@@ -60,6 +62,8 @@ class CrossValidatedTransferError(DatasetMeasure, Harvestable):
                  harvest_attribs=None,
                  copy_attribs='copy',
                  samples_idattr='origids',
+                 nproc=1,
+                 backend='native',
                  **kwargs):
         """
         Parameters
@@ -81,12 +85,38 @@ class CrossValidatedTransferError(DatasetMeasure, Harvestable):
           testdataset for RFE to determine stopping point).
         harvest_attribs : list of str
           What attributes of call to store and return within
-          harvested state variable
+          harvested state variable.  They are looked up after each fold
+          among `self`, `ca`, `dataset`, `clf`, `split`, `splitinfo`,
+          `lastsplit`, `transerror` and `result`, where `clf` is the
+          classifier of the `transerror` used for the fold, and
+          `splitinfo` lists the summaries of all folds up to the current
+          one.  Results of the previous folds (`results`) are not
+          available.
         copy_attribs : None or str, optional
           Force copying values of attributes on harvesting
         samples_idattr : str, optional
           What samples attribute to use to identify and store samples_errors
           state variable
+        nproc : None or int
+          How many processes to use for training and testing on the
+          cross-validation folds.  If None, all available CPU cores are
+          used.  All folds except the last one are processed by forked
+          worker processes, while the last one is processed with the
+          original `transerror`, hence its state after the
+          cross-validation is the same as with a serial run.  NumPy's
+          random number generator is seeded for each fold (serial runs
+          included) from its state at the beginning of the
+          cross-validation, so stochastic classifiers yield the same
+          results regardless of `nproc`.  Results,
+          confusion matrices, samples errors and harvested attributes are
+          merged in the order of the folds.  Note that all splits are
+          generated upfront, and that values harvested in the workers
+          have to be picklable (as do the `transerror` copies if the
+          `transerrors` state is enabled).
+        backend : {'native', 'pprocess'}
+          Way to run multiple processes. 'native' relies on the
+          `multiprocessing` module, whereas 'pprocess' requires the
+          `pprocess` external module.
         **kwargs
           All additional arguments are passed to the
           :class:`~mvpa.measures.base.DatasetMeasure` base class.
@@ -103,6 +133,20 @@ class CrossValidatedTransferError(DatasetMeasure, Harvestable):
         self.__expose_testdataset = expose_testdataset
         self.__samples_idattr = samples_idattr
 
+        if not backend in ('native', 'pprocess'):
+            raise ValueError("Unknown backend '%s' for multiprocess "
+                             "cross-validation" % backend)
+        if backend == 'pprocess' and nproc != 1 \
+               and not externals.exists('pprocess'):
+            raise RuntimeError("The 'pprocess' module is required for "
+                               "multiprocess cross-validation with the "
+                               "'pprocess' backend. Please either install "
+                               "python-pprocess, use the 'native' backend, "
+                               "or reduce `nproc` to 1 (got nproc=%s)"
+                               % nproc)
+        self.__nproc = nproc
+        self.__backend = backend
+
 # TODO: put back in ASAP
 #    def __repr__(self):
 #        """String summary over the object
@@ -128,7 +172,6 @@ class CrossValidatedTransferError(DatasetMeasure, Harvestable):
         # local bindings
         ca = self.ca
         clf = self.__transerror.clf
-        expose_testdataset = self.__expose_testdataset
 
         # what ca to enable in terr
         terr_enable = []
@@ -138,7 +181,6 @@ class CrossValidatedTransferError(DatasetMeasure, Harvestable):
 
         # charge ca with initial values
         summaryClass = clf.__summary_class__
-        clf_hastestdataset = hasattr(clf, 'testdataset')
 
         self.ca.confusion = summaryClass()
         self.ca.training_confusion = summaryClass()
@@ -160,74 +202,81 @@ class CrossValidatedTransferError(DatasetMeasure, Harvestable):
         if ca.is_enabled("transerrors"):
             self.__transerror.untrain()
 
+        # cached kernels get computed for all samples once, so all folds
+        # are served from the same kernel matrix (after untraining, which
+        # releases precomputed samples)
+        dataset = precompute_kernels([self.__transerror], [dataset])[0]
+
         # collect sum info about the split that where made for the resulting
         # dataset
         splitinfo = []
 
+        nproc = self.__nproc
+        if nproc is None:
+            if self.__backend == 'pprocess':
+                import pprocess
+                nproc = pprocess.get_number_of_cores() or 1
+            else:
+                nproc = get_nproc()
+
+        # folds get seeded from the same state, serial and in parallel
+        key = random_key()
+        if nproc > 1:
+            splits = list(self.__splitter(dataset))
+            folds = self._proc_folds(dataset, splits, terr_enable, nproc,
+                                     key)
+        else:
+            splits = self.__splitter(dataset)
+            folds = None
+
         # splitter
-        for split in self.__splitter(dataset):
-            splitinfo.append(
-                "%s->%s"
-                % (','.join([str(c)
-                    for c in split[0].sa[self.__splitter.splitattr].unique]),
-                   ','.join([str(c)
-                    for c in split[1].sa[self.__splitter.splitattr].unique])))
+        for isplit, split in enumerate(splits):
+            splitinfo.append(self._get_splitinfo(split))
 
             # only train classifier if splitter provides something in first
             # element of tuple -- the is the behavior of TransferError
             if ca.is_enabled("splits"):
                 self.ca.splits.append(split)
 
-            if ca.is_enabled("transerrors"):
-                # copy first and then train, as some classifiers cannot be copied
-                # when already trained, e.g. SWIG'ed stuff
-                lastsplit = None
-                for ds in split:
-                    if ds is not None:
-                        lastsplit = ds.a.lastsplit
-                        break
-                if lastsplit:
-                    # only if we could deduce that it was last split
-                    # use the 'mother' transerror
-                    transerror = self.__transerror
-                else:
-                    # otherwise -- deep copy
-                    transerror = deepcopy(self.__transerror)
+            if folds is not None:
+                # fold was already processed -- just merge the results
+                result, transerror = self._merge_fold(folds[isplit])
             else:
-                transerror = self.__transerror
-
-            # assign testing dataset if given classifier can digest it
-            if clf_hastestdataset and expose_testdataset:
-                transerror.clf.testdataset = split[1]
+                if ca.is_enabled("transerrors"):
+                    # copy first and then train, as some classifiers cannot
+                    # be copied when already trained, e.g. SWIG'ed stuff
+                    if self._is_lastsplit(split):
+                        # only if we could deduce that it was last split
+                        # use the 'mother' transerror
+                        transerror = self.__transerror
+                    else:
+                        # otherwise -- deep copy
+                        transerror = deepcopy(self.__transerror)
+                else:
+                    transerror = self.__transerror
 
-            # run the beast
-            result = transerror(split[1], split[0])
+                result = self._proc_fold(
+                    split, transerror, isplit, key,
+                    dict(dataset=dataset, splitinfo=splitinfo))
 
-            # unbind the testdataset from the classifier
-            if clf_hastestdataset and expose_testdataset:
-                transerror.clf.testdataset = None
+                # XXX: could be merged with next for loop using a utility
+                # class that can add dict elements into a list
+                if ca.is_enabled("samples_error"):
+                    for k, v in \
+                      transerror.ca.samples_error.iteritems():
+                        self.ca.samples_error[k].append(v)
 
-            # next line is important for 'self._harvest' call
-            self._harvest(locals())
+                # pull in child ca
+                for state_var in ['confusion', 'training_confusion']:
+                    if ca.is_enabled(state_var):
+                        ca[state_var].value.__iadd__(
+                            transerror.ca[state_var].value)
 
             # XXX Look below -- may be we should have not auto added .?
             #     then transerrors also could be deprecated
             if ca.is_enabled("transerrors"):
                 self.ca.transerrors.append(transerror)
 
-            # XXX: could be merged with next for loop using a utility class
-            # that can add dict elements into a list
-            if ca.is_enabled("samples_error"):
-                for k, v in \
-                  transerror.ca.samples_error.iteritems():
-                    self.ca.samples_error[k].append(v)
-
-            # pull in child ca
-            for state_var in ['confusion', 'training_confusion']:
-                if ca.is_enabled(state_var):
-                    ca[state_var].value.__iadd__(
-                        transerror.ca[state_var].value)
-
             if __debug__:
                 debug("CROSSC", "Split #%d: result %s" \
                       % (len(results), `result`))
@@ -246,6 +295,184 @@ class CrossValidatedTransferError(DatasetMeasure, Harvestable):
         return results
 
 
+    def _call_batched(self, dataset, neighborhoods):
+        """Cross-validate on many subsets of features at once.
+
+        Only supported if the `TransferError` can compute the errors of
+        all subsets in one go (see `TransferError.call_batched()`), and
+        no state variable or harvesting requires to process each subset
+        separately.  The results are identical to horizontally stacking
+        the results of cross-validating on each subset.
+        """
+        ca = self.ca
+        for state_var in ['results', 'splits', 'transerrors', 'confusion',
+                          'training_confusion', 'samples_error', 'harvested']:
+            if ca.is_enabled(state_var):
+                return None
+        if self.__expose_testdataset:
+            return None
+
+        results = []
+        splitinfo = []
+        for split in self.__splitter(dataset):
+            errors = self.__transerror.call_batched(split[1], split[0],
+                                                    neighborhoods)
+            if errors is None:
+                return None
+            if __debug__:
+                debug("CROSSC", "Split #%d: results of %d subsets"
+                      % (len(results), len(errors)))
+            splitinfo.append(self._get_splitinfo(split))
+            results.append(errors)
+
+        return Dataset(np.array(results), sa={'cv_fold': splitinfo})
+
+
+    def _get_splitinfo(self, split):
+        """Summary of the split, e.g. '0,1->2'"""
+        splitattr = self.__splitter.splitattr
+        return "%s->%s" \
+               % (','.join([str(c) for c in split[0].sa[splitattr].unique]),
+                  ','.join([str(c) for c in split[1].sa[splitattr].unique]))
+
+
+    @staticmethod
+    def _is_lastsplit(split):
+        """Whether the split was marked as the last one by the splitter"""
+        for ds in split:
+            if ds is not None:
+                return ds.a.lastsplit
+        return None
+
+
+    def _proc_fold(self, split, transerror, isplit, key, context):
+        """Train and test on a single split
+
+        Parameters
+        ----------
+        isplit : int
+          Index of the fold, which the random state gets seeded with.
+        key : ndarray
+          Random key to derive the seed from (see `random_key()`).
+        context : dict
+          Additional variables to harvest from.
+        """
+        clf_hastestdataset = hasattr(transerror.clf, 'testdataset')
+        expose_testdataset = self.__expose_testdataset
+
+        # assign testing dataset if given classifier can digest it
+        if clf_hastestdataset and expose_testdataset:
+            transerror.clf.testdataset = split[1]
+
+        # seed the fold, but keep the random state of the caller intact,
+        # so lazily generated splits are the same as the upfront ones
+        state = np.random.get_state()
+        reseed(isplit, key)
+        try:
+            # run the beast
+            result = transerror(split[1], split[0])
+        finally:
+            np.random.set_state(state)
+
+        # unbind the testdataset from the classifier
+        if clf_hastestdataset and expose_testdataset:
+            transerror.clf.testdataset = None
+
+        # the same namespace to harvest from for serial and parallel
+        # processing of the folds
+        context = dict(context)
+        context.update(self=self, ca=self.ca, clf=transerror.clf,
+                       split=split, lastsplit=self._is_lastsplit(split),
+                       transerror=transerror, result=result)
+        self._harvest(context)
+        return result
+
+
+    def _proc_folds(self, dataset, splits, terr_enable, nproc, key):
+        """Process all folds in multiple processes
+
+        Returns a list with the outcome of each fold, which then has to be
+        merged with `_merge_fold` in the order of the folds.
+        """
+        ca = self.ca
+        harvest = ca.is_enabled('harvested') \
+                  and len(self.harvest_attribs or [])
+        # harvested values of the folds get collected separately
+        if harvest and ca.is_set('harvested'):
+            harvested = ca.harvested
+        else:
+            harvested = None
+
+        def proc_fold(isplit):
+            split = splits[isplit]
+            transerror = self.__transerror
+            if harvest:
+                ca.harvested = dict([(a['name'], [])
+                                     for a in self.harvest_attribs])
+            splitinfo = [self._get_splitinfo(s) for s in splits[:isplit + 1]]
+            result = self._proc_fold(
+                split, transerror, isplit, key,
+                dict(dataset=dataset, splitinfo=splitinfo))
+            fold = {'result': result}
+            for state_var in terr_enable:
+                fold[state_var] = transerror.ca[state_var].value
+            if harvest:
+                fold['harvested'] = ca.harvested
+            if ca.is_enabled('transerrors') or isplit == len(splits) - 1:
+                fold['transerror'] = transerror
+            else:
+                # trained classifiers in workers are of no further use, so
+                # there is no need to send them back
+                fold['transerror'] = None
+            return fold
+
+        if __debug__:
+            debug("CROSSC", "Processing %i folds in %i processes"
+                  % (len(splits), nproc))
+
+        if self.__backend == 'native':
+            folds = map_workers(proc_fold, len(splits),
+                                nproc=nproc - 1, nlocal=1)
+        else:
+            import pprocess
+            p_folds = pprocess.Map(limit=nproc - 1)
+            compute = p_folds.manage(pprocess.MakeParallel(proc_fold))
+            for isplit in xrange(len(splits) - 1):
+                compute(isplit)
+            last = proc_fold(len(splits) - 1)
+            folds = list(p_folds) + [last]
+
+        # restore harvested values from before the folds
+        if harvest:
+            if harvested is None:
+                ca.reset('harvested')
+            else:
+                ca.harvested = harvested
+        return folds
+
+
+    def _merge_fold(self, fold):
+        """Merge outcome of a fold computed by `_proc_folds`"""
+        ca = self.ca
+        if 'harvested' in fold:
+            if not ca.is_set('harvested'):
+                ca.harvested = dict([(a['name'], [])
+                                     for a in self.harvest_attribs])
+            for k, v in fold['harvested'].iteritems():
+                ca.harvested[k] += v
+
+        if 'samples_error' in fold:
+            for k, v in fold['samples_error'].iteritems():
+                self.ca.samples_error[k].append(v)
+
+        # pull in child ca
+        for state_var in ['confusion', 'training_confusion']:
+            if state_var in fold and ca.is_enabled(state_var):
+                ca[state_var].value.__iadd__(fold[state_var])
+
+        return fold['result'], fold['transerror']
+
+
     splitter = property(fget=lambda self:self.__splitter,
                         doc="Access to the Splitter instance.")
     transerror = property(fget=lambda self:self.__transerror,
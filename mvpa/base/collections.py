@@ -13,6 +13,7 @@ dedicated containers aka. `Collections`.
 __docformat__ = 'restructuredtext'
 
 import copy
+import itertools
 import numpy as np
 from operator import isSequenceType
 
@@ -34,6 +35,9 @@ _object_setitem = dict.__setitem__
 # To validate fresh
 _dict_api = set(dict.__dict__)
 
+# Source of increasing stamps of modifications of collectables
+_next_version = itertools.count(1).next
+
 class Collectable(object):
     """Collection element.
 
@@ -55,6 +59,7 @@ class Collectable(object):
         self.__doc__ = doc
         self.__name = name
         self._value = None
+        self._version = _next_version()
         if not value is None:
             self._set(value)
         if __debug__ and __mvpadebug__:
@@ -82,6 +87,7 @@ class Collectable(object):
                   "Setting %(self)s to %(val)s ",
                   msgargs={'self':self, 'val':val})
         self._value = val
+        self._version = _next_version()
 
 
     def __str__(self):
@@ -138,6 +144,11 @@ class Collectable(object):
 
     value = property(_get_virtual, _set_virtual)
     name = property(_get_name, _set_name)
+    version = property(lambda self: self._version,
+                       doc="Stamp of the last assignment of the value. "
+                       "Stamps increase monotonically across all "
+                       "collectables, hence an unchanged stamp allows to "
+                       "skip looking at the value itself.")
 
 
 class SequenceCollectable(Collectable):
@@ -247,6 +258,10 @@ class ArrayCollectable(SequenceCollectable):
 
     When shallow-copied it includes a view of the array in the copy.
     """
+
+    _pending = None
+    """Source and slicing argument of a value which is not computed yet"""
+
     def __copy__(self):
         # preserve attribute type
         copied = self.__class__(name=self.name, doc=self.__doc__,
@@ -256,7 +271,44 @@ class ArrayCollectable(SequenceCollectable):
         return copied
 
 
+    def get_lazy_slice(self, args, length=None):
+        """Collectable of the same type holding a slice of the value.
+
+        Slicing is postponed until the value is accessed for the first
+        time.  Meanwhile the new collectable keeps a reference to the
+        current value of this one.
+
+        Parameters
+        ----------
+        args : slice, sequence of int, or boolean mask
+          Slicing argument.
+        length : int
+          Target length of the sliced value.
+        """
+        sliced = self.__class__(name=self.name, doc=self.__doc__,
+                                length=length)
+        if self._pending is None:
+            sliced._pending = (self._value, args)
+        else:
+            # chain on top of a not yet computed slice
+            sliced._pending = (self, args)
+        return sliced
+
+
+    def _get(self):
+        if self._pending is not None:
+            source, args = self._pending
+            if isinstance(source, Collectable):
+                source = source.value
+            # computing the slice does not modify the value
+            version = self._version
+            self._set(source[args])
+            self._version = version
+        return self._value
+
+
     def _set(self, val):
+        self._pending = None
         if not hasattr(val, 'view'):
             if isSequenceType(val):
                 val = np.asanyarray(val)
@@ -437,6 +489,32 @@ class UniformLengthCollection(Collection):
             v.set_length_check(value)
 
 
+    def get_lazy_slice(self, args, length):
+        """Collection of the same type with all attributes sliced.
+
+        Values of array attributes are only sliced when accessed (see
+        `ArrayCollectable.get_lazy_slice`).
+
+        Parameters
+        ----------
+        args : slice, sequence of int, or boolean mask
+          Slicing argument.
+        length : int
+          Length of the sliced attributes.
+        """
+        sliced = self.__class__(length=length)
+        for attr in self.values():
+            if isinstance(attr, ArrayCollectable):
+                newattr = attr.get_lazy_slice(args, length)
+            else:
+                newattr = attr.__class__(name=attr.name, doc=attr.__doc__,
+                                         length=length)
+                newattr.value = attr.value[args]
+            # bypass length checks which would need to compute the value
+            _object_setitem(sliced, attr.name, newattr)
+        return sliced
+
+
     def __setitem__(self, key, value):
         """Add a new IndexedCollectable to the collection
 
@@ -428,8 +428,15 @@ class AttrDataset(object):
                                              axis=0)
 
 
-    def __getitem__(self, args):
-        """
+    def _get_selection(self, args):
+        """Normalize slicing arguments and select the samples accordingly
+
+        Returns
+        -------
+        args : list
+          Selection for samples and features.
+        samples : array
+          Subset of the samples array.
         """
         # uniformize for checks below; it is not a tuple if just single slicing
         # spec is passed
@@ -465,6 +472,10 @@ class AttrDataset(object):
         if isinstance(self.samples, np.ndarray) \
            and np.any([isinstance(a, slice) for a in args]):
             samples = self.samples[args[0], args[1]]
+        elif hasattr(self.samples, 'select'):
+            # containers which can select samples and features at once
+            # (e.g. `HDF5Samples`) only read what is necessary
+            samples = self.samples.select(args[0], args[1])
         else:
             # in all other cases we have to do the selection sequentially
             #
@@ -473,6 +484,62 @@ class AttrDataset(object):
             # features subset
             if not args[1] is slice(None):
                 samples = samples[:, args[1]]
+        return args, samples
+
+
+    def get_view(self, samples=None, features=None):
+        """Lightweight selection of a subset of samples and/or features.
+
+        The selected dataset is of the same type and can be used like one
+        obtained via regular slicing (see `__getitem__`), but it is much
+        cheaper to create, since sample and feature attributes are only
+        sliced when they are accessed for the first time.  Dataset
+        attributes are shared with this dataset (without copying) until
+        they get reassigned in either one.  Hence, they must not be
+        modified in place, without copying them first.
+
+        Parameters
+        ----------
+        samples : None, slice, sequence of int, or boolean mask
+          Selection of samples.  All samples are selected if None.
+        features : None, slice, sequence of int, or boolean mask
+          Selection of features.  All features are selected if None.
+
+        Examples
+        --------
+        >>> ds = AttrDataset(np.arange(12).reshape((4, 3)),
+        ...                  sa={'targets': range(4)})
+        >>> view = ds.get_view(samples=[1, 3], features=[0, 2])
+        >>> view.samples
+        array([[ 3,  5],
+               [ 9, 11]])
+        >>> view.sa.targets
+        array([1, 3])
+        """
+        if samples is None:
+            samples = slice(None)
+        if features is None:
+            features = slice(None)
+        args, selected = self._get_selection((samples, features))
+
+        # create an empty dataset of the same type and replace its
+        # collections afterwards, so no attribute needs to be sliced or
+        # checked right away
+        view = self.__class__(selected)
+        view.sa = self.sa.get_lazy_slice(args[0], selected.shape[0])
+        view.fa = self.fa.get_lazy_slice(args[1], selected.shape[1])
+        # new collectables, but with the very same values
+        for attr in self.a.values():
+            newattr = attr.__class__(name=attr.name, doc=attr.__doc__)
+            newattr.value = attr.value
+            view.a[attr.name] = newattr
+        return view
+
+
+    def __getitem__(self, args):
+        """
+        """
+        args, samples = self._get_selection(args)
 
         # and now for the attributes -- we want to maintain the type of the
         # collections
@@ -614,7 +681,64 @@ def datasetmethod(func):
     return func
 
 
-def vstack(datasets):
+def _stack_arrays(arrays, axis, out=None):
+    """Concatenate arrays into a single preallocated output array
+
+    Parameters
+    ----------
+    arrays : sequence
+      Arrays to be concatenated.  All dimensions but the `axis` one have
+      to match.
+    axis : int
+      Axis along which the arrays are concatenated.
+    out : None or ndarray
+      Array to store the result into, e.g. a memory-mapped file.  It has to
+      have the final shape.  If None, a new array with the common dtype of
+      all input arrays is allocated.
+    """
+    shapes = [np.shape(a) for a in arrays]
+    reference = list(shapes[0])
+    length = 0
+    for shape in shapes:
+        if not len(shape) == len(reference) \
+           or not list(shape[:axis]) + list(shape[axis + 1:]) \
+                  == reference[:axis] + reference[axis + 1:]:
+            raise ValueError("All input array dimensions except for the "
+                             "concatenation axis must match (got %s and %s)."
+                             % (shape, tuple(reference)))
+        length += shape[axis]
+    reference[axis] = length
+    shape = tuple(reference)
+    if out is None:
+        out = np.empty(shape,
+                       dtype=np.result_type(*[a.dtype for a in arrays]))
+    elif not out.shape == shape:
+        raise ValueError("Output array has wrong shape %s, expected %s."
+                         % (out.shape, shape))
+    # fill the buffer in one pass without any temporary copies
+    index = [slice(None)] * len(shape)
+    offset = 0
+    for a, s in zip(arrays, shapes):
+        index[axis] = slice(offset, offset + s[axis])
+        out[tuple(index)] = a
+        offset += s[axis]
+    return out
+
+
+def _merge_collections(collections):
+    """Collect attributes of multiple collections into a single dict
+
+    Attributes with identical keys overwrite previous ones, i.e. the result
+    is identical to updating a collection with all of them in a row, but
+    the target collection has to be updated only once.
+    """
+    merged = {}
+    for col in collections:
+        merged.update(col)
+    return merged
+
+
+def vstack(datasets, out=None):
     """Stacks datasets vertically (appending samples).
 
     Feature attribute collections are merged incrementally, attribute with
@@ -633,6 +757,10 @@ def vstack(datasets):
     ----------
     datasets : tuple
       Sequence of datasets to be stacked.
+    out : None or ndarray
+      If provided, the stacked samples are written into this array (e.g. a
+      `numpy.memmap`) which then becomes the samples array of the stacked
+      dataset. It has to be of the final shape of the stacked samples.
 
     Returns
     -------
@@ -640,7 +768,8 @@ def vstack(datasets):
     """
     # fall back to numpy if it is not a dataset
     if not is_datasetlike(datasets[0]):
-        return AttrDataset(np.vstack(datasets))
+        return AttrDataset(_stack_arrays([np.atleast_2d(ds) for ds in datasets],
+                                         0, out=out))
 
     if __debug__:
         target = sorted(datasets[0].sa.keys())
@@ -648,22 +777,21 @@ def vstack(datasets):
             raise ValueError("Sample attributes collections of to be stacked "
                              "datasets have varying attributes.")
     # will puke if not equal number of features
-    stacked_samp = np.concatenate([ds.samples for ds in datasets], axis=0)
+    stacked_samp = _stack_arrays([ds.samples for ds in datasets], 0, out=out)
 
     stacked_sa = {}
     for attr in datasets[0].sa:
-        stacked_sa[attr] = np.concatenate([ds.sa[attr].value for ds in datasets],
-                                         axis=0)
+        stacked_sa[attr] = _stack_arrays([ds.sa[attr].value for ds in datasets],
+                                         0)
     # create the dataset
     merged = datasets[0].__class__(stacked_samp, sa=stacked_sa)
 
-    for ds in datasets:
-        merged.fa.update(ds.fa)
+    merged.fa.update(_merge_collections([ds.fa for ds in datasets]))
 
     return merged
 
 
-def hstack(datasets):
+def hstack(datasets, out=None):
     """Stacks datasets horizontally (appending features).
 
     Sample attribute collections are merged incrementally, attribute with
@@ -677,6 +805,10 @@ def hstack(datasets):
     ----------
     datasets : tuple
       Sequence of datasets to be stacked.
+    out : None or ndarray
+      If provided, the stacked samples are written into this array (e.g. a
+      `numpy.memmap`) which then becomes the samples array of the stacked
+      dataset. It has to be of the final shape of the stacked samples.
 
     Returns
     -------
@@ -698,17 +830,16 @@ def hstack(datasets):
             raise ValueError("Feature attributes collections of to be stacked "
                              "datasets have varying attributes.")
     # will puke if not equal number of samples
-    stacked_samp = np.concatenate([ds.samples for ds in datasets], axis=1)
+    stacked_samp = _stack_arrays([ds.samples for ds in datasets], 1, out=out)
 
     stacked_fa = {}
     for attr in datasets[0].fa:
-        stacked_fa[attr] = np.concatenate([ds.fa[attr].value for ds in datasets],
-                                         axis=1)
+        stacked_fa[attr] = _stack_arrays([ds.fa[attr].value for ds in datasets],
+                                         0)
     # create the dataset
     merged = datasets[0].__class__(stacked_samp, fa=stacked_fa)
 
-    for ds in datasets:
-        merged.sa.update(ds.sa)
+    merged.sa.update(_merge_collections([ds.sa for ds in datasets]))
 
     return merged
 
@@ -791,7 +922,7 @@ DAE = DatasetAttributeExtractor
 
 
 @datasetmethod
-def save(dataset, destination, name=None, compression=None):
+def save(dataset, destination, name=None, compression=None, chunks=None):
     """Save Dataset into HDF5 file
 
     Parameters
@@ -801,6 +932,8 @@ def save(dataset, destination, name=None, compression=None):
     name : str, optional
     compression : None or int or {'gzip', 'szip', 'lzf'}, optional
       Level of compression for gzip, or another compression strategy.
+    chunks : None or True or tuple or {'samples', 'features'}, optional
+      Chunk shape of the samples.  See `mvpa.base.hdf5.obj2hdf()`.
     """
     if not externals.exists('h5py'):
         raise RuntimeError("Missing 'h5py' package -- saving is not possible.")
@@ -816,7 +949,7 @@ def save(dataset, destination, name=None, compression=None):
         own_file = True
         hdf = h5py.File(destination, 'w')
 
-    obj2hdf(hdf, dataset, name, compression=compression)
+    obj2hdf(hdf, dataset, name, compression=compression, chunks=chunks)
 
     # if we opened the file ourselves we close it now
     if own_file:
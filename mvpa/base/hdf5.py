@@ -26,6 +26,12 @@ implementations might allow for leaner HDF5 representations and leaner files.
 Basic types, such as `list`, and `dict`, which `__reduce__()` method does not do
 help with disassembling are also handled.
 
+Datasets are stored in a dedicated layout: `samples` go into a single HDF5
+dataset with configurable chunk shape and compression, and each sample,
+feature, and dataset attribute is stored separately.  This allows for loading
+datasets lazily (see `h5load()`), in which case only those parts of the
+samples get read from the file, which are actually selected.
+
 .. warning::
 
   Although, in principle, storage and reconstruction of arbitrary object types
@@ -41,16 +47,210 @@ import types
 import numpy as np
 import h5py
 from mvpa.base.types import asobjarray
+from mvpa.base.dataset import AttrDataset
 
 if __debug__:
     from mvpa.base import debug
 
 
 
+class HDF5Samples(object):
+    """Read-only array-like access to samples stored in an HDF5 dataset.
+
+    Selecting a subset of samples and/or features (e.g. `samples[:, ids]`)
+    reads only the necessary chunks from the file.  The full array is read
+    whenever the samples are converted into an actual array.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> from mvpa.datasets.base import dataset_wizard
+    >>> f = tempfile.NamedTemporaryFile()
+    >>> h5save(f.name, dataset_wizard(np.arange(12).reshape(4, 3)))
+    >>> ds = h5load(f.name, lazy=True)
+    >>> isinstance(ds.samples, HDF5Samples)
+    True
+    >>> ds[[1, 3], 1:].samples
+    array([[ 4,  5],
+           [10, 11]])
+    """
+    def __init__(self, hdf):
+        """
+        Parameters
+        ----------
+        hdf : h5py.Dataset
+          HDF5 dataset holding the samples.  Its file is kept open as long
+          as this instance exists.
+        """
+        self._hdf = hdf
+        self._file = hdf.file
+
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self._hdf)
+
+
+    def __len__(self):
+        return self.shape[0]
+
+
+    def __array__(self, dtype=None):
+        value = self._hdf[...]
+        if dtype is None:
+            return value
+        return value.astype(dtype)
+
+
+    def __deepcopy__(self, memo=None):
+        # deep copies get all the samples in memory
+        return np.asanyarray(self)
+
+
+    def view(self):
+        """Samples are read-only, hence no view is necessary"""
+        return self
+
+
+    def __getitem__(self, args):
+        if not isinstance(args, tuple):
+            args = (args,)
+        if len(args) == 1:
+            args = (args[0], slice(None))
+        if len(args) != 2:
+            raise IndexError("%s can only be indexed along samples and "
+                             "features" % self.__class__.__name__)
+        return self.select(*args)
+
+
+    def select(self, samples, features):
+        """Read a selection of samples and features.
+
+        Parameters
+        ----------
+        samples, features : int, slice, sequence of int, or boolean mask
+          Selection along the respective axis.  Sequences of ids do not
+          have to be sorted and can contain duplicates.
+
+        Returns
+        -------
+        ndarray
+        """
+        squeeze = [isinstance(a, (int, np.integer))
+                   for a in (samples, features)]
+        (rsel, rpost), (csel, cpost) = \
+                [_get_hdf_selection(a, l)
+                    for a, l in zip((samples, features), self.shape)]
+        if __debug__:
+            debug('HDF5', "Reading [%s, %s] from HDF5 dataset '%s'."
+                          % (rsel, csel, self._hdf.name))
+        if isinstance(rsel, list) and isinstance(csel, list):
+            # HDF5 supports a single list of ids per selection only, hence
+            # read the range of the features and select them afterwards
+            value = self._hdf[rsel, csel[0]:csel[-1] + 1]
+            cpost = (np.asarray(csel) - csel[0])[cpost]
+        else:
+            value = self._hdf[rsel, csel]
+        value = value[rpost][:, cpost]
+        if squeeze[0]:
+            value = value[0]
+        elif squeeze[1]:
+            value = value[:, 0]
+        return value
+
+
+    shape = property(fget=lambda self: self._hdf.shape)
+    dtype = property(fget=lambda self: self._hdf.dtype)
+    ndim = property(fget=lambda self: len(self._hdf.shape))
+
+
+
+def _get_hdf_selection(arg, length):
+    """Convert an arbitrary selection into one supported by h5py.
+
+    Returns
+    -------
+    tuple
+      Selection to read from the HDF5 dataset (a slice or sorted list of
+      unique ids) and a selection which yields the requested elements (in
+      their requested order) from the data read.
+    """
+    if isinstance(arg, slice):
+        start, stop, step = arg.indices(length)
+        if step > 0:
+            return slice(start, stop, step), slice(None)
+        arg = np.arange(start, stop, step)
+    elif isinstance(arg, (int, np.integer)):
+        arg = [arg]
+    arg = np.asanyarray(arg)
+    if arg.dtype == np.bool:
+        arg = arg.nonzero()[0]
+    else:
+        arg = np.where(arg < 0, arg + length, arg)
+    ids, post = np.unique(arg, return_inverse=True)
+    if len(ids) == len(arg) and np.all(ids == arg):
+        # no reordering necessary
+        post = slice(None)
+    if not len(ids):
+        sel = slice(0, 0)
+    elif ids[-1] - ids[0] + 1 == len(ids):
+        # contiguous selection is read much faster
+        sel = slice(ids[0], ids[-1] + 1)
+    else:
+        sel = list(ids)
+    return sel, post
+
+
+def _get_chunks(chunks, shape, dtype):
+    """Determine the chunk shape for samples.
+
+    Presets 'samples' and 'features' yield chunks of about 1MB, which hold
+    complete samples, or values of a feature across all samples
+    respectively (as far as possible).
+    """
+    if not chunks in ('samples', 'features'):
+        return chunks
+    if len(shape) != 2 or not np.all(shape):
+        # no use for chunks
+        return None
+    nsamples, nfeatures = shape
+    nelements = max(1, 2**20 / np.dtype(dtype).itemsize)
+    if chunks == 'samples':
+        ncols = min(nfeatures, nelements)
+        nrows = max(1, min(nsamples, nelements / ncols))
+    else:
+        nrows = min(nsamples, nelements)
+        ncols = max(1, min(nfeatures, nelements / nrows))
+    return (nrows, ncols)
+
+
+def _hdf2dataset(hdf, lazy=False):
+    """Reconstruct a dataset stored in the dedicated layout of `obj2hdf()`
+    """
+    mod = __import__(hdf.attrs['module'], fromlist=[hdf.attrs['class']])
+    cls = mod.__dict__[hdf.attrs['class']]
+    if lazy:
+        if __debug__:
+            debug('HDF5', "Accessing samples in '%s' lazily."
+                          % hdf['samples'].name)
+        samples = HDF5Samples(hdf['samples'])
+    else:
+        samples = hdf2obj(hdf['samples'])
+    ds = cls(samples,
+             sa=dict([(k, hdf2obj(v)) for k, v in hdf['sa'].iteritems()]),
+             fa=dict([(k, hdf2obj(v)) for k, v in hdf['fa'].iteritems()]),
+             a=hdf2obj(hdf['a']))
+    # restore documentation of the attributes
+    for col in ('sa', 'fa'):
+        for k, v in hdf[col].iteritems():
+            if 'doc' in v.attrs:
+                getattr(ds, col)[k].__doc__ = v.attrs['doc']
+    return ds
+
+
 #
 # TODO: check for recursions!!!
 #
-def hdf2obj(hdf):
+def hdf2obj(hdf, lazy=False):
     """Convert an HDF5 group definition into an object instance.
 
     Obviously, this function assumes the conventions implemented in the
@@ -61,6 +261,10 @@ def hdf2obj(hdf):
     ----------
     hdf : HDF5 group instance
       HDF5 group instance. this could also be an HDF5 file instance.
+    lazy : bool
+      If True, samples of datasets are not read into memory, but accessed
+      through `HDF5Samples`.  The HDF5 file has to remain accessible as long
+      as the datasets are in use.
 
     Notes
     -----
@@ -88,6 +292,11 @@ def hdf2obj(hdf):
             hdf.read_direct(value)
             return value
     else:
+        if hdf.attrs.get('layout', None) == 'dataset':
+            if __debug__:
+                debug('HDF5', "Load dataset from HDF5 group '%s'." % hdf.name)
+            return _hdf2dataset(hdf, lazy=lazy)
+
         # check if we have a class instance definition here
         if not ('class' in hdf.attrs or 'recon' in hdf.attrs):
             raise LookupError("Found hdf group without class instance "
@@ -114,7 +323,7 @@ def hdf2obj(hdf):
             recon = mod.__dict__[recon]
 
             if 'rcargs' in hdf:
-                recon_args = _hdf_tupleitems_to_obj(hdf['rcargs'])
+                recon_args = _hdf_tupleitems_to_obj(hdf['rcargs'], lazy=lazy)
             else:
                 recon_args = ()
 
@@ -161,7 +370,7 @@ def hdf2obj(hdf):
                 # insert the state of the object
                 if __debug__:
                     debug('HDF5', "Populating instance state.")
-                state = _hdf_dictitems_to_obj(hdf['state'])
+                state = _hdf_dictitems_to_obj(hdf['state'], lazy=lazy)
                 obj.__dict__.update(state)
                 if __debug__:
                     debug('HDF5', "Updated %i state items." % len(state))
@@ -172,7 +381,8 @@ def hdf2obj(hdf):
                     # charge a dict itself
                     if __debug__:
                         debug('HDF5', "Populating dictionary object.")
-                    obj.update(_hdf_dictitems_to_obj(hdf['items']))
+                    obj.update(_hdf_dictitems_to_obj(hdf['items'],
+                                                     lazy=lazy))
                     if __debug__:
                         debug('HDF5', "Loaded %i items." % len(obj))
                 else:
@@ -189,16 +399,16 @@ def hdf2obj(hdf):
             if cls == 'NoneType':
                 return None
             elif cls == 'tuple':
-                return _hdf_tupleitems_to_obj(hdf['items'])
+                return _hdf_tupleitems_to_obj(hdf['items'], lazy=lazy)
             elif cls == 'list':
-                l = _hdf_listitems_to_obj(hdf['items'])
+                l = _hdf_listitems_to_obj(hdf['items'], lazy=lazy)
                 if 'is_objarray' in hdf.attrs:
                     # need to handle special case of arrays of objects
                     return asobjarray(l)
                 else:
                     return l
             elif cls == 'dict':
-                return _hdf_dictitems_to_obj(hdf['items'])
+                return _hdf_dictitems_to_obj(hdf['items'], lazy=lazy)
             elif cls == 'function':
                 raise RuntimeError("Unhandled reconstruction of built-in "
                         "function (at '%s')." % hdf.name)
@@ -209,31 +419,31 @@ def hdf2obj(hdf):
                         % hdf.name)
 
 
-def _hdf_dictitems_to_obj(hdf, skip=None):
+def _hdf_dictitems_to_obj(hdf, skip=None, lazy=False):
     if skip is None:
         skip = []
     if hdf.attrs.get('__keys_in_tuple__', 0):
-        items = _hdf_listitems_to_obj(hdf)
+        items = _hdf_listitems_to_obj(hdf, lazy=lazy)
         items = [i for i in items if not i[0] in skip]
         return dict(items)
     else:
         # legacy files had keys as group names
-        return dict([(item, hdf2obj(hdf[item]))
+        return dict([(item, hdf2obj(hdf[item], lazy=lazy))
                         for item in hdf
                             if not item in skip])
 
 
-def _hdf_listitems_to_obj(hdf):
-    return [hdf2obj(hdf[str(i)]) for i in xrange(len(hdf))]
+def _hdf_listitems_to_obj(hdf, lazy=False):
+    return [hdf2obj(hdf[str(i)], lazy=lazy) for i in xrange(len(hdf))]
 
 
-def _hdf_tupleitems_to_obj(hdf):
-    return tuple(_hdf_listitems_to_obj(hdf))
+def _hdf_tupleitems_to_obj(hdf, lazy=False):
+    return tuple(_hdf_listitems_to_obj(hdf, lazy=lazy))
 
 #
 # TODO: check for recursions!!!
 #
-def obj2hdf(hdf, obj, name=None, **kwargs):
+def obj2hdf(hdf, obj, name=None, chunks=None, **kwargs):
     """Store an object instance in an HDF5 group.
 
     A given object instance is (recursively) disassembled into pieces that are
@@ -255,6 +465,12 @@ def obj2hdf(hdf, obj, name=None, **kwargs):
       Name of the object. In case of a complex object that cannot be stored
       natively without disassembling them, this is going to be a new group,
       Otherwise the name of the dataset. If None, no new group is created.
+    chunks : None or True or tuple or {'samples', 'features'}
+      Chunk shape of the samples of datasets.  If None, the HDF5 default
+      layout is used (chunked only in case of compression). True selects
+      the chunk shape automatically.  'samples' and 'features' choose
+      chunks optimized for reading whole samples, or the values of
+      features across all samples respectively.
     **kwargs
       All additional arguments will be passed to `h5py.Group.create_dataset()`
     """
@@ -269,7 +485,17 @@ def obj2hdf(hdf, obj, name=None, **kwargs):
             debug('HDF5', "Storing '%s' in HDF5 dataset '%s'"
                           % (type(obj), name))
 
-        hdf.create_dataset(name, None, None, obj, **kwargs)
+        if not np.asanyarray(obj).ndim:
+            # HDF5 supports neither chunks nor compression for scalars
+            hdf.create_dataset(name, None, None, obj)
+        else:
+            hdf.create_dataset(name, None, None, obj, **kwargs)
+        return
+
+    if isinstance(obj, AttrDataset) \
+       and isinstance(obj.samples, (np.ndarray, HDF5Samples)) \
+       and not obj.samples.dtype == np.object:
+        _dataset2hdf(hdf, obj, name, chunks=chunks, **kwargs)
         return
 
     if __debug__:
@@ -318,14 +544,15 @@ def obj2hdf(hdf, obj, name=None, **kwargs):
             if __debug__: debug('HDF5', "Special case: Store a list/tuple.")
             items = grp.create_group('items')
             for i, item in enumerate(obj):
-                obj2hdf(items, item, name=str(i), **kwargs)
+                obj2hdf(items, item, name=str(i), chunks=chunks, **kwargs)
         elif isinstance(obj, dict):
             if __debug__: debug('HDF5', "Special case: Store a dictionary.")
             items = grp.create_group('items')
             for i, key in enumerate(obj):
                 # keys might be complex object, so they cannot serve as a
                 # name in this case
-                obj2hdf(items, (key, obj[key]), name=str(i), **kwargs)
+                obj2hdf(items, (key, obj[key]), name=str(i), chunks=chunks,
+                        **kwargs)
                 # leave a tag that the keys are stored within the item
                 # tuple, to make it possible to support legacy files
                 items.attrs.create('__keys_in_tuple__', 1)
@@ -338,7 +565,7 @@ def obj2hdf(hdf, obj, name=None, **kwargs):
                 debug('HDF5', "Store object state (%i items)." % len(state))
             # loop over all attributes and store them
             for attr in state:
-                obj2hdf(stategrp, state[attr], attr, **kwargs)
+                obj2hdf(stategrp, state[attr], attr, chunks=chunks, **kwargs)
         # for the default __reduce__ there is nothin else to do
         return
     else:
@@ -350,11 +577,44 @@ def obj2hdf(hdf, obj, name=None, **kwargs):
         grp.attrs.create('module', pieces[0].__module__)
         args = grp.create_group('rcargs')
         for i, arg in enumerate(pieces[1]):
-            obj2hdf(args, arg, str(i), **kwargs)
+            obj2hdf(args, arg, str(i), chunks=chunks, **kwargs)
         return
 
 
-def h5save(filename, data, name=None, mode='w', **kwargs):
+def _dataset2hdf(hdf, ds, name, chunks=None, **kwargs):
+    """Store a dataset in its dedicated layout
+
+    Samples are stored in a single HDF5 dataset.  Each attribute is stored
+    in its own HDF5 dataset (or group, if it cannot be stored natively) in
+    the 'sa', 'fa', and 'a' groups.
+    """
+    if __debug__:
+        debug('HDF5', "Store dataset in HDF5 group '%s'." % name)
+    if not name is None:
+        grp = hdf.create_group(str(name))
+    else:
+        grp = hdf
+    grp.attrs.create('class', ds.__class__.__name__)
+    grp.attrs.create('module', ds.__class__.__module__)
+    grp.attrs.create('layout', 'dataset')
+
+    samples = np.asanyarray(ds.samples)
+    grp.create_dataset('samples', data=samples,
+                       chunks=_get_chunks(chunks, samples.shape,
+                                          samples.dtype),
+                       **kwargs)
+
+    for col in ('sa', 'fa'):
+        colgrp = grp.create_group(col)
+        for attr in getattr(ds, col).values():
+            obj2hdf(colgrp, attr.value, attr.name, **kwargs)
+            if not attr.__doc__ is None:
+                colgrp[attr.name].attrs.create('doc', attr.__doc__)
+    obj2hdf(grp, dict([(k, v.value) for k, v in ds.a.iteritems()]), 'a',
+            chunks=chunks, **kwargs)
+
+
+def h5save(filename, data, name=None, mode='w', chunks=None, **kwargs):
     """Stores arbitray data in an HDF5 file.
 
     This is a convenience wrapper around `obj2hdf()`. Please see its
@@ -373,18 +633,20 @@ def h5save(filename, data, name=None, mode='w', **kwargs):
     mode : {'r', 'r+', 'w', 'w-', 'a'}
       IO mode of the HDF5 file. See `h5py.File` documentation for more
       information.
+    chunks : None or True or tuple or {'samples', 'features'}
+      Chunk shape of the samples of datasets.  See `obj2hdf()`.
     **kwargs
       All additional arguments will be passed to `h5py.Group.create_dataset`.
       This could, for example, be `compression='gzip'`.
     """
     hdf = h5py.File(filename, mode)
     try:
-        obj2hdf(hdf, data, name, **kwargs)
+        obj2hdf(hdf, data, name, chunks=chunks, **kwargs)
     finally:
         hdf.close()
 
 
-def h5load(filename, name=None):
+def h5load(filename, name=None, lazy=False):
     """Loads the content of an HDF5 file that has been stored by `h5save()`.
 
     This is a convenience wrapper around `hdf2obj()`. Please see its
@@ -396,6 +658,12 @@ def h5load(filename, name=None):
       Name of the file to open and load its content.
     name : str
       Name of a specific object to load from the file.
+    lazy : bool
+      If True, samples of datasets are not loaded into memory, but read
+      from the file whenever they are accessed.  Hence selecting a subset
+      of a dataset (e.g. `ds[:, ids]`) reads only the necessary parts of
+      the samples.  The file is kept open as long as the samples of any
+      such dataset are in use.
 
     Returns
     -------
@@ -408,26 +676,28 @@ def h5load(filename, name=None):
             if not name in hdf:
                 raise ValueError("No object of name '%s' in file '%s'."
                                  % (name, filename))
-            obj = hdf2obj(hdf[name])
+            obj = hdf2obj(hdf[name], lazy=lazy)
         else:
             if len(hdf) == 0:
                 # there is nothing
                 obj = None
             else:
                 try:
-                    obj = hdf2obj(hdf)
+                    obj = hdf2obj(hdf, lazy=lazy)
                 except LookupError:
                     # no object into at the top-level, but maybe in the next one
                     # this would happen for plain mat files with arrays
                     if len(hdf) == 1 and '__unnamed__' in hdf:
                         # just a single with special naem -> special case:
                         # return as is
-                        obj = hdf2obj(hdf['__unnamed__'])
+                        obj = hdf2obj(hdf['__unnamed__'], lazy=lazy)
                     else:
                         # otherwise build dict with content
                         obj = {}
                         for k in hdf:
-                            obj[k] = hdf2obj(hdf[k])
+                            obj[k] = hdf2obj(hdf[k], lazy=lazy)
     finally:
-        hdf.close()
+        if not lazy:
+            # lazily loaded samples keep the file open
+            hdf.close()
     return obj
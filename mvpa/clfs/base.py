@@ -20,7 +20,7 @@ import time
 from mvpa.base.types import is_datasetlike, accepts_dataset_as_samples
 
 from mvpa.datasets.base import Dataset
-from mvpa.misc.support import idhash
+from mvpa.misc.support import fingerprint
 from mvpa.misc.state import StateVariable, ClassWithCollections
 from mvpa.misc.param import Parameter
 from mvpa.misc.attrmap import AttributeMap
@@ -207,14 +207,26 @@ class Classifier(ClassWithCollections):
         return super(Classifier, self).__repr__(prefixes=prefixes)
 
 
-    def _pretrain(self, dataset):
+    def _pretrain(self, dataset, untrain=True):
         """Functionality prior to training
+
+        Parameters
+        ----------
+        dataset : Dataset
+          Data which is used for training
+        untrain : bool
+          If False, a non-retrainable classifier only gets its state
+          variables reset, while its learnt parameters are kept (for
+          incremental training).
         """
         # So we reset all state variables and may be free up some memory
         # explicitly
         params = self.params
         if not params.retrainable:
-            self.untrain()
+            if untrain:
+                self.untrain()
+            else:
+                self.ca.reset()
         else:
             # just reset the ca, do not untrain
             self.ca.reset()
@@ -230,9 +242,12 @@ class Classifier(ClassWithCollections):
                     debug('CLF_', "IDHashes are %s" % (__idhashes))
 
                 # Look at the data if any was changed
-                for key, data_ in (('traindata', dataset.samples),
-                                   ('targets', dataset.sa[params.targets_attr].value)):
-                    _changedData[key] = self.__was_data_changed(key, data_)
+                targets = dataset.sa[params.targets_attr]
+                for key, data_, version in (
+                        ('traindata', dataset.samples, None),
+                        ('targets', targets.value, targets.version)):
+                    _changedData[key] = self.__was_data_changed(
+                        key, data_, version=version)
                     # if those idhashes were invalidated by retraining
                     # we need to adjust _changedData accordingly
                     if __invalidatedChangedData.get(key, False):
@@ -380,6 +395,17 @@ class Classifier(ClassWithCollections):
         Shouldn't be overridden in subclasses unless explicitly needed
         to do so
         """
+        return self._run_training(dataset, self._train)
+
+
+    def _run_training(self, dataset, trainfx, untrain=True):
+        """Run `trainfx` on a dataset with all the bookkeeping of `train()`
+
+        I.e. checking the dataset, `_pretrain()`, timing of the training
+        and `_posttrain()`.  Classifiers supporting incremental training
+        (e.g. `GNB.partial_train()`) call it with `untrain=False` to keep
+        their learnt parameters.
+        """
         if dataset.nfeatures == 0 or dataset.nsamples == 0:
             raise DegenerateInputError, \
                   "Cannot train classifier on degenerate data %s" % dataset
@@ -387,14 +413,14 @@ class Classifier(ClassWithCollections):
             debug("CLF", "Training classifier %(clf)s on dataset %(dataset)s",
                   msgargs={'clf':self, 'dataset':dataset})
 
-        self._pretrain(dataset)
+        self._pretrain(dataset, untrain=untrain)
 
         # remember the time when started training
         t0 = time.time()
 
         if dataset.nfeatures > 0:
 
-            result = self._train(dataset)
+            result = trainfx(dataset)
         else:
             warning("Trying to train on dataset with no features present")
             if __debug__:
@@ -629,12 +655,20 @@ class Classifier(ClassWithCollections):
 
 
     ##REF: Name was automagically refactored
-    def __was_data_changed(self, key, entry, update=True):
+    def __was_data_changed(self, key, entry, update=True, version=None):
         """Check if given entry was changed from what known prior.
 
-        If so -- store only the ones needed for retrainable beastie
+        If so -- store only the ones needed for retrainable beastie.
+        Only a cheap `fingerprint` of the entry (and its `version`, if
+        known) is compared, so the check does not have to go through
+        all the data.  Hence sparse in-place modifications of large
+        arrays (e.g. changing a few elements of the training samples)
+        can be missed, and the classifier would not be retrained.  Assign
+        new arrays instead.  The CHECK_RETRAIN debug target keeps copies
+        of all the data to compare with, and raises a RuntimeError for
+        such missed changes.
         """
-        idhash_ = idhash(entry)
+        idhash_ = fingerprint(entry, version)
         __idhashes = self.__idhashes
 
         changed = __idhashes[key] != idhash_
@@ -650,7 +684,8 @@ class Classifier(ClassWithCollections):
                   (key, idhash_, __idhashes[key], changed,
                    entry, __trained[key], changed2)
             if update:
-                __trained[key] = entry
+                # a copy, so in-place modifications of the entry are seen
+                __trained[key] = deepcopy(entry)
 
         if __debug__ and changed:
             debug('CLF_', "Changed %s from %s to %s.%s"
@@ -740,11 +775,14 @@ class Classifier(ClassWithCollections):
 
         # To check if we are not fooled
         if __debug__ and 'CHECK_RETRAIN' in debug.active:
-            for key, data_ in (('traindata', dataset.samples),
-                               ('targets', dataset.sa[self.params.targets_attr].value)):
+            targets = dataset.sa[self.params.targets_attr]
+            for key, data_, version in (
+                    ('traindata', dataset.samples, None),
+                    ('targets', targets.value, targets.version)):
                 # so it wasn't told to be invalid
                 if not chd[key] and not ichd.get(key, False):
-                    if self.__was_data_changed(key, data_, update=False):
+                    if self.__was_data_changed(key, data_, update=False,
+                                               version=version):
                         raise RuntimeError, \
                               "Data %s found changed although wasn't " \
                               "labeled as such" % key
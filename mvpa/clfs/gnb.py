@@ -90,13 +90,22 @@ class GNB(Classifier):
              disabled by default since does not impact classification output.
              """)
 
-    def __init__(self, **kwargs):
+    def __init__(self, block_size=None, **kwargs):
         """Initialize an GNB classifier.
+
+        Parameters
+        ----------
+        block_size : None or int
+          Number of samples for which predictions are computed at once.
+          If None, it is chosen to keep the temporary (classes x samples x
+          features) array below about 32MB.
         """
 
         # init base class first
         Classifier.__init__(self, **kwargs)
 
+        self.__block_size = block_size
+
         # pylint friendly initializations
         self.means = None
         """Means of features per class"""
@@ -107,52 +116,141 @@ class GNB(Classifier):
         self.priors = None
         """Class probabilities"""
 
+        # Sufficient statistics per class to allow for incremental training
+        self._nsamples_per_class = None
+        self._sqdevs = None
+        """Sums of squared deviations from the means"""
+
         # Define internal state of classifier
         self._norm_weight = None
 
+
     def _train(self, dataset):
         """Train the classifier using `dataset` (`Dataset`).
         """
-        params = self.params
-        targets_sa_name = params.targets_attr
-        targets_sa = dataset.sa[targets_sa_name]
+        self._nsamples_per_class = None
+        self._update_stats(dataset)
+        self._compute_params()
+
+        if __debug__ and 'GNB' in debug.active:
+            X = dataset.samples
+            debug('GNB', "training finished on data.shape=%s " % (X.shape, )
+                  + "min:max(data)=%f:%f" % (np.min(X), np.max(X)))
+
+
+    def partial_train(self, dataset):
+        """Update a trained classifier with additional training samples.
+
+        Only the per-class sufficient statistics (number of samples, means
+        and sums of squared deviations) get updated with the new samples,
+        hence training on multiple datasets one after another is
+        equivalent to training on all of them at once.  New labels might
+        appear in `dataset`.  An untrained classifier simply gets trained.
+        Besides `trained_targets` and `trained_nsamples`, state variables
+        (e.g. `training_confusion`) refer to `dataset` only.
+        """
+        if not self.trained or self._nsamples_per_class is None:
+            return self.train(dataset)
+        if not dataset.samples.shape[1:] == self.means.shape[1:]:
+            raise ValueError, "Shape of samples %s does not match the " \
+                  "classifier's %s" % (dataset.samples.shape[1:],
+                                       self.means.shape[1:])
+
+        self._run_training(dataset, self._partial_train, untrain=False)
+
+        # these are about all the samples the classifier was trained on
+        self.ca.trained_targets = self.ulabels
+        self.ca.trained_nsamples = int(self._nsamples_per_class.sum())
+
+
+    def _partial_train(self, dataset):
+        """Update the parameters with the samples of `dataset`
+        """
+        self._update_stats(dataset)
+        self._compute_params()
+
+
+    def _update_stats(self, dataset):
+        """Incorporate samples of the dataset into sufficient statistics
+        """
+        targets_sa = dataset.sa[self.params.targets_attr]
 
         # get the dataset information into easy vars
         X = dataset.samples
         labels = targets_sa.value
-        self.ulabels = ulabels = targets_sa.unique
+        ulabels = targets_sa.unique
         nlabels = len(ulabels)
-        #params = self.params        # for quicker access
-        label2index = dict((l, il) for il, l in enumerate(ulabels))
-
-        # set the feature dimensions
         nsamples = len(X)
-        s_shape = X.shape[1:]           # shape of a single sample
-
-        self.means = means = \
-                     np.zeros((nlabels, ) + s_shape)
-        self.variances = variances = \
-                     np.zeros((nlabels, ) + s_shape)
-        # degenerate dimension are added for easy broadcasting later on
-        nsamples_per_class = np.zeros((nlabels,) + (1,)*len(s_shape))
-
-        # Estimate means and number of samples per each label
-        for s, l in zip(X, labels):
-            il = label2index[l]         # index of the label
-            nsamples_per_class[il] += 1
-            means[il] += s
 
-        ## Actually compute the means
-        non0labels = (nsamples_per_class.squeeze() != 0)
-        means[non0labels] /= nsamples_per_class[non0labels]
+        # group samples by label: per-class sums are computed with a
+        # single matrix product with the indicator matrix of the labels
+        label_ids = np.searchsorted(ulabels, labels)
+        indicator = np.zeros((nlabels, nsamples))
+        indicator[label_ids, np.arange(nsamples)] = 1
+        Xf = X.reshape((nsamples, -1))
+        counts = np.bincount(label_ids, minlength=nlabels).astype(float)
+        means = np.dot(indicator, Xf) / counts[:, np.newaxis]
+        sqdevs = np.dot(indicator, (Xf - means[label_ids])**2)
 
-        # Estimate variances
-        # better loop than repmat! ;)
-        for s, l in zip(X, labels):
-            il = label2index[l]         # index of the label
-            variances[il] += (s - means[il])**2
+        s_shape = X.shape[1:]           # shape of a single sample
+        means = means.reshape((nlabels,) + s_shape)
+        sqdevs = sqdevs.reshape((nlabels,) + s_shape)
+
+        if self._nsamples_per_class is None:
+            self.ulabels = ulabels
+            self._nsamples_per_class = counts
+            self.means, self._sqdevs = means, sqdevs
+            return
+
+        # merge with existing statistics (Chan et al., 1979)
+        all_labels = np.union1d(self.ulabels, ulabels)
+        if len(all_labels) > len(self.ulabels):
+            # make room for new labels
+            old_ids = np.searchsorted(all_labels, self.ulabels)
+            n_a = np.zeros(len(all_labels))
+            means_a = np.zeros((len(all_labels),) + s_shape)
+            sqdevs_a = np.zeros((len(all_labels),) + s_shape)
+            n_a[old_ids] = self._nsamples_per_class
+            means_a[old_ids] = self.means
+            sqdevs_a[old_ids] = self._sqdevs
+        else:
+            n_a, means_a, sqdevs_a = \
+                 self._nsamples_per_class, self.means, self._sqdevs
+        new_ids = np.searchsorted(all_labels, ulabels)
+        n_b = np.zeros(len(all_labels))
+        n_b[new_ids] = counts
+        n = n_a + n_b
+
+        # degenerate dimension are added for easy broadcasting
+        bshape = (len(all_labels),) + (1,) * len(s_shape)
+        delta = np.zeros(means_a.shape)
+        delta[new_ids] = means - means_a[new_ids]
+        weight_b = (n_b / n).reshape(bshape)
+        weight_ab = (n_a * n_b / n).reshape(bshape)
+        sqdevs_a = sqdevs_a.copy()
+        sqdevs_a[new_ids] += sqdevs
+        self.means = means_a + delta * weight_b
+        self._sqdevs = sqdevs_a + delta**2 * weight_ab
+        self._nsamples_per_class = n
+        self.ulabels = all_labels
+
+
+    def _compute_params(self):
+        """Compute variances, priors and norms from sufficient statistics
+        """
+        params = self.params
+        ulabels = self.ulabels
+        nlabels = len(ulabels)
+        means = self.means
+        s_shape = means.shape[1:]
+        nsamples = self._nsamples_per_class.sum()
+        # degenerate dimension are added for easy broadcasting later on
+        nsamples_per_class = self._nsamples_per_class.reshape(
+            (nlabels,) + (1,)*len(s_shape))
 
         ## Actually compute the variances
+        self.variances = variances = self._sqdevs.copy()
+        non0labels = (self._nsamples_per_class != 0)
         if params.common_variance:
             # we need to get global std
             cvar = np.sum(variances, axis=0)/nsamples # sum across labels
@@ -181,10 +279,6 @@ class GNB(Classifier):
         else:
             self._norm_weight = 1.0/np.sqrt(2*np.pi*variances)
 
-        if __debug__ and 'GNB' in debug.active:
-            debug('GNB', "training finished on data.shape=%s " % (X.shape, )
-                  + "min:max(data)=%f:%f" % (np.min(X), np.max(X)))
-
 
     def untrain(self):
         """Untrain classifier and reset all learnt params
@@ -193,6 +287,8 @@ class GNB(Classifier):
         self.variances = None
         self.ulabels = None
         self.priors = None
+        self._nsamples_per_class = None
+        self._sqdevs = None
         super(GNB, self).untrain()
 
 
@@ -201,47 +297,20 @@ class GNB(Classifier):
         """Predict the output for the provided data.
         """
         params = self.params
-        # argument of exponentiation
-        scaled_distances = \
-            -0.5 * (((data - self.means[:, np.newaxis, ...])**2) \
-                          / self.variances[:, np.newaxis, ...])
-        if params.logprob:
-            # if self.params.common_variance:
-            # XXX YOH:
-            # For decision there is no need to actually compute
-            # properly scaled p, ie 1/sqrt(2pi * sigma_i) could be
-            # simply discarded since it is common across features AND
-            # classes
-            # For completeness -- computing everything now even in logprob
-            lprob_csfs = self._norm_weight[:, np.newaxis, ...] + scaled_distances
+        data = np.asanyarray(data)
+        nclasses = len(self.ulabels)
+        nsamples = len(data)
 
-            # XXX for now just cut/paste with different operators, but
-            #     could just bind them and reuse in the same equations
-            # Naive part -- just a product of probabilities across features
-            ## First we need to reshape to get class x samples x features
-            lprob_csf = lprob_csfs.reshape(
-                lprob_csfs.shape[:2] + (-1,))
-            ## Now -- sum across features
-            lprob_cs = lprob_csf.sum(axis=2)
+        block_size = self.__block_size
+        if block_size is None:
+            # keep temporaries below 2**22 elements (32MB)
+            nelements = nclasses * max(1, np.prod(data.shape[1:]))
+            block_size = max(1, 2**22 // nelements)
 
-            # Incorporate class probabilities:
-            prob_cs_cp = lprob_cs + np.log(self.priors[:, np.newaxis])
-
-        else:
-            # Just a regular Normal distribution with per
-            # feature/class mean and variances
-            prob_csfs = \
-                 self._norm_weight[:, np.newaxis, ...] * np.exp(scaled_distances)
-
-            # Naive part -- just a product of probabilities across features
-            ## First we need to reshape to get class x samples x features
-            prob_csf = prob_csfs.reshape(
-                prob_csfs.shape[:2] + (-1,))
-            ## Now -- product across features
-            prob_cs = prob_csf.prod(axis=2)
-
-            # Incorporate class probabilities:
-            prob_cs_cp = prob_cs * self.priors[:, np.newaxis]
+        prob_cs_cp = np.empty((nclasses, nsamples))
+        for start in xrange(0, nsamples, block_size):
+            block = slice(start, min(nsamples, start + block_size))
+            prob_cs_cp[:, block] = self._predict_block(data[block])
 
         # Normalize by evidence P(data)
         if params.normalize:
@@ -269,6 +338,125 @@ class GNB(Classifier):
         return predictions
 
 
+    def _predict_block(self, data):
+        """(Log)probabilities (classes x samples) for a block of samples
+        """
+        terms = self._get_feature_terms(data)
+        # Naive part -- just a product of probabilities across features
+        # and incorporate class probabilities
+        if self.params.logprob:
+            return terms.sum(axis=2) + np.log(self.priors[:, np.newaxis])
+        else:
+            return terms.prod(axis=2) * self.priors[:, np.newaxis]
+
+
+    def _get_feature_terms(self, data):
+        """(Log)probabilities (classes x samples x features) of each feature
+        """
+        params = self.params
+        # argument of exponentiation
+        scaled_distances = \
+            -0.5 * (((data - self.means[:, np.newaxis, ...])**2) \
+                          / self.variances[:, np.newaxis, ...])
+        if params.logprob:
+            # if self.params.common_variance:
+            # XXX YOH:
+            # For decision there is no need to actually compute
+            # properly scaled p, ie 1/sqrt(2pi * sigma_i) could be
+            # simply discarded since it is common across features AND
+            # classes
+            # For completeness -- computing everything now even in logprob
+            terms = self._norm_weight[:, np.newaxis, ...] + scaled_distances
+        else:
+            # Just a regular Normal distribution with per
+            # feature/class mean and variances
+            terms = \
+                 self._norm_weight[:, np.newaxis, ...] * np.exp(scaled_distances)
+
+        # reshape to get class x samples x features
+        return terms.reshape(terms.shape[:2] + (-1,))
+
+
+    def predict_batched(self, dataset, neighborhoods):
+        """Predict with classifiers trained on many subsets of features.
+
+        Since all features are treated independently, the parameters of a
+        GNB trained on any subset of features are the corresponding subset
+        of the parameters of a GNB trained on all of them.  Hence, a
+        classifier trained on all features of a dataset provides the
+        predictions of classifiers trained (on the same samples) and
+        tested on each subset of features separately, e.g. for all
+        searchlight spheres at once.  For `CandidateSets` (as evaluated by
+        `IFS`) the (log)probabilities of the common selected features are
+        combined only once and then updated with each candidate.
+
+        Parameters
+        ----------
+        dataset : Dataset
+          Testing samples with all features the classifier was trained on.
+        neighborhoods : NeighborhoodIndex
+          Subsets of the (flattened) features, none of which may be empty.
+
+        Returns
+        -------
+        ndarray
+          Predictions (samples x subsets).  State variables (e.g.
+          `estimates`) are not computed.
+        """
+        self._prepredict(dataset)
+        sizes = neighborhoods.roisizes
+        if np.any(sizes == 0):
+            raise ValueError("GNB cannot predict from an empty subset of "
+                             "features")
+        fids = neighborhoods.fids
+        starts = neighborhoods.offsets[:-1]
+        selected = getattr(neighborhoods, 'selected', None)
+        logprob = self.params.logprob
+        data = np.asanyarray(dataset.samples)
+        nclasses = len(self.ulabels)
+        nsamples = len(data)
+
+        block_size = self.__block_size
+        if block_size is None:
+            # keep temporaries below 2**22 elements (32MB)
+            nelements = nclasses * max(1, len(fids),
+                                       np.prod(data.shape[1:]))
+            block_size = max(1, 2**22 // nelements)
+
+        winners = np.empty((nsamples, len(sizes)), dtype=int)
+        for start in xrange(0, nsamples, block_size):
+            block = slice(start, min(nsamples, start + block_size))
+            terms = self._get_feature_terms(data[block])
+            # same as in _predict_block(), but per subset of features
+            # (normalization by evidence does not change the winners)
+            if selected is not None:
+                # incremental update of the selected features' part
+                cterms = terms[:, :, neighborhoods.candidates]
+                if logprob:
+                    scores = cterms + terms[:, :, selected].sum(
+                                            axis=2)[:, :, np.newaxis]
+                else:
+                    scores = cterms * terms[:, :, selected].prod(
+                                            axis=2)[:, :, np.newaxis]
+            elif logprob:
+                scores = np.add.reduceat(terms[:, :, fids], starts, axis=2)
+            else:
+                scores = np.multiply.reduceat(terms[:, :, fids], starts,
+                                              axis=2)
+            if logprob:
+                scores += np.log(self.priors)[:, np.newaxis, np.newaxis]
+            else:
+                scores *= self.priors[:, np.newaxis, np.newaxis]
+            winners[block] = scores.argmax(axis=0)
+
+        predictions = np.asanyarray(self.ulabels)[winners]
+        if self._attrmap:
+            predictions = np.reshape(
+                self._attrmap.to_literal(predictions.ravel()),
+                predictions.shape)
+        return predictions
+
+
     # XXX Later come up with some
     #     could be a simple t-test maps using distributions
     #     per each class
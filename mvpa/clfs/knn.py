@@ -10,10 +10,6 @@
 
 __docformat__ = 'restructuredtext'
 
-import sys
-# not worthy of externals checking
-_dict_has_key = sys.version_info >= (2, 5)
-
 import numpy as np
 
 from mvpa.base import warning
@@ -30,6 +26,19 @@ if __debug__:
     from mvpa.base import debug
 
 
+if hasattr(np, 'argpartition'):
+    def _get_knns(dists, k):
+        """Ids of the `k` smallest distances in each row (unordered)"""
+        if k >= dists.shape[1]:
+            return np.repeat(np.arange(dists.shape[1])[np.newaxis],
+                             len(dists), axis=0)
+        return np.argpartition(dists, k - 1, axis=1)[:, :k]
+else:
+    def _get_knns(dists, k):
+        """Ids of the `k` smallest distances in each row"""
+        return dists.argsort(axis=1)[:, :k]
+
+
 class kNN(Classifier):
     """
     k-Nearest-Neighbour classifier.
@@ -60,7 +69,7 @@ class kNN(Classifier):
                       'notrain2predict' ]
 
     def __init__(self, k=2, dfx=squared_euclidean_distance,
-                 voting='weighted', **kwargs):
+                 voting='weighted', block_size=None, **kwargs):
         """
         Parameters
         ----------
@@ -74,6 +83,10 @@ class kNN(Classifier):
           Possible values are 'majority' (simple majority of classes
           determines vote) and 'weighted' (votes are weighted according to the
           relative frequencies of each class in the training data).
+        block_size : None or int
+          Number of test samples for which the distances to all training
+          samples are computed at once.  If None, it is chosen to keep
+          each block of distances below about 32MB.
         **kwargs
           Additonal arguments are passed to the base class.
         """
@@ -84,6 +97,7 @@ class kNN(Classifier):
         self.__k = k
         self.__dfx = dfx
         self.__voting = voting
+        self.__block_size = block_size
         self.__data = None
 
 
@@ -116,10 +130,10 @@ class kNN(Classifier):
                         " floating datatype if any error is reported.")
         self.__weights = None
 
-        # create dictionary with an item for each condition
-        uniquelabels = data.sa[self.params.targets_attr].unique
-        self.__votes_init = dict(zip(uniquelabels,
-                                     [0] * len(uniquelabels)))
+        # encode labels as indices into the unique labels
+        targets_sa = data.sa[self.params.targets_attr]
+        self.__uniquelabels = uniquelabels = targets_sa.unique
+        self.__label_ids = np.searchsorted(uniquelabels, targets_sa.value)
 
 
     @accepts_dataset_as_samples
@@ -140,122 +154,123 @@ class kNN(Classifier):
                 raise ValueError, "Length of data samples (features) does " \
                                   "not match the classifier."
 
-        # compute the distance matrix between training and test data with
-        # distances stored row-wise, ie. distances between test sample [0]
-        # and all training samples will end up in row 0
-        dists = self.__dfx(self.__data.samples, data).T
-        if self.ca.is_enabled('distances'):
-            # TODO: theoretically we should have used deepcopy for sa
-            #       here
-            self.ca.distances = Dataset(dists, fa=self.__data.sa.copy())
-
-        # determine the k nearest neighbors per test sample
-        knns = dists.argsort(axis=1)[:, :self.__k]
-
-        # predicted class labels will go here
-        predicted = []
-
         if self.__voting == 'majority':
-            vfx = self.get_majority_vote
+            vfx = self._get_majority_votes
         elif self.__voting == 'weighted':
-            vfx = self.get_weighted_vote
+            vfx = self._get_weighted_votes
         else:
             raise ValueError, "kNN told to perform unknown voting '%s'." \
                   % self.__voting
 
-        # perform voting
-        results = [vfx(knn) for knn in knns]
+        train = self.__data.samples
+        ntrain, ntest = len(train), len(data)
+        k = min(self.__k, ntrain)
+
+        store_dists = self.ca.is_enabled('distances')
+        if store_dists:
+            all_dists = None
+
+        block_size = self.__block_size
+        if block_size is None:
+            # keep blocks of distances below 2**22 elements (32MB)
+            block_size = max(1, 2**22 // max(1, ntrain))
+
+        # votes for all test samples
+        votes = None
+
+        for start in xrange(0, ntest, block_size):
+            block = slice(start, min(ntest, start + block_size))
+            # compute the distance matrix between training and test data
+            # with distances stored row-wise, ie. distances between test
+            # sample [0] and all training samples will end up in row 0
+            dists = self.__dfx(train, data[block]).T
+            if store_dists:
+                if all_dists is None:
+                    all_dists = np.empty((ntest, ntrain), dtype=dists.dtype)
+                all_dists[block] = dists
+
+            # determine the k nearest neighbors per test sample
+            knns = _get_knns(dists, k)
+
+            # perform voting
+            block_votes = vfx(knns)
+            if votes is None:
+                votes = np.empty((ntest, block_votes.shape[1]),
+                                 dtype=block_votes.dtype)
+            votes[block] = block_votes
+
+        if votes is None:
+            # there was no test sample at all
+            votes = np.zeros((0, len(self.__uniquelabels)))
+
+        if store_dists:
+            # TODO: theoretically we should have used deepcopy for sa
+            #       here
+            self.ca.distances = Dataset(all_dists, fa=self.__data.sa.copy())
 
-        # extract predictions
-        predicted = [r[0] for r in results]
+        # extract predictions: class with most votes
+        predicted = list(self.__uniquelabels[votes.argmax(axis=1)])
 
         # store the predictions in the state. Relies on State._setitem to do
         # nothing if the relevant state member is not enabled
         self.ca.predictions = predicted
-        self.ca.estimates = np.array([r[1] for r in results])
+        self.ca.estimates = votes
 
         return predicted
 
 
-    ##REF: Name was automagically refactored
-    def get_majority_vote(self, knn_ids):
+    def _get_votes(self, knns):
+        """Number of neighbors per class for each row of neighbor ids.
+        """
+        nlabels = len(self.__uniquelabels)
+        nrows = len(knns)
+        # offset the label ids of each row to count them all at once
+        ids = self.__label_ids[knns] \
+              + (np.arange(nrows) * nlabels)[:, np.newaxis]
+        return np.bincount(ids.ravel(), minlength=nrows * nlabels) \
+                 .reshape(nrows, nlabels)
+
+
+    def _get_majority_votes(self, knns):
         """Simple voting by choosing the majority of class neighbors.
         """
-        # local bindings
-        _data = self.__data
+        return self._get_votes(knns)
 
-        targets_sa_name = self.params.targets_attr
-        targets_sa = _data.sa[targets_sa_name]
 
-        labels = targets_sa.value
-        uniquelabels = targets_sa.unique
+    def _get_weighted_votes(self, knns):
+        """Vote with classes weighted by the number of samples per class.
+        """
+        # Lazy evaluation
+        if self.__weights is None:
+            # compute the relative proportion of samples belonging to each
+            # class
+            Nlabels = len(self.__label_ids)
+            counts = np.bincount(self.__label_ids,
+                                 minlength=len(self.__uniquelabels))
+            self.__weights = 1.0 - (counts / Nlabels)
+        return self.__weights * self._get_votes(knns)
 
-        # number of occerences for each unique class in kNNs
-        votes = self.__votes_init.copy()
-        for nn in knn_ids:
-            votes[labels[nn]] += 1
 
-        # find the class with most votes
+    ##REF: Name was automagically refactored
+    def get_majority_vote(self, knn_ids):
+        """Simple voting by choosing the majority of class neighbors.
+        """
+        votes = self._get_majority_votes(np.asarray(knn_ids)[np.newaxis])[0]
         # return votes as well to store them in the state
-        if _dict_has_key:
-            # approx 5% faster implementation than below
-            maxvotes = max(votes.iteritems(), key=lambda x:x[1])[0]
-        else:
-            # no key keyword for max in elderly versions
-            maxvotes = max([(v, k) for k, v in votes.iteritems()])[1]
-
-        return maxvotes, \
-                [votes[ul] for ul in uniquelabels] # transform into lists
+        return self.__uniquelabels[votes.argmax()], list(votes)
 
 
     ##REF: Name was automagically refactored
     def get_weighted_vote(self, knn_ids):
         """Vote with classes weighted by the number of samples per class.
         """
-        # local bindings
-        _data = self.__data
-        targets_sa_name = self.params.targets_attr
-        targets_sa = _data.sa[targets_sa_name]
-
-        uniquelabels = targets_sa.unique
-
-        # Lazy evaluation
-        if self.__weights is None:
-            #
-            # It seemed to Yarik that this has to be evaluated just once per
-            # training dataset.
-            #
-            self.__labels = labels = targets_sa.value
-            Nlabels = len(labels)
-            Nuniquelabels = len(uniquelabels)
-
-            # TODO: To get proper speed up for the next line only,
-            #       histogram should be computed
-            #       via sorting + counting "same" elements while reducing.
-            #       Guaranteed complexity is NlogN whenever now it is N^2
-            # compute the relative proportion of samples belonging to each
-            # class (do it in one loop to improve speed and reduce readability
-            self.__weights = \
-                [ 1.0 - ((labels == label).sum() / Nlabels) \
-                    for label in uniquelabels ]
-            self.__weights = dict(zip(uniquelabels, self.__weights))
-
-        labels = self.__labels
-        # number of occerences for each unique class in kNNs
-        votes = self.__votes_init.copy()
-        for nn in knn_ids:
-            votes[labels[nn]] += 1
-
-        # weight votes
-        votes = [ self.__weights[ul] * votes[ul] for ul in uniquelabels]
-
-        # find the class with most votes
+        votes = self._get_weighted_votes(np.asarray(knn_ids)[np.newaxis])[0]
         # return votes as well to store them in the state
-        return uniquelabels[np.asarray(votes).argmax()], \
-               votes
+        return self.__uniquelabels[votes.argmax()], list(votes)
 
 
     def untrain(self):
         """Reset trained state"""
         self.__data = None
+        self.__weights = None
         super(kNN, self).untrain()
@@ -216,9 +216,101 @@ def seq_to_svm_node(x):
 
 
 
+class SVMNodes(object):
+    """Dense samples stored in a single block of libsvm nodes
+
+    The block is allocated and filled in a single call, and it is freed as
+    soon as the last `SVMProblem` (or model trained on it) referencing it
+    is gone.  Problems for arbitrary subsets of the samples (e.g. for
+    cross-validation folds) can share a single block.
+    """
+
+    def __init__(self, samples):
+        """
+        Parameters
+        ----------
+        samples : array
+          Samples (samples x features)
+        """
+        samples = np.ascontiguousarray(samples, dtype=np.double)
+        if not samples.ndim == 2:
+            raise ValueError, "Samples have to be a 2D array (got %i dims)" \
+                  % samples.ndim
+        self.nsamples, self.nfeatures = samples.shape
+        self.block = svmc.svm_node_block_from_numpy(samples)
+        if self.block is None:
+            raise MemoryError, "Cannot allocate nodes for %i samples" \
+                  % self.nsamples
+
+
+    def __repr__(self):
+        return "<SVMNodes: %i x %i>" % (self.nsamples, self.nfeatures)
+
+
+    def matrix(self, rows=None):
+        """Allocate a node matrix for (a subset of) the samples
+
+        Has to be freed with `svm_node_matrix_destroy`.
+
+        Parameters
+        ----------
+        rows : None or sequence of int
+          Indices of the samples.  If None, all samples are used.
+        """
+        if rows is None:
+            rows = np.arange(self.nsamples, dtype=np.intp)
+        else:
+            rows = np.ascontiguousarray(rows, dtype=np.intp)
+            if len(rows) and (rows.min() < 0 or rows.max() >= self.nsamples):
+                raise IndexError, "Sample indices out of bounds"
+        matrix = svmc.svm_node_matrix_from_block(self.block, self.nfeatures,
+                                                 rows)
+        if matrix is None:
+            raise MemoryError, "Cannot allocate node matrix"
+        return matrix
+
+
+    def __copy__(self):
+        # nodes are never modified, hence can be shared
+        return self
+
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+    def __del__(self):
+        if __debug__:
+            debug('CLF_', 'Destroying libsvm.SVMNodes %s' % `self`)
+        if getattr(self, 'block', None) is not None:
+            svmc.svm_node_array_destroy(self.block)
+            self.block = None
+
+
+
 class SVMProblem:
-    def __init__(self, y, x):
+    def __init__(self, y, x, nodes=None, rows=None):
+        """
+        Parameters
+        ----------
+        y : sequence
+          Labels (or regression targets).
+        x : array or sequence
+          Samples.  A 2D array gets converted into a dense block of nodes
+          in a single call, while any other sequence is converted sample
+          by sample (e.g. sequences of mappings for sparse samples).
+        nodes : None or SVMNodes
+          Already converted samples to be used instead of `x`.
+        rows : None or sequence of int
+          Indices of the samples in `nodes` to be used.
+        """
+        if nodes is None and isinstance(x, np.ndarray) and x.ndim == 2:
+            nodes = SVMNodes(x)
+        if nodes is not None:
+            self._init_dense(y, nodes, rows)
+            return
         assert len(y) == len(x)
+        self.nodes = None
         self.prob = prob = svmc.new_svm_problem()
         self.size = size = len(y)
 
@@ -248,19 +340,52 @@ class SVMProblem:
         svmc.svm_problem_x_set(prob, x_matrix)
 
 
+    def _init_dense(self, y, nodes, rows):
+        """Setup the problem from a block of dense nodes without copying
+        """
+        # labels are used in-place, hence we have to keep the array
+        y = np.ascontiguousarray(y, dtype=np.double)
+        size = len(y)
+        if rows is None:
+            nsamples = nodes.nsamples
+        else:
+            nsamples = len(rows)
+        if not size == nsamples:
+            raise ValueError, "Number of labels (%i) does not match the " \
+                  "number of samples (%i)" % (size, nsamples)
+        self.y = y
+        self.size = size
+        self.nodes = nodes
+        self.data = None
+        self.maxlen = nodes.nfeatures
+        self.x_matrix = nodes.matrix(rows)
+        self.y_array = svmc.double_array_from_numpy(y)
+
+        self.prob = prob = svmc.new_svm_problem()
+        svmc.svm_problem_l_set(prob, size)
+        svmc.svm_problem_y_set(prob, self.y_array)
+        svmc.svm_problem_x_set(prob, self.x_matrix)
+
+
     def __repr__(self):
         return "<SVMProblem: size = %s>" % (self.size)
 
 
     def __del__(self):
+        if not hasattr(self, 'prob'):
+            # construction failed
+            return
         if __debug__:
             debug('CLF_', 'Destroying libsvm.SVMProblem %s' % `self`)
 
         svmc.delete_svm_problem(self.prob)
-        svmc.delete_double(self.y_array)
-        for i in range(self.size):
-            svmc.svm_node_array_destroy(self.data[i])
+        if self.nodes is None:
+            svmc.delete_double(self.y_array)
+            for i in range(self.size):
+                svmc.svm_node_array_destroy(self.data[i])
         svmc.svm_node_matrix_destroy(self.x_matrix)
+        # the block of nodes gets freed with the last reference to it
+        self.nodes = None
 
 
 
@@ -391,6 +516,60 @@ class SVMModel:
         return pred, p
 
 
+    def predict_batch(self, x, probability=False):
+        """Predict a whole set of samples in a single call
+
+        Contrary to `predict`, `predict_values` and `predict_probability`,
+        which handle a single sample each, all samples are processed in a
+        single pass through the C library, and the decision values are
+        computed only once per sample.
+
+        Parameters
+        ----------
+        x : array
+          Samples (samples x features).
+        probability : bool
+          Whether to compute probability estimates as well.
+
+        Returns
+        -------
+        labels : array
+          Predicted labels (or values for regression) of all samples.
+        values : array
+          Raw decision values (samples x nr_class*(nr_class-1)/2, or a
+          single column for SVR and one-class models).
+        probabilities : None or array
+          Probability estimates (samples x nr_class) in the order of
+          `labels` of the model.
+        """
+        if probability:
+            # c code will do nothing on wrong type, so we check ourself
+            if self.svm_type in (NU_SVR, EPSILON_SVR, ONE_CLASS):
+                raise TypeError, "probability estimates are only supported " \
+                                 "for classification models"
+            if not self.probability:
+                raise TypeError, "model does not support probabiliy estimates"
+
+        x = np.ascontiguousarray(x, dtype=np.double)
+        if x.ndim == 1:
+            x = x[np.newaxis]
+        nsamples = len(x)
+        if self.svm_type in (NU_SVR, EPSILON_SVR, ONE_CLASS):
+            nvalues = 1
+        else:
+            nvalues = self.nr_class * (self.nr_class - 1) // 2
+
+        labels = np.empty(nsamples, dtype=np.double)
+        values = np.empty((nsamples, nvalues), dtype=np.double)
+        if probability:
+            probabilities = np.empty((nsamples, self.nr_class),
+                                     dtype=np.double)
+        else:
+            probabilities = None
+        svmc.svm_predict_batch(self.model, x, labels, values, probabilities)
+        return labels, values, probabilities
+
+
     ##REF: Name was automagically refactored
     def get_svr_probability(self):
         #leave the Error checking to svm.cpp code
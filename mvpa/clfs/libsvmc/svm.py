@@ -23,6 +23,7 @@ from mvpa.clfs._svmbase import _SVM
 
 from mvpa.clfs.libsvmc import _svm
 from mvpa.kernels.libsvm import LinearLSKernel
+from mvpa.misc.sampleslookup import SamplesCache, get_identified
 from sens import LinearSVMWeights
 
 if __debug__:
@@ -118,6 +119,10 @@ class SVM(_SVM):
         self.__model = None
         """Holds the trained SVM."""
 
+        self.__nodes = None
+        """Samples converted into libsvm nodes by `precompute_samples()`,
+        with their lookup."""
+
 
 
     def _train(self, dataset):
@@ -126,13 +131,16 @@ class SVM(_SVM):
         targets_sa_name = self.params.targets_attr    # name of targets sa
         targets_sa = dataset.sa[targets_sa_name] # actual targets sa
 
-        # libsvm needs doubles
-        src = _data2ls(dataset)
-
         # libsvm cannot handle literal labels
-        labels = self._attrmap.to_numeric(targets_sa.value).tolist()
+        labels = self._attrmap.to_numeric(targets_sa.value)
 
-        svmprob = _svm.SVMProblem(labels, src )
+        try:
+            rows = self._lookup_nodes(dataset)
+            svmprob = _svm.SVMProblem(labels, None, nodes=self.__nodes[0],
+                                      rows=rows)
+        except KeyError:
+            # libsvm needs doubles; converted nodes go away with the model
+            svmprob = _svm.SVMProblem(labels, _data2ls(dataset))
 
         # Translate few params
         TRANSLATEDICT = {'epsilon': 'eps',
@@ -189,12 +197,19 @@ class SVM(_SVM):
         # libsvm needs doubles
         src = _data2ls(data)
         ca = self.ca
+        model = self.model
 
-        predictions = [ self.model.predict(p) for p in src ]
+        # all samples are handled in a single call, which also provides
+        # the decision values underlying the predictions
+        probability = ca.is_enabled("probabilities") \
+                      and model.probability \
+                      and not model.svm_type in (NU_SVR, EPSILON_SVR, ONE_CLASS)
+        predictions, values, probabilities = \
+                     model.predict_batch(src, probability=probability)
 
         if ca.is_enabled('estimates'):
             if self.__is_regression__:
-                estimates = [ self.model.predict_values_raw(p)[0] for p in src ]
+                estimates = values[:, 0]
             else:
                 # if 'trained_targets' are literal they have to be mapped
                 if np.issubdtype(self.ca.trained_targets.dtype, 'c'):
@@ -203,42 +218,33 @@ class SVM(_SVM):
                 else:
                     trained_targets = self.ca.trained_targets
                 nlabels = len(trained_targets)
-                # XXX We do duplicate work. model.predict calls
-                # predict_values_raw internally and then does voting or
-                # thresholding. So if speed becomes a factor we might
-                # want to move out logic from libsvm over here to base
-                # predictions on obtined values, or adjust libsvm to
-                # spit out values from predict() as well
                 if nlabels == 2:
                     # Apperently libsvm reorders labels so we need to
                     # track (1,0) values instead of (0,1) thus just
                     # lets take negative reverse
-                    estimates = [ self.model.predict_values(p)[(trained_targets[1],
-                                                            trained_targets[0])]
-                               for p in src ]
-                    if len(estimates) > 0:
-                        if __debug__:
-                            debug("SVM",
-                                  "Forcing estimates to be ndarray and reshaping"
-                                  " them into 1D vector")
-                        estimates = np.asarray(estimates).reshape(len(estimates))
+                    estimates = values[:, 0]
+                    if model.labels[0] != trained_targets[1]:
+                        estimates = -estimates
                 else:
                     # In multiclass we return dictionary for all pairs
                     # of labels, since libsvm does 1-vs-1 pairs
-                    estimates = [ self.model.predict_values(p) for p in src ]
+                    labels = model.labels
+                    pairs = [(labels[i], labels[j])
+                             for i in xrange(len(labels))
+                             for j in xrange(i + 1, len(labels))]
+                    rpairs = [(j, i) for i, j in pairs]
+                    estimates = [dict(zip(pairs, v) + zip(rpairs, -v))
+                                 for v in values]
             ca.estimates = estimates
 
         if ca.is_enabled("probabilities"):
-            # XXX Is this really necesssary? yoh don't think so since
-            # assignment to ca is doing the same
-            #self.probabilities = [ self.model.predict_probability(p)
-            #                       for p in src ]
-            try:
-                ca.probabilities = [ self.model.predict_probability(p)
-                                         for p in src ]
-            except TypeError:
+            if probabilities is None:
                 warning("Current SVM %s doesn't support probability " %
                         self + " estimation.")
+            else:
+                ca.probabilities = [(float(model.labels[p.argmax()]),
+                                     dict(zip(model.labels, p)))
+                                    for p in probabilities]
         return predictions
 
 
@@ -263,14 +269,80 @@ class SVM(_SVM):
         return s
 
 
+    def precompute_samples(self, *datasets):
+        """Convert all samples into libsvm nodes once
+
+        The samples of the first given dataset are converted, and
+        consecutive training on any subset of them (e.g. in all folds of a
+        cross-validation, or for all permutations of the targets) reuses
+        these nodes as long as the features do not change.  Like with
+        `CachedKernel.precompute()`, the datasets are not modified, and a
+        dataset lacking `origids` is cached as a shallow copy with
+        `origids` assigned (see `precompute_kernels()`, which returns
+        it).  Calling it without any dataset, or `untrain()`, releases the
+        cached nodes.
+
+        Returns
+        -------
+        bool
+          Whether the samples were (re)converted.
+        """
+        datasets = [ds for ds in datasets if ds is not None]
+        if not len(datasets):
+            self.__nodes = None
+            return False
+        ds = datasets[0]
+        if self.__nodes is not None:
+            try:
+                self._lookup_nodes(ds)
+                return False
+            except KeyError:
+                pass
+        ds = get_identified([ds])[0]
+        if __debug__:
+            debug('SVM', "Converting %i samples into libsvm nodes"
+                  % ds.nsamples)
+        self.__nodes = (_svm.SVMNodes(_data2ls(ds)), SamplesCache(ds))
+        return True
+
+
+    def _lookup_nodes(self, ds):
+        """Indices of the samples of `ds` in the cached nodes
+
+        None is returned if the samples are identical to the cached ones.
+        Raises KeyError if samples are not cached, the cached samples were
+        modified in-place since (see `SamplesCache`), or the features
+        differ from the cached ones (e.g. after a feature selection).
+        """
+        if self.__nodes is None:
+            raise KeyError, 'No samples are cached'
+        nodes, cache = self.__nodes
+        if cache.is_modified():
+            raise KeyError, 'Cached samples were modified'
+        if ds.nfeatures != nodes.nfeatures:
+            raise KeyError, 'Features of the dataset differ from the cached ones'
+        if ds.samples is cache.samples:
+            return None
+        return cache(ds)
+
+
+    def _pretrain(self, dataset, untrain=True):
+        """Keep precomputed samples while untraining prior to training
+        """
+        nodes = self.__nodes
+        super(SVM, self)._pretrain(dataset, untrain=untrain)
+        self.__nodes = nodes
+
+
     def untrain(self):
-        """Untrain libsvm's SVM: forget the model
+        """Untrain libsvm's SVM: forget the model and precomputed samples
         """
         if __debug__ and "SVM" in debug.active:
             debug("SVM", "Untraining %s and destroying libsvm model" % self)
         super(SVM, self).untrain()
         del self.__model
         self.__model = None
+        self.__nodes = None
 
     model = property(fget=lambda self: self.__model)
     """Access to the SVM model."""
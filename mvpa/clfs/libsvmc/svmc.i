@@ -248,4 +248,184 @@ void svm_node_matrix_destroy(struct svm_node **matrix)
 	free(matrix);
 }
 
+/* Convert a contiguous (samples x features) array of doubles into a single
+ * block of dense node arrays (features + 1 nodes per sample, including the
+ * terminating node).  Returns NULL if allocation failed.
+ */
+struct svm_node *svm_node_block_from_numpy(PyObject *samples)
+{
+	PyArrayObject *x = (PyArrayObject*) samples;
+	int nsamples = (int) PyArray_DIM(x, 0);
+	int nfeatures = (int) PyArray_DIM(x, 1);
+	int i, j;
+	struct svm_node *block = (struct svm_node *)
+		malloc(sizeof(struct svm_node) * nsamples * (nfeatures + 1));
+	if (!block)
+		return NULL;
+
+	const double *data = (const double *) PyArray_DATA(x);
+	struct svm_node *node = block;
+	for (i = 0; i < nsamples; i++)
+	{
+		for (j = 0; j < nfeatures; j++, node++)
+		{
+			node->index = j;
+			node->value = *data++;
+		}
+		node->index = -1;
+		node->value = 0.0;
+		node++;
+	}
+	return block;
+}
+
+/* Node matrix pointing to rows (1D contiguous array of npy_intp) of a
+ * block created by svm_node_block_from_numpy().  Only the array of
+ * pointers is allocated, the nodes are shared with the block.
+ */
+struct svm_node **svm_node_matrix_from_block(struct svm_node *block,
+											 int nfeatures, PyObject *rows)
+{
+	PyArrayObject *r = (PyArrayObject*) rows;
+	int size = (int) PyArray_DIM(r, 0);
+	const npy_intp *ids = (const npy_intp *) PyArray_DATA(r);
+	int i;
+	struct svm_node **matrix = (struct svm_node **)
+		malloc(sizeof(struct svm_node *) * (size > 0 ? size : 1));
+	if (!matrix)
+		return NULL;
+	for (i = 0; i < size; i++)
+		matrix[i] = block + ids[i] * (nfeatures + 1);
+	return matrix;
+}
+
+/* Pointer to the data of a contiguous array of doubles, without any copy.
+ * The array has to be kept alive as long as the pointer is used.
+ */
+double *double_array_from_numpy(PyObject *array)
+{
+	return (double *) PyArray_DATA((PyArrayObject*) array);
+}
+
+/* Predict all samples of a (samples x features) array of doubles at once.
+ * Labels are stored in `labels` (samples), raw decision values in
+ * `dec_values` (samples x #decision values) and probability estimates in
+ * `probabilities` (samples x nr_class).  The latter two might be None.
+ * The node array is allocated only once and labels are derived from the
+ * decision values, hence those are computed only once per sample.
+ */
+PyObject *svm_predict_batch(const struct svm_model *model,
+							PyObject *samples, PyObject *labels,
+							PyObject *dec_values, PyObject *probabilities)
+{
+	PyObject *arrays[4] = {samples, labels, dec_values, probabilities};
+	int ndims[4] = {2, 1, 2, 2};
+	int i, j, pos;
+	for (i = 0; i < 4; i++)
+	{
+		if (arrays[i] == Py_None && i > 1)
+			continue;
+		if (!PyArray_Check(arrays[i])
+			|| PyArray_NDIM((PyArrayObject*) arrays[i]) != ndims[i]
+			|| PyArray_TYPE((PyArrayObject*) arrays[i]) != NPY_DOUBLE
+			|| !PyArray_ISCARRAY((PyArrayObject*) arrays[i]))
+		{
+			PyErr_SetString(PyExc_TypeError,
+							"Contiguous arrays of doubles are required.");
+			return NULL;
+		}
+	}
+
+	PyArrayObject *x = (PyArrayObject*) samples;
+	int nsamples = (int) PyArray_DIM(x, 0);
+	int nfeatures = (int) PyArray_DIM(x, 1);
+	int nr_class = model->nr_class;
+	int svm_type = model->param.svm_type;
+	int is_classifier = !(svm_type == ONE_CLASS
+						  || svm_type == EPSILON_SVR
+						  || svm_type == NU_SVR);
+	int ndec = is_classifier ? nr_class * (nr_class - 1) / 2 : 1;
+
+	if (PyArray_DIM((PyArrayObject*) labels, 0) != nsamples
+		|| (dec_values != Py_None
+			&& (PyArray_DIM((PyArrayObject*) dec_values, 0) != nsamples
+				|| PyArray_DIM((PyArrayObject*) dec_values, 1) != ndec))
+		|| (probabilities != Py_None
+			&& (PyArray_DIM((PyArrayObject*) probabilities, 0) != nsamples
+				|| PyArray_DIM((PyArrayObject*) probabilities, 1) != nr_class)))
+	{
+		PyErr_SetString(PyExc_ValueError,
+						"Output arrays do not match the samples and model.");
+		return NULL;
+	}
+
+	struct svm_node *node =
+		(struct svm_node *) malloc(sizeof(struct svm_node) * (nfeatures + 1));
+	double *dec = (double *) malloc(sizeof(double) * ndec);
+	int *vote = (int *) malloc(sizeof(int) * nr_class);
+	if (!node || !dec || !vote)
+	{
+		free(node);
+		free(dec);
+		free(vote);
+		return PyErr_NoMemory();
+	}
+	/* indices are identical for all samples */
+	for (j = 0; j < nfeatures; j++)
+		node[j].index = j;
+	node[nfeatures].index = -1;
+	node[nfeatures].value = 0.0;
+
+	double *label = (double *) PyArray_DATA((PyArrayObject*) labels);
+	for (i = 0; i < nsamples; i++)
+	{
+		const double *row = (const double *) PyArray_GETPTR2(x, i, 0);
+		for (j = 0; j < nfeatures; j++)
+			node[j].value = row[j];
+
+		double *d = dec;
+		if (dec_values != Py_None)
+			d = (double *) PyArray_GETPTR2((PyArrayObject*) dec_values, i, 0);
+		svm_predict_values(model, node, d);
+
+		if (!is_classifier)
+		{
+			if (svm_type == ONE_CLASS)
+				label[i] = (d[0] > 0) ? 1 : -1;
+			else
+				label[i] = d[0];
+		}
+		else
+		{
+			/* the same voting as done by svm_predict() */
+			int k, vote_max_idx = 0;
+			for (k = 0; k < nr_class; k++)
+				vote[k] = 0;
+			pos = 0;
+			for (k = 0; k < nr_class; k++)
+				for (j = k + 1; j < nr_class; j++)
+				{
+					if (d[pos++] > 0)
+						++vote[k];
+					else
+						++vote[j];
+				}
+			for (k = 1; k < nr_class; k++)
+				if (vote[k] > vote[vote_max_idx])
+					vote_max_idx = k;
+			label[i] = model->label[vote_max_idx];
+		}
+
+		if (probabilities != Py_None)
+			svm_predict_probability(model, node,
+				(double *) PyArray_GETPTR2((PyArrayObject*) probabilities, i, 0));
+	}
+
+	free(node);
+	free(dec);
+	free(vote);
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
 %}
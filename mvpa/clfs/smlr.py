@@ -110,6 +110,12 @@ class SMLR(Classifier):
              doc="""Seed to be used to initialize random generator, might be
              used to replicate the run""")
 
+    warm_start = Parameter(False, allowedtype='bool',
+             doc="""Whether to start the optimization from the weights of the
+             previous training, if the features and labels did not change
+             (e.g. for overlapping cross-validation folds).  Weights set
+             with `set_init_weights` are used regardless of this flag.""")
+
     unsparsify = Parameter(False, allowedtype='bool',
              doc="""***EXPERIMENTAL*** Whether to unsparsify the weights via
              regression. Note that it likely leads to worse classifier
@@ -145,6 +151,10 @@ class SMLR(Classifier):
         """Just the weights, without the biases"""
         self.__biases = None
         """The biases, will remain none if has_bias is False"""
+        self.__init_weights = None
+        """Weights to start the next training from"""
+        self.__precomputed = None
+        """Training terms precomputed for a regularization path"""
 
 
     ##REF: Name was automagically refactored
@@ -291,19 +301,23 @@ class SMLR(Classifier):
         return cycles
 
 
-    def _train(self, dataset):
-        """Train the classifier using `dataset` (`Dataset`).
+    def _prepare_training(self, dataset):
+        """Compute everything which depends on the training data only
+
+        Returns
+        -------
+        tuple
+          Samples (with a column for the bias term if needed), unique
+          labels, one-of-M coded targets, auto-correlation of the features
+          and their cross-correlation with the targets.
         """
         targets_sa_name = self.params.targets_attr    # name of targets sa
         targets_sa = dataset.sa[targets_sa_name] # actual targets sa
 
         # Process the labels to turn into 1 of N encoding
         uniquelabels = targets_sa.unique
-        labels = _label2oneofm(targets_sa.value, uniquelabels)
-        self._ulabels = uniquelabels.copy()
-
-        Y = labels
-        M = len(self._ulabels)
+        Y = _label2oneofm(targets_sa.value, uniquelabels)
+        M = len(uniquelabels)
 
         # get the dataset information into easy vars
         X = dataset.samples
@@ -317,7 +331,6 @@ class SMLR(Classifier):
             X = np.hstack((X, np.ones((X.shape[0], 1), dtype=X.dtype)))
 
         if self.params.implementation.upper() == 'C':
-            _stepwise_regression = _cStepwiseRegression
             #
             # TODO: avoid copying to non-contig arrays, use strides in ctypes?
             if not (X.flags['C_CONTIGUOUS'] and X.flags['ALIGNED']):
@@ -332,18 +345,11 @@ class SMLR(Classifier):
                     debug("SMLR_", "Converting data to double")
                 # must cast to double
                 X = X.astype(np.double)
-
-        # set the feature dimensions
-        elif self.params.implementation.upper() == 'PYTHON':
-            _stepwise_regression = self._python_stepwise_regression
-        else:
+        elif not self.params.implementation.upper() == 'PYTHON':
             raise ValueError, \
                   "Unknown implementation %s of stepwise_regression" % \
                   self.params.implementation
 
-        # set the feature dimensions
-        ns, nd = X.shape
-
         # decide the size of weights based on num classes estimated
         if self.params.fit_all_weights:
             c_to_fit = M
@@ -353,13 +359,75 @@ class SMLR(Classifier):
         # Precompute what we can
         auto_corr = ((M-1.)/(2.*M))*(np.sum(X*X, 0))
         XY = np.dot(X.T, Y[:, :c_to_fit])
+
+        return X, uniquelabels, Y, auto_corr, XY
+
+
+    def _get_init_weights(self, nfeatures, ulabels, c_to_fit):
+        """Weights to start the optimization from
+
+        Explicitly provided initial weights take precedence over the
+        previous training results (if `warm_start` is enabled).  Weights
+        of non-matching shape or labels get ignored.
+        """
+        nd = nfeatures + int(self.params.has_bias)
+        w = np.zeros((nd, c_to_fit), dtype=np.double)
+
+        if self.__init_weights is not None:
+            init_weights, init_biases, init_labels = self.__init_weights
+            # explicit initial weights are used only once
+            self.__init_weights = None
+        elif self.params.warm_start and self.__weights is not None:
+            init_weights, init_biases, init_labels = \
+                          self.__weights, self.__biases, self._ulabels
+        else:
+            return w
+
+        if init_weights.shape != (nfeatures, c_to_fit) \
+               or (init_labels is not None
+                   and not np.all(init_labels == ulabels)):
+            if __debug__:
+                debug("SMLR_", "Ignoring initial weights of shape %s "
+                      "for training with %d features and %d classes to fit"
+                      % (init_weights.shape, nfeatures, c_to_fit))
+            return w
+
+        if __debug__:
+            debug("SMLR_", "Warm start from %d non-zero weights"
+                  % (init_weights != 0).sum())
+        w[:nfeatures] = init_weights
+        if self.params.has_bias and init_biases is not None:
+            w[-1] = init_biases
+        return w
+
+
+    def _train(self, dataset):
+        """Train the classifier using `dataset` (`Dataset`).
+        """
+        if self.__precomputed is not None \
+               and self.__precomputed[0] is dataset:
+            # reuse the terms computed for the regularization path
+            X, uniquelabels, Y, auto_corr, XY = self.__precomputed[1]
+        else:
+            X, uniquelabels, Y, auto_corr, XY = \
+               self._prepare_training(dataset)
+
+        if self.params.implementation.upper() == 'C':
+            _stepwise_regression = _cStepwiseRegression
+        else:
+            _stepwise_regression = self._python_stepwise_regression
+
+        M = len(uniquelabels)
+        c_to_fit = XY.shape[1]
         lambda_over_2_auto_corr = (self.params.lm/2.)/auto_corr
 
         # set starting values
-        w = np.zeros((nd, c_to_fit), dtype=np.double)
-        Xw = np.zeros((ns, c_to_fit), dtype=np.double)
-        E = np.ones((ns, c_to_fit), dtype=np.double)
-        S = M*np.ones(ns, dtype=np.double)
+        w = self._get_init_weights(dataset.nfeatures, uniquelabels, c_to_fit)
+        self._ulabels = uniquelabels.copy()
+        Xw = np.dot(X, w)
+        E = np.exp(Xw)
+        # the class which is not fitted contributes exp(0)
+        S = E.sum(axis=1) + (M - c_to_fit)
 
         # set verbosity
         if __debug__:
@@ -414,6 +482,94 @@ class SMLR(Classifier):
                   "min:max(data)=%f:%f, got min:max(w)=%f:%f" %
                   (np.min(X), np.max(X), np.min(w), np.max(w)))
 
+
+    def set_init_weights(self, weights=None, biases=None, feature_ids=None):
+        """Provide the weights to start the next training from
+
+        Starting from the solution of a similar problem (e.g. the
+        previous step of a feature elimination, or an overlapping
+        cross-validation fold) usually requires far less cycles to
+        converge than starting from all-zero weights.  The initial
+        weights are used for a single training only, and are ignored if
+        they do not match the training dataset.
+
+        Parameters
+        ----------
+        weights : None or ndarray
+          Weights of shape (nfeatures x nclasses to fit), i.e. in the
+          layout of `SMLR.weights`.  If None, the weights of the currently
+          trained classifier are used.
+        biases : None or ndarray
+          Biases to start from.  If None and no `weights` were provided,
+          the biases of the currently trained classifier are used.
+        feature_ids : None or sequence
+          If provided, only the weights of these features are taken, e.g.
+          those which survived a feature selection step.
+        """
+        labels = None
+        if weights is None:
+            if self.__weights is None:
+                raise RuntimeError, \
+                      "SMLR has to be trained to provide initial weights"
+            weights, labels = self.__weights, self._ulabels
+            if biases is None:
+                biases = self.__biases
+        weights = np.asanyarray(weights)
+        if feature_ids is not None:
+            weights = weights[feature_ids]
+        # copy, since the original weights might be changed in-place
+        self.__init_weights = (np.array(weights, dtype=np.double),
+                               biases, labels)
+
+
+    def train_path(self, dataset, lms, callback=None):
+        """Train on the same dataset for a sequence of penalty terms
+
+        Every fit is started from the weights of the previous one, and all
+        terms which do not depend on `lm` are computed just once.  Hence
+        exploring a regularization path is considerably cheaper than
+        training separate classifiers.  Starting with the largest `lm`
+        (i.e. the sparsest solution) is usually the fastest.
+
+        After the call the classifier is trained with the last value of
+        `lm`, which is also kept as the value of the parameter.
+
+        Parameters
+        ----------
+        dataset : Dataset
+          Training data.
+        lms : sequence of float
+          Values of the penalty term lambda to fit.
+        callback : None or callable
+          Called with the trained classifier after each fit, e.g. to
+          assess the generalization to some validation dataset.
+
+        Returns
+        -------
+        list
+          Values returned by `callback` for each `lm`, or copies of the
+          weights (see `SMLR.weights`) if no `callback` was provided.
+        """
+        self.__precomputed = (dataset, self._prepare_training(dataset))
+        results = []
+        try:
+            for i, lm in enumerate(lms):
+                if i > 0:
+                    self.set_init_weights()
+                self.params.lm = lm
+                if __debug__:
+                    debug('SMLR', "Training for lm=%g (%d out of %d)"
+                          % (lm, i + 1, len(lms)))
+                self.train(dataset)
+                if callback is None:
+                    results.append(self.__weights.copy())
+                else:
+                    results.append(callback(self))
+        finally:
+            self.__precomputed = None
+        return results
+
+
     def _unsparsify_weights(self, samples, weights):
         """Unsparsify weights via least squares regression."""
         # allocate for the new weights
@@ -14,6 +14,10 @@ import numpy as np
 
 from mvpa.base import externals, warning
 from mvpa.misc.state import ClassWithCollections, StateVariable
+from mvpa.misc.parallel import get_nproc, shared_array, chunk_queue, \
+     iter_queue, run_workers
+from mvpa.kernels.base import precompute_kernels
+from mvpa.datasets.miscfx import get_permutations
 
 if __debug__:
     from mvpa.base import debug
@@ -23,16 +27,42 @@ class Nonparametric(object):
     """Non-parametric 1d distribution -- derives cdf based on stored values.
 
     Introduced to complement parametric distributions present in scipy.stats.
+
+    Examples
+    --------
+    >>> d = Nonparametric([3, 1, 2, 2])
+    >>> d.cdf([0, 1, 2, 2.5, 3])
+    array([ 0.  ,  0.25,  0.75,  0.75,  1.  ])
+
+    With `elementwise` set, each column holds the samples of a separate
+    distribution, and the CDF of all of them is evaluated at once:
+
+    >>> d = Nonparametric([[1, 10], [2, 20], [3, 30]], elementwise=True)
+    >>> d.cdf([2, 5])
+    array([ 0.66666667,  0.        ])
     """
 
-    def __init__(self, dist_samples):
+    def __init__(self, dist_samples, elementwise=False):
         """
         Parameters
         ----------
         dist_samples : ndarray
           Samples to be used to assess the distribution.
+        elementwise : bool
+          If True, `dist_samples` has to be a 2D array with the samples of
+          independent distributions in its columns.  `cdf()` then has to
+          be called with one value per column.
         """
-        self._dist_samples = np.ravel(dist_samples)
+        dist_samples = np.asanyarray(dist_samples)
+        if elementwise:
+            if not len(dist_samples.shape) == 2:
+                raise ValueError("Elementwise distributions require 2D "
+                                 "samples (got shape %s)"
+                                 % (dist_samples.shape,))
+            self._dist_samples = np.sort(dist_samples, axis=0)
+        else:
+            self._dist_samples = np.sort(np.ravel(dist_samples))
+        self._elementwise = elementwise
 
 
     @staticmethod
@@ -43,7 +73,47 @@ class Nonparametric(object):
     def cdf(self, x):
         """Returns the cdf value at `x`.
         """
-        return np.vectorize(lambda v:(self._dist_samples <= v).mean())(x)
+        x = np.asanyarray(x)
+        dist_samples = self._dist_samples
+        if self._elementwise:
+            if not x.shape == dist_samples.shape[1:]:
+                raise ValueError("Distribution was fit for %d elements, but "
+                                 "queried with values of shape %s"
+                                 % (dist_samples.shape[1], x.shape))
+            counts = _searchsorted_columns(dist_samples, x)
+        else:
+            counts = np.searchsorted(dist_samples, x, side='right')
+        cdf = counts / float(len(dist_samples))
+        # NaN is not less or equal to anything
+        if np.isscalar(cdf) or not cdf.shape:
+            if np.isnan(x):
+                cdf = 0.0
+        else:
+            cdf[np.isnan(x)] = 0.0
+        return cdf
+
+
+def _searchsorted_columns(a, v):
+    """Columnwise `np.searchsorted(a[:, i], v[i], side='right')`
+
+    A bisection over all columns of `a` (sorted along the first axis) at
+    once, to avoid a Python loop over the columns.
+    """
+    nrows, ncols = a.shape
+    cols = np.arange(ncols)
+    lo = np.zeros(ncols, dtype=int)
+    hi = np.empty(ncols, dtype=int)
+    hi.fill(nrows)
+    while True:
+        active = lo < hi
+        if not active.any():
+            break
+        mid = (lo + hi) // 2
+        # clip to stay within array bounds for already finished columns
+        le = a[np.minimum(mid, nrows - 1), cols] <= v
+        lo = np.where(active & le, mid + 1, lo)
+        hi = np.where(active & ~le, mid, hi)
+    return lo
 
 
 def _pvalue(x, cdf_func, tail, return_tails=False, name=None):
@@ -202,7 +272,7 @@ class MCNullDist(NullDist):
                                  doc='Samples obtained for each permutation')
 
     def __init__(self, dist_class=Nonparametric, permutations=100,
-                 chunks_attr=None, **kwargs):
+                 chunks_attr=None, nproc=1, **kwargs):
         """Initialize Monte-Carlo Permutation Null-hypothesis testing
 
         Parameters
@@ -219,6 +289,11 @@ class MCNullDist(NullDist):
             If not None, permutes labels within the chunks,
             i.e. blocks of data having the same value of
             `chunks_attr`.
+        nproc : None or int
+          How many processes to use for computing the measure on the
+          permuted datasets.  If None, all available CPU cores are used.
+          Worker processes are forked and store their results directly
+          in shared memory.
         """
         NullDist.__init__(self, **kwargs)
 
@@ -230,11 +305,14 @@ class MCNullDist(NullDist):
         distribution."""
 
         self.__chunks_attr = chunks_attr
+        self.__nproc = nproc
 
     def __repr__(self, prefixes=[]):
         prefixes_ = ["permutations=%s" % self.__permutations]
         if self.__chunks_attr:
             prefixes_ += ['chunks_attr=%r' % self.__chunks_attr]
+        if self.__nproc != 1:
+            prefixes_ += ['nproc=%r' % self.__nproc]
         if self._dist_class != Nonparametric:
             prefixes_.insert(0, 'dist_class=%s' % `self._dist_class`)
         return super(MCNullDist, self).__repr__(
@@ -255,44 +333,54 @@ class MCNullDist(NullDist):
           If provided measure is assumed to be a `TransferError` and
           working and validation dataset are passed onto it.
         """
-        dist_samples = []
+        permutations = self.__permutations
+        chunks_attr = self.__chunks_attr
+        if chunks_attr:
+            if not chunks_attr in wdata.sa:
+                raise ValueError, \
+                      "There is no sa named %r in %s, thus no permutation " \
+                      "is possible" % (chunks_attr, wdata)
+            chunks = wdata.sa[chunks_attr].value
+        else:
+            chunks = None
+
+        # only targets get permuted, hence cached kernels can be computed
+        # once for all permutations
+        wdata, vdata = precompute_kernels([measure], [wdata, vdata])
+
+        # all permutations are generated upfront, so they do not depend
+        # on the order in which they get processed
+        perms = get_permutations(chunks, permutations,
+                                 nsamples=wdata.nsamples)
+
+        # the first one is computed here to figure out the shape of the
+        # results
+        res = self._proc_permutation(measure, wdata, vdata, perms[0])
+        dist_samples = np.empty((permutations,) + res.shape,
+                                dtype=res.dtype)
         """Holds the values for randomized labels."""
-
-        # estimate null-distribution
-        for p in xrange(self.__permutations):
-            # new permutation all the time
-            # but only permute the training data and keep the testdata constant
-            #
-            if __debug__:
-                debug('STATMC', "Doing %i permutations: %i" \
-                      % (self.__permutations, p+1), cr=True)
-
-            # TODO this really needs to be more clever! If data samples are
-            # shuffled within a class it really makes no difference for the
-            # classifier, hence the number of permutations to estimate the
-            # null-distribution of transfer errors can be reduced dramatically
-            # when the *right* permutations (the ones that matter) are done.
-            permuted_wdata = wdata.copy('shallow')
-            permuted_wdata.permute_targets(chunks_attr=self.__chunks_attr)
-
-            # decide on the arguments to measure
-            if not vdata is None:
-                measure_args = [vdata, permuted_wdata]
-            else:
-                measure_args = [permuted_wdata]
-
-            # compute and store the measure of this permutation
-            # assume it has `TransferError` interface
-            res = measure(*measure_args)
-            res = np.asanyarray(res)
-            dist_samples.append(res)
+        dist_samples[0] = res
+
+        nproc = get_nproc(self.__nproc)
+        if nproc > 1 and permutations > 2:
+            # workers store their results directly in shared memory
+            shared = shared_array(dist_samples.shape, dtype=dist_samples.dtype)
+            shared[0] = res
+            queue = chunk_queue(permutations - 1, nproc)
+            run_workers(self._proc_permutations,
+                        (queue, measure, wdata, vdata, perms, shared),
+                        nproc)
+            dist_samples[:] = shared
+        else:
+            self._proc_permutations([(0, permutations - 1)], measure,
+                                    wdata, vdata, perms, dist_samples)
 
         if __debug__:
             debug('STATMC', '')
 
 
         # store samples
-        self.ca.dist_samples = dist_samples = np.asarray(dist_samples)
+        self.ca.dist_samples = dist_samples
 
         # fit distribution per each element
 
@@ -304,9 +392,13 @@ class MCNullDist(NullDist):
         if nshape == 1:
             dist_samples = dist_samples[:, np.newaxis]
 
-        # fit per each element.
-        # XXX could be more elegant? may be use np.vectorize?
         dist_samples_rs = dist_samples.reshape((shape[0], -1))
+        if self._dist_class is Nonparametric:
+            # no need to fit anything -- evaluate all elements at once
+            self._dist = Nonparametric(dist_samples_rs, elementwise=True)
+            return
+
+        # fit per each element.
         dist = []
         for samples in dist_samples_rs.T:
             params = self._dist_class.fit(samples)
@@ -317,6 +409,49 @@ class MCNullDist(NullDist):
         self._dist = dist
 
 
+    def _proc_permutations(self, blocks, measure, wdata, vdata, perms,
+                           dist_samples):
+        """Compute the measure for blocks of permutations
+
+        The first permutation is skipped since it is computed separately.
+        Results are stored into `dist_samples`.
+        """
+        if not isinstance(blocks, list):
+            blocks = iter_queue(blocks)
+        permutations = self.__permutations
+        for start, stop in blocks:
+            for p in xrange(start + 1, stop + 1):
+                if __debug__:
+                    debug('STATMC', "Doing %i permutations: %i" \
+                          % (permutations, p+1), cr=True)
+                dist_samples[p] = self._proc_permutation(measure, wdata,
+                                                         vdata, perms[p])
+
+
+    def _proc_permutation(self, measure, wdata, vdata, perm):
+        """Compute the measure for a single permutation"""
+        # TODO this really needs to be more clever! If data samples are
+        # shuffled within a class it really makes no difference for the
+        # classifier, hence the number of permutations to estimate the
+        # null-distribution of transfer errors can be reduced dramatically
+        # when the *right* permutations (the ones that matter) are done.
+        # new permutation all the time
+        # but only permute the training data and keep the testdata constant
+        permuted_wdata = wdata.copy('shallow')
+        permuted_wdata.sa['targets'].value = wdata.sa.targets[perm]
+
+        # decide on the arguments to measure
+        if not vdata is None:
+            measure_args = [vdata, permuted_wdata]
+        else:
+            measure_args = [permuted_wdata]
+
+        # compute and store the measure of this permutation
+        # assume it has `TransferError` interface
+        res = measure(*measure_args)
+        return np.asanyarray(res)
+
+
     def cdf(self, x):
         """Return value of the cumulative distribution function at `x`.
         """
@@ -335,6 +470,10 @@ class MCNullDist(NullDist):
         # assure x is a 1D array now
         x = x.reshape((-1,))
 
+        if isinstance(self._dist, Nonparametric):
+            # all elements at once
+            return self._dist.cdf(x).reshape(xshape)
+
         if len(self._dist) != len(x):
             raise ValueError, 'Distribution was fit for structure with %d' \
                   ' elements, whenever now queried with %d elements' \
@@ -125,7 +125,19 @@ class SummaryStatistics(object):
         # targets, since otherwise we are getting doubles for unknown at a
         # given moment labels
         nonetype = type(None)
-        for i in xrange(len(targets)):
+        nconvert = len(targets)
+        if isinstance(targets, np.ndarray) \
+               and isinstance(predictions, np.ndarray) \
+               and targets.dtype.kind != 'O' and predictions.dtype.kind != 'O':
+            if targets.dtype != predictions.dtype \
+                   and targets.dtype.kind in 'biuf' \
+                   and predictions.dtype.kind in 'biuf':
+                # convert all at once
+                predictions = predictions.astype(targets.dtype)
+            if targets.dtype.kind == predictions.dtype.kind:
+                # nothing else to convert in homogeneous arrays
+                nconvert = 0
+        for i in xrange(nconvert):
             t1, t2 = type(targets[i]), type(predictions[i])
             # if there were no prediction made - leave None, otherwise
             # convert to appropriate type
@@ -242,6 +254,63 @@ class SummaryStatistics(object):
     sets = property(lambda self:self.__sets)
 
 
+def _rank_aucs(targets, estimates, setids, nsets):
+    """Area under the ROC curve computed from the ranks of the estimates
+
+    All labels (columns) and sets are handled at once.  Ties get average
+    ranks, i.e. count half.
+
+    Parameters
+    ----------
+    targets : array of bool
+      (samples x labels) whether a sample belongs to a label.
+    estimates : array
+      (samples x labels) estimates for each label.
+    setids : array of int
+      Set each sample belongs to.
+    nsets : int
+      Number of sets.
+
+    Returns
+    -------
+    (sets x labels) array of AUCs, NaN if a set has no positive or negative
+    samples for a label.
+    """
+    nsamples, nlabels = estimates.shape
+    cols = np.arange(nlabels)
+    # sort the estimates within each set (stable sorts keep the order of
+    # the values while grouping by sets)
+    order = np.argsort(estimates, axis=0, kind='mergesort')
+    order = order[np.argsort(setids[order], axis=0, kind='mergesort'), cols]
+    values = estimates[order, cols]
+    groups = setids[order]
+    # boundaries of blocks of tied values
+    start = np.ones((nsamples, nlabels), dtype=bool)
+    start[1:] = (values[1:] != values[:-1]) | (groups[1:] != groups[:-1])
+    stop = np.ones((nsamples, nlabels), dtype=bool)
+    stop[:-1] = start[1:]
+    idx = np.arange(nsamples)[:, None]
+    first = np.maximum.accumulate(np.where(start, idx, 0), axis=0)
+    last = np.minimum.accumulate(np.where(stop, idx, nsamples)[::-1],
+                                 axis=0)[::-1]
+    nall = np.bincount(setids, minlength=nsets)
+    offsets = np.concatenate(([0], np.cumsum(nall)[:-1]))
+    ranks = (first + last) / 2.0 - offsets[groups] + 1
+    # rank sums of the positives per set and label
+    positives = targets[order, cols]
+    bins = (groups * nlabels + cols)[positives]
+    npos = np.bincount(bins, minlength=nsets * nlabels).reshape(nsets, nlabels)
+    ranksum = np.bincount(bins, weights=ranks[positives],
+                          minlength=nsets * nlabels).reshape(nsets, nlabels)
+    nneg = nall[:, None] - npos
+    aucs = np.empty((nsets, nlabels))
+    aucs.fill(np.nan)
+    valid = (npos > 0) & (nneg > 0)
+    aucs[valid] = (ranksum - npos * (npos + 1) / 2.0)[valid] \
+                  / (npos * nneg)[valid]
+    return aucs
+
+
 class ROCCurve(object):
     """Generic class for ROC curve computation and plotting
     """
@@ -258,126 +327,102 @@ class ROCCurve(object):
         """
         self._labels = labels
         self._sets = sets
-        self.__computed = False
+        self._sets_wv = None
+        self._aucs = None
+        self._ROCs = None
 
 
-    def _compute(self):
-        """Lazy computation if needed
+    def _get_sets_wv(self):
+        """Sets which have estimates in the shape we can handle
+
+        Estimates get converted into (samples x labels) arrays.
         """
-        if self.__computed:
-            return
-        # local bindings
-        labels = self._labels
-        Nlabels = len(labels)
+        if self._sets_wv is not None:
+            return self._sets_wv
+        Nlabels = len(self._labels)
         sets = self._sets
 
-        # Handle degenerate cases politely
-        if Nlabels < 2:
-            warning("ROC was asked to be evaluated on data with %i"
-                    " labels which is a degenerate case.")
-            self._ROCs = []
-            self._aucs = []
-            return
-
-        # take sets which have values in the shape we can handle
         ##REF: Name was automagically refactored
         def _check_values(set_):
-            """Check if values are 'acceptable'"""
-            if len(set_)<3: return False
+            """Estimates as 2D array if they are 'acceptable', or None"""
+            if len(set_)<3: return None
             x = set_[2]
-            # TODO: OPT: need optimization
-            if (x is None) or len(x) == 0: return False          # undefined
-            for v in x:
-                try:
-                    if Nlabels <= 2 and np.isscalar(v):
-                        continue
-                    if (isinstance(v, dict) or # not dict for pairs
-                        ((Nlabels>=2) and len(v)!=Nlabels) # 1 per each label for multiclass
-                        ): return False
-                except Exception, e:
-                    # Something else which is not supported, like
-                    # in shogun interface we don't yet extract values per each label or
-                    # in pairs in the case of built-in multiclass
-                    if __debug__:
-                        debug('ROC', "Exception %s while checking "
-                              "either %s are valid labels" % (str(e), x))
-                    return False
-            return True
-
-        sets_wv = filter(_check_values, sets)
+            if (x is None) or len(x) == 0: return None          # undefined
+            try:
+                # dicts (for pairs) or anything ragged would fail
+                x = np.asarray(x, dtype=float)
+            except (TypeError, ValueError), e:
+                # Something else which is not supported, like
+                # in shogun interface we don't yet extract values per each label or
+                # in pairs in the case of built-in multiclass
+                if __debug__:
+                    debug('ROC', "Exception %s while checking "
+                          "either %s are valid labels" % (str(e), x))
+                return None
+            if x.ndim == 1 and Nlabels <= 2:
+                # bring all values to the same 'shape': 1 value per each
+                # label. In binary classifier, if only a single value is
+                # provided, add inverted one for 0th label
+                rangev = np.min(x) + np.max(x)
+                return np.column_stack((rangev - x, x))
+            if x.ndim == 2 and x.shape[1] == Nlabels:
+                # 1 per each label for multiclass
+                return x
+            return None
+
+        sets_wv = []
+        for s in sets:
+            estimates = _check_values(s)
+            if estimates is not None:
+                sets_wv.append((s[0], s[1], estimates))
         # check if all had values, if not -- complain
         Nsets_wv = len(sets_wv)
         if Nsets_wv > 0 and len(sets) != Nsets_wv:
             warning("Only %d sets have values assigned from %d sets. "
                     "ROC estimates might be incorrect." %
                     (Nsets_wv, len(sets)))
-        # bring all values to the same 'shape':
-        #  1 value per each label. In binary classifier, if only a single
-        #  value is provided, add '0' for 0th label 'value'... it should
-        #  work taking drunk Yarik logic ;-)
-        # yoh: apparently it caused problems whenever we had just a single
-        #      unique label in the sets. Introduced handling for
-        #      NLabels == 1
-        for iset,s in enumerate(sets_wv):
-            # we will do inplace modification, thus go by index
-            estimates = s[2]
-            # we would need it to be a list to reassign element with a list
-            if isinstance(estimates, np.ndarray) and len(estimates.shape)==1:
-                # XXX ??? so we are going away from inplace modifications?
-                estimates = list(estimates)
-            rangev = None
-            for i in xrange(len(estimates)):
-                v = estimates[i]
-                if np.isscalar(v):
-                    if Nlabels == 1:
-                        # ensure the right dimensionality
-                        estimates[i] = np.array(v, ndmin=2)
-                    elif Nlabels == 2:
-                        def last_el(x):
-                            """Helper function. Returns x if x is scalar, and
-                            last element if x is not (ie list/tuple)"""
-                            if np.isscalar(x): return x
-                            else:             return x[-1]
-                        if rangev is None:
-                            # we need to figure out min/max estimates
-                            # to invert for the 0th label
-                            estimates_ = [last_el(x) for x in estimates]
-                            rangev = np.min(estimates_) + np.max(estimates_)
-                        estimates[i] = [rangev - v, v]
-                    else:
-                        raise ValueError, \
-                              "Cannot have a single 'value' for multiclass" \
-                              " classification. Got %s" % (v)
-                elif len(v) != Nlabels:
-                    raise ValueError, \
-                          "Got %d estimates whenever there is %d labels" % \
-                          (len(v), Nlabels)
-            # reassign possibly adjusted estimates
-            sets_wv[iset] = (s[0], s[1], np.asarray(estimates))
+        self._sets_wv = sets_wv
+        return sets_wv
 
 
+    def _compute(self):
+        """Lazy computation of AUCs if needed
+        """
+        if self._aucs is not None:
+            return
+        # local bindings
+        labels = self._labels
+        Nlabels = len(labels)
+
+        # Handle degenerate cases politely
+        if Nlabels < 2:
+            warning("ROC was asked to be evaluated on data with %i"
+                    " labels which is a degenerate case." % Nlabels)
+            self._aucs = []
+            return
+
+        sets_wv = self._get_sets_wv()
+        if not len(sets_wv):
+            self._aucs = []
+            return
+
         # we need to estimate ROC per each label
         # XXX order of labels might not correspond to the one among 'estimates'
         #     which were used to make a decision... check
-        rocs, aucs = [], []             # 1 per label
-        for i,label in enumerate(labels):
-            aucs_pl = []
-            ROCs_pl = []
-            for s in sets_wv:
-                targets_pl = (np.asanyarray(s[0]) == label).astype(int)
-                # XXX we might unify naming between AUC/ROC
-                ROC = AUCErrorFx()
-                aucs_pl += [ROC([np.asanyarray(x)[i] for x in s[2]], targets_pl)]
-                ROCs_pl.append(ROC)
-            if len(aucs_pl)>0:
-                rocs += [ROCs_pl]
-                aucs += [nanmean(aucs_pl)]
-                #aucs += [np.mean(aucs_pl)]
-
+        targets = []
+        for s in sets_wv:
+            t = np.asanyarray(s[0])
+            targets_pl = np.zeros((len(t), Nlabels), dtype=bool)
+            for i, label in enumerate(labels):
+                targets_pl[:, i] = t == label
+            targets.append(targets_pl)
+        setids = np.repeat(np.arange(len(sets_wv)),
+                           [len(s[2]) for s in sets_wv])
+        aucs = _rank_aucs(np.concatenate(targets),
+                          np.concatenate([s[2] for s in sets_wv]),
+                          setids, len(sets_wv))
         # store results within the object
-        self._ROCs =  rocs
-        self._aucs = aucs
-        self.__computed = True
+        self._aucs = list(nanmean(aucs, axis=0))
 
 
     @property
@@ -391,7 +436,22 @@ class ROCCurve(object):
     @property
     ##REF: Name was automagically refactored
     def rocs(self):
-        self._compute()
+        """ROC curves (`AUCErrorFx` instances) per label and set
+        """
+        if self._ROCs is None:
+            rocs = []
+            sets_wv = self._get_sets_wv()
+            if len(self._labels) >= 2 and len(sets_wv):
+                for i, label in enumerate(self._labels):
+                    ROCs_pl = []
+                    for s in sets_wv:
+                        targets_pl = (np.asanyarray(s[0]) == label).astype(int)
+                        # XXX we might unify naming between AUC/ROC
+                        ROC = AUCErrorFx()
+                        ROC(s[2][:, i], targets_pl)
+                        ROCs_pl.append(ROC)
+                    rocs.append(ROCs_pl)
+            self._ROCs = rocs
         return self._ROCs
 
 
@@ -404,8 +464,6 @@ class ROCCurve(object):
         externals.exists("pylab", raise_=True)
         import pylab as pl
 
-        self._compute()
-
         labels = self._labels
         # select only rocs for the given label
         rocs = self.rocs[label_index]
@@ -480,8 +538,6 @@ class ConfusionMatrix(SummaryStatistics):
          Optional set of predictions
          """
 
-        SummaryStatistics.__init__(self, **kwargs)
-
         if labels == None:
             labels = []
         self.__labels = labels
@@ -490,6 +546,13 @@ class ConfusionMatrix(SummaryStatistics):
         """Mapping from original into given labels"""
         self.__matrix = None
         """Resultant confusion matrix"""
+        # labels seen in the sets get integer codes, and votes
+        # (predictions x targets) are counted in the order of the codes
+        self._reset_counts()
+        self.__ROC = None
+        self.__roc_computed = False
+
+        SummaryStatistics.__init__(self, **kwargs)
 
 
     # XXX might want to remove since summaries does the same, just without
@@ -502,6 +565,93 @@ class ConfusionMatrix(SummaryStatistics):
                                 sets=[x]) for x in self.sets]
 
 
+    def add(self, targets, predictions, estimates=None):
+        """Add new results to the set of known results
+
+        Votes of the set are counted right away.
+        """
+        SummaryStatistics.add(self, targets, predictions, estimates)
+        self._count_sets()
+
+
+    def reset(self):
+        """Cleans summary -- all data/sets are wiped out
+        """
+        SummaryStatistics.reset(self)
+        self._reset_counts()
+
+
+    def _reset_counts(self):
+        """Forget all counted votes and the labels they were counted for
+        """
+        # new containers since they might be shared with a shallow copy
+        self.__codes = {}
+        self.__coded_labels = []
+        self.__counts = np.zeros((0, 0), dtype=int)
+        self.__ncounted = 0
+
+
+    def _encode(self, values):
+        """Integer codes of the labels in `values`
+
+        New labels get new codes assigned.
+        """
+        try:
+            uvalues, inverse = np.unique(values, return_inverse=True)
+        except TypeError:
+            # e.g. unorderable values -- go one by one
+            uvalues = []
+            inverse = np.empty(len(values), dtype=int)
+            index = {}
+            for i, v in enumerate(values):
+                if not v in index:
+                    index[v] = len(uvalues)
+                    uvalues.append(v)
+                inverse[i] = index[v]
+        codes = self.__codes
+        coded_labels = self.__coded_labels
+        ucodes = np.empty(len(uvalues), dtype=int)
+        for i, v in enumerate(uvalues):
+            code = codes.get(v, None)
+            if code is None:
+                code = codes[v] = len(coded_labels)
+                coded_labels.append(v)
+            ucodes[i] = code
+        return ucodes[inverse]
+
+
+    def _count_sets(self):
+        """Count votes of all sets which were not counted yet
+        """
+        sets = self.sets
+        if len(sets) < self.__ncounted:
+            # sets were wiped out in the meanwhile
+            self._reset_counts()
+        for set_ in sets[self.__ncounted:]:
+            targets, predictions = set_[:2]
+            ntargets = len(targets)
+            if isinstance(targets, np.ndarray) \
+                   and isinstance(predictions, np.ndarray) \
+                   and targets.dtype == predictions.dtype:
+                values = np.concatenate((targets, predictions))
+            else:
+                values = np.empty(ntargets + len(predictions), dtype=object)
+                values[:ntargets] = list(targets)
+                values[ntargets:] = list(predictions)
+            codes = self._encode(values)
+            ncodes = len(self.__coded_labels)
+            counts = np.bincount(codes[ntargets:] * ncodes + codes[:ntargets],
+                                 minlength=ncodes * ncodes
+                                 ).reshape(ncodes, ncodes)
+            # previous counts might cover less labels
+            nprev = len(self.__counts)
+            counts[:nprev, :nprev] += self.__counts
+            # counts are not modified in-place, since they might be shared
+            # with a shallow copy
+            self.__counts = counts
+        self.__ncounted = len(sets)
+
+
     def _compute(self):
         """Actually compute the confusion matrix based on all the sets"""
 
@@ -514,16 +664,10 @@ class ConfusionMatrix(SummaryStatistics):
                         % (self.__class__.__name__, id(self)))
 
 
-        # TODO: BinaryClassifier might spit out a list of predictions for each
-        # value need to handle it... for now just keep original labels
-        try:
-            # figure out what labels we have
-            labels = \
-                list(reduce(lambda x, y: x.union(Set(y[0]).union(Set(y[1]))),
-                            self.sets,
-                            Set(self.__labels)))
-        except:
-            labels = self.__labels
+        # count all sets which were not counted yet
+        self._count_sets()
+        # figure out what labels we have
+        labels = list(Set(self.__labels).union(self.__coded_labels))
 
         # Check labels_map if it was provided if it covers all the labels
         labels_map = self.__labels_map
@@ -550,30 +694,18 @@ class ConfusionMatrix(SummaryStatistics):
         labels.sort()
         self.__labels = labels          # store the recomputed labels
 
-        Nlabels, Nsets = len(labels), len(self.sets)
+        Nlabels = len(labels)
 
         if __debug__:
             debug("CM", "Got labels %s" % labels)
 
-        # Create a matrix for all votes
-        mat_all = np.zeros( (Nsets, Nlabels, Nlabels), dtype=int )
-
-        # create total number of samples of each label counts
-        # just for convinience I guess since it can always be
-        # computed from mat_all
-        counts_all = np.zeros( (Nsets, Nlabels) )
-
-        # reverse mapping from label into index in the list of labels
+        # votes of all sets are summed up already, they just need to be
+        # brought into the order of the labels
         rev_map = dict([ (x[1], x[0]) for x in enumerate(labels)])
-        for iset, set_ in enumerate(self.sets):
-            for t,p in zip(*set_[:2]):
-                mat_all[iset, rev_map[p], rev_map[t]] += 1
-
-
-        # for now simply compute a sum of votes across different sets
-        # we might do something more sophisticated later on, and this setup
-        # should easily allow it
-        self.__matrix = np.sum(mat_all, axis=0)
+        ids = [rev_map[l] for l in self.__coded_labels]
+        self.__matrix = np.zeros((Nlabels, Nlabels), dtype=int)
+        if len(ids):
+            self.__matrix[np.ix_(ids, ids)] = self.__counts
         self.__Nsamples = np.sum(self.__matrix, axis=0)
         self.__Ncorrect = sum(np.diag(self.__matrix))
 
@@ -610,28 +742,52 @@ class ConfusionMatrix(SummaryStatistics):
         stats['ACC'] = np.sum(TP)/(1.0*np.sum(stats['P']))
         stats['ACC%'] = stats['ACC'] * 100.0
 
-        #
-        # ROC computation if available
+        # compute mean stats
+        for k,v in stats.items():
+            stats['mean(%s)' % k] = np.mean(v)
+
+        self._stats.update(stats)
+        # ROC gets computed only when needed
+        self.__ROC = None
+        self.__roc_computed = False
+
+
+    def _compute_roc(self):
+        """ROC computation if available
+        """
+        self.compute()
+        if self.__roc_computed:
+            return
+        labels = self.__labels
+        Nlabels = len(labels)
         ROC = ROCCurve(labels=labels, sets=self.sets)
         aucs = ROC.aucs
         if len(aucs)>0:
-            stats['AUC'] = aucs
             if len(aucs) != Nlabels:
                 raise RuntimeError, \
                       "We must got a AUC per label. Got %d instead of %d" % \
                       (len(aucs), Nlabels)
-            self.ROC = ROC
+            self.__ROC = ROC
         else:
             # we don't want to provide ROC if it is bogus
-            stats['AUC'] = [np.nan] * Nlabels
-            self.ROC = None
+            aucs = [np.nan] * Nlabels
+            self.__ROC = None
+        self._stats['AUC'] = aucs
+        self._stats['mean(AUC)'] = np.mean(aucs)
+        self.__roc_computed = True
 
 
-        # compute mean stats
-        for k,v in stats.items():
-            stats['mean(%s)' % k] = np.mean(v)
+    @property
+    def stats(self):
+        self._compute_roc()
+        return self._stats
 
-        self._stats.update(stats)
+
+    @property
+    def ROC(self):
+        """`ROCCurve` of the estimates, or None if not available"""
+        self._compute_roc()
+        return self.__ROC
 
 
     ##REF: Name was automagically refactored
@@ -1481,6 +1637,45 @@ class TransferError(ClassifierError):
         return error
 
 
+    def call_batched(self, testdataset, trainingdataset, neighborhoods):
+        """Compute transfer errors for many subsets of features at once.
+
+        Only classifiers providing `predict_batched()` (e.g. `GNB`) are
+        supported.  Such a classifier is trained on all features of
+        `trainingdataset` (if given) and then provides predictions for all
+        subsets of features.
+
+        Parameters
+        ----------
+        testdataset : Dataset
+        trainingdataset : Dataset or None
+        neighborhoods : NeighborhoodIndex
+          Subsets of features, e.g. searchlight spheres.
+
+        Returns
+        -------
+        ndarray or None
+          Transfer error for each subset of features.  None if the
+          classifier does not support it, or if any state variable or a
+          NULL distribution requires each subset to be processed
+          separately.
+        """
+        clf = self.clf
+        ca = self.ca
+        if not hasattr(clf, 'predict_batched') \
+           or self.__null_dist is not None \
+           or ca.is_enabled('confusion') \
+           or ca.is_enabled('training_confusion') \
+           or ca.is_enabled('samples_error'):
+            return None
+
+        self._precall(testdataset, trainingdataset)
+        predictions = clf.predict_batched(testdataset, neighborhoods)
+        testtargets = testdataset.sa[clf.params.targets_attr].value
+        return np.array([self.__errorfx(p, testtargets)
+                         for p in predictions.T])
+
+
     def _postcall(self, vdata, wdata=None, error=None):
         """
         """
@@ -26,6 +26,28 @@ if __debug__:
     from mvpa.base import debug
 
 
+def _get_appended_mapper(pmapper, mapper):
+    """Chain of `pmapper` and `mapper` without modifying `pmapper`
+    """
+    if isinstance(pmapper, ChainMapper):
+        mappers = [m for m in pmapper]
+        inspace = pmapper.get_inspace()
+    else:
+        mappers = [pmapper]
+        inspace = None
+    # merge slicer?
+    lastmapper = mappers[-1]
+    if isinstance(lastmapper, FeatureSliceMapper) \
+       and lastmapper.is_mergable(mapper):
+        lastmapper = copy.copy(lastmapper)
+        lastmapper += mapper
+        mappers[-1] = lastmapper
+    else:
+        mappers.append(mapper)
+    return ChainMapper(mappers, inspace=inspace)
+
+
+
 class Dataset(AttrDataset):
     __doc__ = AttrDataset.__doc__
 
@@ -101,6 +123,27 @@ class Dataset(AttrDataset):
         return ds
 
 
+    def get_view(self, samples=None, features=None):
+        # if we get an slicing array for feature selection and it is *not* 1D
+        # try feeding it through the mapper (if there is any)
+        if isinstance(features, np.ndarray) and len(features.shape) > 1 \
+           and self.a.has_key('mapper'):
+            features = self.a.mapper.forward1(features)
+
+        view = super(Dataset, self).get_view(samples, features)
+
+        if features is not None and 'mapper' in view.a:
+            # the mapper is shared with this dataset, hence must not be
+            # modified in place
+            view.a.mapper = _get_appended_mapper(
+                                view.a.mapper,
+                                FeatureSliceMapper(
+                                    features, dshape=self.samples.shape[1:]))
+        return view
+
+    get_view.__doc__ = AttrDataset.get_view.__doc__
+
+
     def item(self):
         """Provide the first element of samples array.
 
@@ -14,7 +14,8 @@ import numpy as np
 from mvpa.datasets import Dataset
 from mvpa.misc.io import DataReader
 
-def eep_dataset(samples, targets=None, chunks=None):
+def eep_dataset(samples, targets=None, chunks=None, trials=None,
+                channels=None):
     """Create a dataset using an EEP binary file as source.
 
     EEP files are used by *eeprobe* a software for analysing even-related
@@ -31,6 +32,12 @@ def eep_dataset(samples, targets=None, chunks=None):
     targets, chunks : sequence or scalar or None
       Values are pass through to `Dataset.from_wizard()`. See its documentation
       for more information.
+    trials : None or sequence of int
+      Ids of the trials to include in the dataset. All trials are used if
+      None.
+    channels : None or sequence of int or str
+      Channels to include in the dataset, given by id or name. All channels
+      are used if None.
 
     Returns
     -------
@@ -38,7 +45,9 @@ def eep_dataset(samples, targets=None, chunks=None):
       Besides is usual attributes (e.g. targets, chunks, and a mapper). The
       returned dataset also includes feature attributes associating each same
       with a channel (by id), and a specific timepoint -- based on information
-      read from the EEP data.
+      read from the EEP data.  Only the selected trials and channels are
+      read from the file.  Without any selection, the samples of the
+      dataset are still mapped from the file and get read on access.
     """
     if isinstance(samples, str):
         # open the eep file
@@ -50,10 +59,18 @@ def eep_dataset(samples, targets=None, chunks=None):
         raise ValueError("eep_dataset takes the filename of an "
               "EEP file or a EEPBin object as 'samples' argument.")
 
+    if trials is None and channels is None:
+        data = eb.data
+    else:
+        data = eb.get_data(trials=trials, channels=channels)
+    channelids = eb.channels
+    if not channels is None:
+        channelids = [channelids[i] for i in eb.get_channel_ids(channels)]
+
     # init dataset
     ds = Dataset.from_channeltimeseries(
-            eb.data, targets=targets, chunks=chunks, t0=eb.t0, dt=eb.dt,
-            channelids=eb.channels)
+            data, targets=targets, chunks=chunks, t0=eb.t0, dt=eb.dt,
+            channelids=channelids)
     return ds
 
 
@@ -84,14 +101,23 @@ class EEPBin(DataReader):
         .
         <trial2,channel1,sample1>,<trial2,channel1,sample2>,...
         <trial2,channel2,sample1>,<trial2,channel2,sample2>,...
+
+    By default, the data block is not read into memory, but mapped from the
+    file (see `numpy.memmap`), hence only those parts of the data are read
+    from disk, which are actually accessed (e.g. via `get_data()`).  The
+    mapping is copy-on-write, hence the data can be modified in memory, but
+    the file itself is never changed.
     """
-    def __init__(self, source):
-        """Read EEP file and store header and data.
+    def __init__(self, source, mmap=True):
+        """Read EEP file header and provide access to the data.
 
         Parameters
         ----------
         source : str
           Filename.
+        mmap : bool
+          If True, the data is mapped from the file. Otherwise it is read
+          into memory at once.
         """
         # init base class
         DataReader.__init__(self)
@@ -100,7 +126,8 @@ class EEPBin(DataReader):
         # non-critical header components stored in temp dict
         hdr = {}
 
-        infile = open(source, "r")
+        # binary mode to get the proper offset of the data block
+        infile = open(source, "rb")
 
         # read file the end of header of EOF
         while True:
@@ -135,14 +162,68 @@ class EEPBin(DataReader):
         if hdr.has_key('channels'):
             self._props['channels'] = hdr['channels'].split()
 
-        self._data = \
-            np.reshape(np.fromfile(infile, dtype='f'), \
-                (nsamples,
+        # the data block follows the header immediately
+        self._props['offset'] = infile.tell()
+        shape = (nsamples,
                  self._props['nchannels'],
-                 self._props['ntimepoints']))
+                 self._props['ntimepoints'])
+
+        if mmap and np.prod(shape) > 0:
+            # cleanup first, since the map does not need the file object
+            infile.close()
+            # copy-on-write: in-place modifications (e.g. zscore) only
+            # affect memory, never the file
+            self._data = np.memmap(source, dtype='f', mode='c',
+                                   offset=self._props['offset'],
+                                   shape=shape)
+        else:
+            self._data = np.reshape(np.fromfile(infile, dtype='f'), shape)
+            # cleanup
+            infile.close()
+
+
+    def get_channel_ids(self, channels):
+        """Translate channel names into channel ids.
+
+        Parameters
+        ----------
+        channels : sequence of int or str
+          Channels given by id or name.
+        """
+        return [self._props['channels'].index(c)
+                    if isinstance(c, basestring) else c
+                        for c in channels]
+
+
+    def get_data(self, trials=None, channels=None):
+        """Read a subset of trials and/or channels.
 
-        # cleanup
-        infile.close()
+        Only the selected parts of the data are read from the file.
+
+        Parameters
+        ----------
+        trials : None or sequence of int
+          Trial ids. All trials are selected if None.
+        channels : None or sequence of int or str
+          Channels given by id or name. All channels are selected if None.
+
+        Returns
+        -------
+        ndarray
+          (trials x channels x timepoints)
+        """
+        if trials is None:
+            trials = slice(None)
+        if channels is None:
+            channels = slice(None)
+        else:
+            channels = self.get_channel_ids(channels)
+        if isinstance(trials, slice) or isinstance(channels, slice):
+            data = self._data[trials, channels]
+        else:
+            # select channels of each trial, without touching the others
+            data = self._data[np.asarray(trials)[:, None], channels]
+        return np.array(data)
 
 
     nchannels = property(fget=lambda self: self._props['nchannels'],
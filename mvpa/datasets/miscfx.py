@@ -169,9 +169,113 @@ def get_samples_per_chunk_label(dataset):
     return count
 
 
+def _get_random_state(seed):
+    """Random number generator to use for a given seed
+
+    If no `seed` is given, NumPy's global generator is used, hence
+    results can still be reproduced by seeding it (e.g. via MVPA_SEED).
+    """
+    if seed is None:
+        return np.random
+    if isinstance(seed, np.random.RandomState):
+        return seed
+    return np.random.RandomState(seed)
+
+
+def iter_permutations(chunks=None, nsamples=None, npermutations=None,
+                      batchsize=None, seed=None):
+    """Generate sample indices for within-chunk permutations
+
+    Samples get grouped by `chunks` only once (using a stable sort), and
+    each permutation is then obtained by sorting random keys offset by the
+    group id.  Hence any number of permutations can be drawn without
+    touching a dataset again.
+
+    Parameters
+    ----------
+    chunks : None or array
+      If not None, samples are only permuted within blocks of samples
+      sharing the same value of `chunks`.
+    nsamples : None or int
+      Number of samples, if no `chunks` are given.
+    npermutations : None or int
+      Total number of permutations to generate.  If None, the generator
+      never stops.
+    batchsize : None or int
+      If None, each permutation is yielded as an index array of length
+      `nsamples`.  Otherwise up to `batchsize` permutations are yielded at
+      once as a (batchsize x nsamples) array.
+    seed : None or int or RandomState
+      Seed for a private random number generator to get reproducible
+      permutations.  If None, NumPy's global generator is used.
+
+    Examples
+    --------
+    >>> chunks = [0, 0, 1, 1, 1]
+    >>> perms = list(iter_permutations(chunks, npermutations=3, seed=1))
+    >>> len(perms)
+    3
+    >>> [sorted(p[:2]) + sorted(p[2:]) for p in perms] == [range(5)] * 3
+    True
+    """
+    rng = _get_random_state(seed)
+    if chunks is None:
+        if nsamples is None:
+            raise ValueError("Either chunks or nsamples must be provided.")
+        order, groups = None, None
+    else:
+        chunks = np.asanyarray(chunks)
+        nsamples = len(chunks)
+        order = np.argsort(chunks, kind='mergesort')
+        groups = np.unique(chunks[order], return_inverse=True)[1]
+
+    ndone = 0
+    while npermutations is None or ndone < npermutations:
+        nbatch = batchsize or 1
+        if npermutations is not None:
+            nbatch = min(nbatch, npermutations - ndone)
+        keys = rng.random_sample((nbatch, nsamples))
+        if order is None:
+            perms = np.argsort(keys, axis=1)
+        else:
+            # shuffle within the groups by sorting random keys offset by
+            # the group id
+            keys += groups
+            perms = np.empty(keys.shape, dtype=int)
+            perms[:, order] = order[np.argsort(keys, axis=1)]
+        ndone += nbatch
+        if batchsize is None:
+            yield perms[0]
+        else:
+            yield perms
+
+
+def get_permutations(chunks, npermutations, nsamples=None, seed=None):
+    """Sample indices for a number of permutations at once
+
+    Parameters
+    ----------
+    chunks : None or array
+      If not None, samples are only permuted within blocks of samples
+      sharing the same value of `chunks`.
+    npermutations : int
+    nsamples : None or int
+      Number of samples, if no `chunks` are given.
+    seed : None or int or RandomState
+      Seed for a private random number generator.
+
+    Returns
+    -------
+    (npermutations x nsamples) array
+    """
+    return iter_permutations(chunks, nsamples=nsamples,
+                             npermutations=npermutations,
+                             batchsize=npermutations, seed=seed).next()
+
+
 @datasetmethod
 def permute_targets(dataset, targets_attr='targets', chunks_attr='chunks',
-                    assure_permute=False):
+                    assure_permute=False, seed=None):
     """Permute the targets of a Dataset.
 
     A new permuted set of targets is assigned to the dataset, replacing
@@ -193,6 +297,9 @@ def permute_targets(dataset, targets_attr='targets', chunks_attr='chunks',
     assure_permute : bool, optional
       If True, assures that targets are permuted, i.e. any one is
       different from the original one
+    seed : None or int or RandomState
+      Seed for a private random number generator.  If None, NumPy's
+      global generator is used.
 
     Returns
     -------
@@ -208,40 +315,33 @@ def permute_targets(dataset, targets_attr='targets', chunks_attr='chunks',
     # local binding
     targets = dataset.sa[targets_attr].value
 
-    # now scramble
     if chunks_attr:
         if chunks_attr in dataset.sa:
             chunks = dataset.sa[chunks_attr].value
-
-            ptargets = np.zeros(targets.shape, dtype=targets.dtype)
-
-            for o in dataset.sa[chunks_attr].unique:
-                ptargets[chunks == o] = \
-                    np.random.permutation(targets[chunks == o])
         else:
             raise ValueError, \
                   "There is no sa named %r in %s, thus no permutation is " \
                   "possible" % (chunks_attr, dataset)
     else:
-        ptargets = np.random.permutation(targets)
+        chunks = None
+
+    # draw a couple of candidates at once if a changed assignment is
+    # required
+    nperms = (1, 10)[int(bool(assure_permute))]
+    ptargets = targets[get_permutations(chunks, nperms,
+                                        nsamples=len(targets), seed=seed)]
 
     if assure_permute:
-        if not (ptargets != targets).any():
-            if not (assure_permute is True):
-                if assure_permute == 1:
-                    raise RuntimeError, \
-                          "Cannot assure permutation of targets %s for " \
-                          "some reason for dataset %s and chunks_attr=%r. " \
-                          "Should not happen" % \
-                          (targets, dataset, chunks_attr)
-            else:
-                assure_permute = 11 # make 10 attempts
-            if __debug__:
-                debug("DS",  "Recalling permute to assure different targets")
-            permute_targets(dataset,
-                            targets_attr=targets_attr,
-                            chunks_attr=chunks_attr,
-                            assure_permute=assure_permute-1)
+        changed = (ptargets != targets).reshape((nperms, -1)).any(axis=1)
+        if not changed.any():
+            raise RuntimeError, \
+                  "Cannot assure permutation of targets %s for " \
+                  "some reason for dataset %s and chunks_attr=%r. " \
+                  "Should not happen" % \
+                  (targets, dataset, chunks_attr)
+        ptargets = ptargets[changed.argmax()]
+    else:
+        ptargets = ptargets[0]
 
     # reassign to the dataset
     dataset.sa[targets_attr].value = ptargets
@@ -296,14 +396,12 @@ def get_nsamples_per_attr(dataset, attr):
     -------
     dict with the number of samples (value) per unique attribute (key).
     """
-    uniqueattr = dataset.sa[attr].unique
+    uniqueattr, inverse = np.unique(dataset.sa[attr].value,
+                                    return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(uniqueattr))
 
     # use dictionary to cope with arbitrary targets
-    result = dict(zip(uniqueattr, [ 0 ] * len(uniqueattr)))
-    for l in dataset.sa[attr].value:
-        result[l] += 1
-
-    return result
+    return dict(zip(uniqueattr, counts.tolist()))
 
 
 @datasetmethod
@@ -43,6 +43,29 @@ from mvpa.datasets.miscfx import coarsen_chunks, permute_targets, random_samples
 if __debug__:
     from mvpa.base import debug
 
+
+def _in1d(values, spec):
+    """Boolean mask of `values` elements which are present in `spec`"""
+    spec = np.asanyarray(spec)
+    if spec.ndim == 0:
+        spec = spec[None]
+    if values.dtype == object or spec.dtype == object:
+        # rely on Python comparison for arbitrary objects
+        spec = list(spec)
+        return np.array([v in spec for v in values], dtype='bool')
+    if not len(spec):
+        return np.zeros(len(values), dtype='bool')
+    return np.in1d(values, spec)
+
+
+def _spec2key(spec):
+    """Hashable representation of a split specification"""
+    if spec is None or isinstance(spec, (int, long, basestring)):
+        return spec
+    return tuple([_spec2key(s) for s in spec]) \
+           if operator.isSequenceType(spec) else spec
+
+
 class Splitter(object):
     """Base class of dataset splitters.
 
@@ -132,6 +155,10 @@ class Splitter(object):
         self.__noslicing = noslicing
         self._reverse = reverse
         self.discard_boundary = discard_boundary
+        # cache of sample ids per split definition, valid for the
+        # stored content of the split attribute
+        self.__cache_attr = None
+        self.__cache = {}
 
         # we don't check it, thus no reason to make it private.
         # someone might find it useful to change post creation
@@ -286,6 +313,96 @@ class Splitter(object):
         -------
         Tuple of splitted datasets.
         """
+        # split data: return None if no samples are left
+        # XXX: Maybe it should simply return an empty dataset instead, but
+        #      keeping it this way for now, to maintain current behavior
+        split_datasets = []
+        for idx in self._get_split_indices(dataset, specs):
+            if idx is None:
+                split_datasets.append(None)
+            else:
+                # check whether we can do slicing instead of advanced
+                # indexing -- if we can split the dataset without causing
+                # the data to be copied, its is quicker and leaner.
+                # However, it only works if we have a contiguous chunk or
+                # regular step sizes for the samples to be split
+                split_datasets.append(dataset[self._filter2slice(idx)])
+
+        return split_datasets
+
+
+    def split_indices(self, dataset):
+        """Generate the splits of a dataset as sample indices.
+
+        This is a lightweight alternative to calling the splitter: no
+        datasets are created, but for each split a list of integer
+        arrays with the ids of the samples in each part of the split
+        (e.g. training and testing) is yielded. A part without any
+        samples is `None`. The order of parts respects `reverse`.
+        Post-processing of split datasets (`nperlabel`, `permute`,
+        `nrunspersplit`) is not applied.
+
+        Examples
+        --------
+        >>> from mvpa.datasets.base import dataset_wizard
+        >>> ds = dataset_wizard(np.zeros((4, 1)), targets=1,
+        ...                     chunks=[0, 0, 1, 1])
+        >>> for train, test in NFoldSplitter().split_indices(ds):
+        ...     print train, test
+        [2 3] [0 1]
+        [0 1] [2 3]
+        """
+        for split in self.splitcfg(dataset):
+            indices = self._get_split_indices(dataset, split)
+            if self._reverse:
+                yield indices[::-1]
+            else:
+                yield indices
+
+
+    def _get_split_indices(self, dataset, specs):
+        """Sample ids of all parts of a split defined by `specs`.
+
+        Ids get computed only once per split definition and are cached
+        as long as the splitter is called with datasets that have the
+        very same content of the split attribute (e.g. in permutation
+        testing).
+        """
+        splitattr_data = dataset.sa[self.__splitattr].value
+        cached = self.__cache_attr
+        if cached is None or not (
+            cached is splitattr_data
+            or (cached.shape == splitattr_data.shape
+                and cached.dtype == splitattr_data.dtype
+                and np.all(cached == splitattr_data))):
+            if __debug__ and cached is not None:
+                debug("SPL", "Split attribute changed -- resetting cache")
+            # store a copy to be safe against in-place modification
+            self.__cache_attr = splitattr_data.copy()
+            self.__cache = {}
+
+        # the key has to be hashable -- specs might come as arrays
+        key = (tuple([_spec2key(spec) for spec in specs]),
+               _spec2key(self.discard_boundary))
+        try:
+            return list(self.__cache[key])
+        except KeyError:
+            pass
+
+        indices = [None if filter_ is None or not filter_.any()
+                        else filter_.nonzero()[0]
+                   for filter_ in self._get_split_filters(splitattr_data,
+                                                          specs)]
+        for idx in indices:
+            if idx is not None:
+                # protect cached values against modification
+                idx.flags.writeable = False
+        self.__cache[key] = indices
+        return list(indices)
+
+
+    def _get_split_filters(self, splitattr_data, specs):
+        """Boolean sample filters for all parts of a split"""
         # collect the sample ids for each resulting dataset
         filters = []
         none_specs = 0
@@ -299,14 +416,12 @@ class Splitter(object):
             else:
                 discard_boundary = None
 
-        splitattr_data = dataset.sa[self.__splitattr].value
         for spec in specs:
             if spec is None:
                 filters.append(None)
                 none_specs += 1
             else:
-                filter_ = np.array([ i in spec \
-                                    for i in splitattr_data], dtype='bool')
+                filter_ = _in1d(splitattr_data, spec)
                 filters.append(filter_)
                 if cum_filter is None:
                     cum_filter = filter_
@@ -336,36 +451,17 @@ class Splitter(object):
                         f = np.logical_and(f, f_pad[d:d+lenf])
                     filters[i] = f[:]
 
-        # split data: return None if no samples are left
-        # XXX: Maybe it should simply return an empty dataset instead, but
-        #      keeping it this way for now, to maintain current behavior
-        split_datasets = []
-
-
-        for filter_ in filters:
-            if (filter_ == False).all():
-                split_datasets.append(None)
-            else:
-                # check whether we can do slicing instead of advanced
-                # indexing -- if we can split the dataset without causing
-                # the data to be copied, its is quicker and leaner.
-                # However, it only works if we have a contiguous chunk or
-                # regular step sizes for the samples to be split
-                split_datasets.append(dataset[self._filter2slice(filter_)])
-
-        return split_datasets
+        return filters
 
 
-    def _filter2slice(self, bf):
+    def _filter2slice(self, idx):
         if self.__noslicing:
             # we are not allowed to help :-(
-            return bf
-        # the filter should be a boolean array
-        if not len(bf):
+            return idx
+        # the filter should be an array of sample ids
+        if not len(idx):
             raise ValueError("'%s' recieved an empty filter. This is a "
                              "bug." % self.__class__.__name__)
-        # get indices of non-zero filter elements
-        idx = bf.nonzero()[0]
         idx_start = idx[0]
         idx_end = idx[-1] + 1
         idx_step = None
@@ -376,7 +472,7 @@ class Splitter(object):
             if len(stepsizes) > 1:
                 # multiple step-sizes -> slicing is not possible -> return
                 # orginal filter
-                return bf
+                return idx
             else:
                 idx_step = stepsizes[0]
 
@@ -12,10 +12,37 @@ __docformat__ = 'restructuredtext'
 
 from mvpa.featsel.helpers import FractionTailSelector
 from mvpa.misc.state import StateVariable, ClassWithCollections
+from mvpa.mappers.base import FeatureSliceMapper
+from mvpa.datasets.base import _get_appended_mapper
 
 if __debug__:
     from mvpa.base import debug
 
+
+def _get_working_dataset(dataset, samples, feature_ids):
+    """Dataset with the given `samples` of the `feature_ids` of `dataset`
+
+    Equivalent to ``dataset[:, feature_ids]`` with the samples replaced,
+    but attributes are sliced lazily and the mapper gets the feature
+    selection appended without modifying the one of `dataset`, like in
+    `Dataset.get_view`.
+    """
+    wdataset = dataset.__class__(samples)
+    wdataset.sa = dataset.sa.get_lazy_slice(slice(None), samples.shape[0])
+    wdataset.fa = dataset.fa.get_lazy_slice(feature_ids, samples.shape[1])
+    for attr in dataset.a.values():
+        newattr = attr.__class__(name=attr.name, doc=attr.__doc__)
+        newattr.value = attr.value
+        wdataset.a[attr.name] = newattr
+    if 'mapper' in wdataset.a:
+        wdataset.a.mapper = _get_appended_mapper(
+                                dataset.a.mapper,
+                                FeatureSliceMapper(
+                                    feature_ids,
+                                    dshape=dataset.samples.shape[1:]))
+    return wdataset
+
+
 class FeatureSelection(ClassWithCollections):
     """Base class for any feature selection
 
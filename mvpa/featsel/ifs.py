@@ -18,12 +18,16 @@ __docformat__ = 'restructuredtext'
 import numpy as np
 from mvpa.support.copy import copy
 
-from mvpa.featsel.base import FeatureSelection
+from mvpa.featsel.base import FeatureSelection, _get_working_dataset
 from mvpa.featsel.helpers import NBackHistoryStopCrit, \
                                  FixedNElementTailSelector, \
                                  BestDetector
 
+from mvpa.measures.base import DatasetMeasure
+from mvpa.misc.neighborhood import CandidateSets
 from mvpa.misc.state import StateVariable
+from mvpa.misc.parallel import get_nproc, shared_array, run_workers, \
+     chunk_queue, iter_queue
 
 if __debug__:
     from mvpa.base import debug
@@ -45,6 +49,13 @@ class IFS(FeatureSelection):
     For each feature selection the transfer error on some testdatset is
     computed. This procedure is repeated until a given `StoppingCriterion`
     is reached.
+
+    Candidates can be evaluated by multiple worker processes, which share
+    the samples of the dataset.  Measures supporting
+    `DatasetMeasure.call_batched()` evaluate all candidates of a step at
+    once instead (see `CandidateSets`), e.g. cross-validation of `GNB`
+    combines the likelihoods of the already selected features only once
+    per step and updates them with each candidate.
     """
 
     errors = StateVariable()
@@ -57,6 +68,7 @@ class IFS(FeatureSelection):
                  feature_selector=FixedNElementTailSelector(1,
                                                             tail='upper',
                                                             mode='select'),
+                 nproc=1,
                  **kwargs
                  ):
         """Initialize incremental feature search
@@ -75,6 +87,11 @@ class IFS(FeatureSelection):
         stopping_criterion : Functor
           Given a list of error values it has to return whether the
           criterion is fulfilled.
+        nproc : None or int
+          Number of processes to evaluate the candidate features in
+          parallel.  If None, all available CPU cores are used.  Note, that
+          the state of `data_measure` is not updated by evaluations done in
+          worker processes.
         """
         # bases init first
         FeatureSelection.__init__(self, **kwargs)
@@ -84,6 +101,7 @@ class IFS(FeatureSelection):
         self.__feature_selector = feature_selector
         self.__bestdetector = bestdetector
         self.__stopping_criterion = stopping_criterion
+        self.__nproc = get_nproc(nproc)
 
 
     def _call(self, dataset, testdataset):
@@ -123,23 +141,8 @@ class IFS(FeatureSelection):
         # criterion is reached
         while len( candidates ):
             # measures for all candidates
-            measures = []
+            measures = self._get_measures(dataset, selected, candidates)
 
-            # for all possible candidates
-            for i, candidate in enumerate(candidates):
-                if __debug__:
-                    debug('IFSC', "Tested %i" % i, cr=True)
-
-                # take the new candidate and all already selected features
-                # select a new temporay feature subset from the dataset
-                # XXX assume MappedDataset and issue plain=True ??
-                tmp_dataset = \
-                        dataset[:, selected + [candidate]]
-
-                # compute data measure on this feature set
-                measures.append(self.__data_measure(tmp_dataset))
-
-            measures = [np.asscalar(m) for m in measures]
             # Select promissing feature candidates (staging)
             # IDs are only applicable to the current set of feature candidates
             tmp_staging_ids = self.__feature_selector(measures)
@@ -154,8 +157,9 @@ class IFS(FeatureSelection):
 
             # compute transfer error for the new set
             # XXX assume MappedDataset and issue plain=True ??
-            error = self.__transfer_error(testdataset[:, selected],
-                                          dataset[:, selected])
+            error = self.__transfer_error(
+                testdataset.get_view(features=selected),
+                dataset.get_view(features=selected))
             errors.append(error)
 
             # Check if it is time to stop and if we got
@@ -183,3 +187,54 @@ class IFS(FeatureSelection):
 
         # best dataset ever is returned
         return dataset[:, results], testdataset[:, results]
+
+
+    def _get_measures(self, dataset, selected, candidates):
+        """Compute the data measure for all candidate features
+        """
+        ncandidates = len(candidates)
+        if isinstance(self.__data_measure, DatasetMeasure):
+            # try to compute all candidates in a single batch
+            result = self.__data_measure.call_batched(
+                dataset, CandidateSets(selected, candidates,
+                                       dataset.nfeatures))
+            if result is not None and result.shape == (1, ncandidates):
+                return [np.asscalar(m) for m in result.samples[0]]
+
+        nproc = min(self.__nproc, ncandidates)
+        if nproc > 1:
+            measures = shared_array(ncandidates)
+            queue = chunk_queue(ncandidates, nproc)
+            run_workers(self._proc_candidates,
+                        (dataset, selected, candidates,
+                         iter_queue(queue), measures),
+                        nproc=nproc)
+        else:
+            measures = np.empty(ncandidates)
+            self._proc_candidates(dataset, selected, candidates,
+                                  [(0, ncandidates)], measures)
+        return [np.asscalar(m) for m in measures]
+
+
+    def _proc_candidates(self, dataset, selected, candidates, chunks,
+                         measures):
+        """Compute the data measure for chunks of candidate features
+
+        Samples of already selected features are copied only once into a
+        buffer, which then holds each candidate in its last column.
+        """
+        samples = np.empty((len(dataset), len(selected) + 1),
+                           dtype=dataset.samples.dtype)
+        samples[:, :-1] = dataset.samples[:, selected]
+        for start, stop in chunks:
+            for i in xrange(start, stop):
+                if __debug__:
+                    debug('IFSC', "Tested %i" % i, cr=True)
+
+                candidate = candidates[i]
+                samples[:, -1] = dataset.samples[:, candidate]
+                # take the new candidate and all already selected features
+                tmp_dataset = _get_working_dataset(dataset, samples,
+                                                   selected + [candidate])
+                # compute data measure on this feature set
+                measures[i] = np.asscalar(self.__data_measure(tmp_dataset))
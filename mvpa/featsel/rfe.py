@@ -12,16 +12,55 @@ __docformat__ = 'restructuredtext'
 
 from mvpa.clfs.transerror import ClassifierError
 from mvpa.measures.base import Sensitivity
-from mvpa.featsel.base import FeatureSelection
+from mvpa.featsel.base import FeatureSelection, _get_working_dataset
 from mvpa.featsel.helpers import BestDetector, \
                                  NBackHistoryStopCrit, \
                                  FractionTailSelector
-from numpy import arange
+import time
+import numpy as np
+
 from mvpa.misc.state import StateVariable
+from mvpa.kernels.base import precompute_kernels
 
 if __debug__:
     from mvpa.base import debug
 
+def _compact_features(flat, shape, ids):
+    """Keep only the features `ids` of samples stored in a flat buffer
+
+    The samples are compacted in place, so no additional memory besides
+    a single row is required.  Hence, any array previously obtained from
+    the buffer (e.g. the samples of the working datasets of former
+    elimination steps, or anything holding on to them, like trained
+    classifiers or cached kernels) gets overwritten and must not be used
+    anymore.
+
+    Parameters
+    ----------
+    flat : ndarray
+      1D buffer holding the C-ordered (nsamples x nfeatures) samples at its
+      beginning.
+    shape : tuple
+      (nsamples, nfeatures) of the samples currently stored in the buffer.
+    ids : sequence of int
+      Ids of the features to keep.
+
+    Returns
+    -------
+    ndarray
+      C-contiguous (nsamples x len(ids)) view on the buffer.
+    """
+    nsamples, nfeatures = shape
+    ids = np.asanyarray(ids)
+    nselected = len(ids)
+    # rows only move towards the beginning of the buffer, and each one is
+    # copied before it is written, hence nothing is overwritten before it
+    # gets moved
+    for i in xrange(nsamples):
+        flat[i * nselected:(i + 1) * nselected] = flat[i * nfeatures + ids]
+    return flat[:nsamples * nselected].reshape(nsamples, nselected)
+
+
 # TODO: Abs value of sensitivity should be able to rule RFE
 # Often it is what abs value of the sensitivity is what matters.
 # So we should either provide a simple decorator around arbitrary
@@ -59,6 +98,8 @@ class RFE(FeatureSelection):
         doc="Last step # when each feature was still present")
     sensitivities = StateVariable(enabled=False,
         doc="History of sensitivities (might consume too much memory")
+    steps_time = StateVariable(enabled=True,
+        doc="Time (in seconds) which took each step")
 
     def __init__(self,
                  sensitivity_analyzer,
@@ -68,6 +109,7 @@ class RFE(FeatureSelection):
                  stopping_criterion=NBackHistoryStopCrit(BestDetector()),
                  train_clf=None,
                  update_sensitivity=True,
+                 warm_start=False,
                  **kargs
                  ):
         # XXX Allow for multiple stopping criterions, e.g. error not decreasing
@@ -105,6 +147,11 @@ class RFE(FeatureSelection):
           If False the sensitivity map is only computed once and reused
           for each iteration. Otherwise the senstitivities are
           recomputed at each selection step.
+        warm_start : bool
+          If True, classifiers which support it (i.e. provide
+          `set_init_weights()`, like `SMLR`) start training at each step
+          from their weights of the previous step, restricted to the
+          surviving features.
         """
 
         # base init first
@@ -133,6 +180,9 @@ class RFE(FeatureSelection):
         self.__update_sensitivity = update_sensitivity
         """Flag whether sensitivity map is recomputed for each step."""
 
+        self.__warm_start = warm_start
+        """Flag whether classifiers start from the previous weights."""
+
         # force clf training when sensitivities are not updated as otherwise
         # shared classifiers are not retrained
         if not self.__update_sensitivity \
@@ -171,29 +221,30 @@ class RFE(FeatureSelection):
         """Number of features at each step. Since it is not used by the
         algorithm it is stored directly in the state variable"""
 
-        ca.history = arange(dataset.nfeatures)
+        ca.history = np.arange(dataset.nfeatures)
         """Store the last step # when the feature was still present
         """
 
         ca.sensitivities = []
 
+        steps_time = []
+        """Time spent on each step."""
+
         stop = False
         """Flag when RFE should be stopped."""
 
-        results = None
-        """Will hold the best feature set ever."""
-
-        wdataset = dataset
-        """Operate on working dataset initially identical."""
-
-        wtestdataset = testdataset
-        """Same feature selection has to be performs on test dataset as well.
-        This will hold the current testdataset."""
+        # private copies of the samples which get compacted in place
+        # while features are eliminated
+        wsamples = np.array(dataset.samples, order='C')
+        wbuffer = wsamples.ravel()
+        if not testdataset is None:
+            wtestsamples = np.array(testdataset.samples, order='C')
+            wtestbuffer = wtestsamples.ravel()
 
         step = 0
         """Counter how many selection step where done."""
 
-        orig_feature_ids = arange(dataset.nfeatures)
+        orig_feature_ids = np.arange(dataset.nfeatures)
         """List of feature Ids as per original dataset remaining at any given
         step"""
 
@@ -204,19 +255,53 @@ class RFE(FeatureSelection):
         """Resultant ids of selected features. Since the best is not
         necessarily is the last - we better keep this one around. By
         default -- all features are there"""
-        selected_ids = result_selected_ids
 
-        while wdataset.nfeatures > 0:
+        warm_clfs = []
+        """Classifiers which can start from the weights of previous step."""
+        if self.__warm_start:
+            for obj in (self.__sensitivity_analyzer, self.__transfer_error):
+                clf = getattr(obj, 'clf', None)
+                if hasattr(clf, 'set_init_weights') \
+                       and not clf in warm_clfs:
+                    warm_clfs.append(clf)
+
+        while True:
+            t0 = time.time()
+
+            # Operate on working datasets sharing the buffers
+            wdataset = _get_working_dataset(dataset, wsamples,
+                                            orig_feature_ids)
+            # XXX why should test dataset ever become None?
+            # yoh: because we can have __transfer_error computed
+            #      using wdataset. See xia-generalization estimate
+            #      in lightsvm. Or for god's sake leave-one-out
+            #      on a wdataset
+            # TODO: document these cases in this class
+            if testdataset is None:
+                wtestdataset = None
+            else:
+                wtestdataset = _get_working_dataset(testdataset,
+                                                    wtestsamples,
+                                                    orig_feature_ids)
+
+            nfeatures = wdataset.nfeatures
 
             if __debug__:
                 debug('RFEC',
-                      "Step %d: nfeatures=%d" % (step, wdataset.nfeatures))
+                      "Step %d: nfeatures=%d" % (step, nfeatures))
 
             # mark the features which are present at this step
             # if it brings anyb mentionable computational burden in the future,
             # only mark on removed features at each step
             ca.history[orig_feature_ids] = step
 
+            # compute cached kernels for the current feature set only
+            # once for training and testing samples
+            wdataset, wtestdataset = \
+                precompute_kernels([self.__sensitivity_analyzer,
+                                    self.__transfer_error],
+                                   [wdataset, wtestdataset])
+
             # Compute sensitivity map
             if self.__update_sensitivity or sensitivity == None:
                 sensitivity = self.__sensitivity_analyzer(wdataset)
@@ -244,14 +329,11 @@ class RFE(FeatureSelection):
             stop = self.__stopping_criterion(errors)
             isthebest = self.__bestdetector(errors)
 
-            nfeatures = wdataset.nfeatures
-
             if ca.is_enabled("nfeatures"):
-                ca.nfeatures.append(wdataset.nfeatures)
+                ca.nfeatures.append(nfeatures)
 
             # store result
             if isthebest:
-                results = (wdataset, wtestdataset)
                 result_selected_ids = orig_feature_ids
 
             if __debug__:
@@ -261,50 +343,56 @@ class RFE(FeatureSelection):
 
             # stop if it is time to finish
             if nfeatures == 1 or stop:
+                steps_time.append(time.time() - t0)
                 break
 
-            # Select features to preserve
-            selected_ids = self.__feature_selector(sensitivity)
+            # Select features to preserve -- sorted to maintain the order
+            # of the features
+            selected_ids = np.sort(self.__feature_selector(sensitivity))
 
             if __debug__:
                 debug('RFEC_',
                       "Sensitivity: %s, nfeatures_selected=%d, selected_ids: %s" %
                       (sensitivity, len(selected_ids), selected_ids))
 
+            # let classifiers start from their current weights
+            for clf in warm_clfs:
+                if clf.trained:
+                    clf.set_init_weights(feature_ids=selected_ids)
 
-            # Create a dataset only with selected features
-            wdataset = wdataset[:, selected_ids]
+            # Keep only selected features in the working buffers -- the
+            # working datasets of this step are invalid afterwards
+            wsamples = _compact_features(wbuffer, wsamples.shape,
+                                         selected_ids)
+            if not testdataset is None:
+                wtestsamples = _compact_features(wtestbuffer,
+                                                 wtestsamples.shape,
+                                                 selected_ids)
 
             # select corresponding sensitivity values if they are not
             # recomputed
             if not self.__update_sensitivity:
                 sensitivity = sensitivity[selected_ids]
 
-            # need to update the test dataset as well
-            # XXX why should it ever become None?
-            # yoh: because we can have __transfer_error computed
-            #      using wdataset. See xia-generalization estimate
-            #      in lightsvm. Or for god's sake leave-one-out
-            #      on a wdataset
-            # TODO: document these cases in this class
-            if not testdataset is None:
-                wtestdataset = wtestdataset[:, selected_ids]
-
             step += 1
 
-            # WARNING: THIS MUST BE THE LAST THING TO DO ON selected_ids
-            selected_ids.sort()
-            if self.ca.is_enabled("history") \
-                   or self.ca.is_enabled('selected_ids'):
-                orig_feature_ids = orig_feature_ids[selected_ids]
-
+            orig_feature_ids = orig_feature_ids[selected_ids]
 
             if hasattr(self.__transfer_error, "clf"):
                 self.__transfer_error.clf.untrain()
+
+            steps_time.append(time.time() - t0)
+
+            if len(selected_ids) == 0:
+                break
+
         # charge state variables
         self.ca.errors = errors
         self.ca.selected_ids = result_selected_ids
+        self.ca.steps_time = steps_time
 
         # best dataset ever is returned
-        return results
-
+        if testdataset is None:
+            return dataset[:, result_selected_ids], None
+        return (dataset[:, result_selected_ids],
+                testdataset[:, result_selected_ids])
@@ -23,12 +23,16 @@ __docformat__ = 'restructuredtext'
 import numpy as np
 
 from mvpa.base.types import is_datasetlike
+from mvpa.base.dataset import vstack
 from mvpa.misc.state import ClassWithCollections
 from mvpa.misc.param import Parameter
-from mvpa.misc.sampleslookup import SamplesLookup # required for CachedKernel
+from mvpa.misc.sampleslookup import SamplesCache, get_identified
 
 __all__ = ['Kernel', 'NumpyKernel', 'CustomKernel', 'PrecomputedKernel',
-           'CachedKernel']
+           'CachedKernel', 'precompute_kernels']
+
+if __debug__:
+    from mvpa.base import debug
 
 class Kernel(ClassWithCollections):
     """Abstract class which calculates a kernel function between datasets
@@ -274,11 +278,13 @@ class CachedKernel(NumpyKernel):
     
     The cache is asymmetric for lhs and rhs, so compute(d1, d2) does not create
     a cache usable for compute(d2, d1).
+
+    `CrossValidatedTransferError`, `MCNullDist` and `RFE` precompute the
+    kernel of their classifiers on all samples of the datasets they are
+    called with (see `precompute_kernels`), hence all cross-validation
+    folds and permutations are served from a single kernel matrix.
     """
 
-    # TODO: Figure out how to design objects like CrossValidation etc to
-    # precompute this kernel automatically, making it transparent to the user
-    
     @property
     def __kernel_name__(self):
         """Allows checking name of subkernel"""
@@ -302,11 +308,11 @@ class CachedKernel(NumpyKernel):
     def _cache(self, ds1, ds2=None):
         """Initializes internal lookups + _kfull via caching the kernel matrix
         """
-        self._lhsids = SamplesLookup(ds1)
+        self._lhsids = SamplesCache(ds1, identify=True)
         if (ds2 is None) or (ds2 is ds1):
             self._rhsids = self._lhsids
         else:
-            self._rhsids = SamplesLookup(ds2)
+            self._rhsids = SamplesCache(ds2, identify=True)
 
         ckernel = self._kernel
         ckernel.compute(ds1, ds2)
@@ -318,6 +324,16 @@ class CachedKernel(NumpyKernel):
         self.params.reset()
         # TODO: store params representation for later comparison
 
+
+    def _is_outdated(self):
+        """Whether the cache is missing, or invalid for the current state
+
+        I.e. kernel parameters were changed, or the cached samples were
+        modified since the kernel was computed.
+        """
+        return self._lhsids is None or len(self.params.which_set()) \
+               or self._lhsids.is_modified() or self._rhsids.is_modified()
+
     def compute(self, ds1, ds2=None):
         """Automatically computes and caches the kernel or extracts the
         relevant part of a precached kernel into self._k
@@ -329,18 +345,14 @@ class CachedKernel(NumpyKernel):
         # Check either those ds1, ds2 are coming from the same
         # dataset as before
 
-        # TODO: figure out if data were modified...
-        # params_modified = True
-        changedData = False
-        if len(self.params.which_set()) or changedData \
-           or self._lhsids is None:
+        if self._is_outdated():
             self._cache(ds1, ds2)# hopefully this will never reset values, just
             # changed status
         else:
             # figure d1, d2
             # TODO: find saner numpy way to select both rows and columns
             try:
-                lhsids = self._lhsids(ds1) #
+                lhsids = self._lhsids(ds1)
                 if ds2 is None:
                     rhsids = lhsids
                 else:
@@ -351,6 +363,114 @@ class CachedKernel(NumpyKernel):
             except KeyError:
                 self._cache(ds1, ds2)
 
+
+    def is_cached(self, ds):
+        """Whether the kernel for all samples of `ds` is cached"""
+        if self._is_outdated():
+            return False
+        try:
+            self._lhsids(ds)
+            self._rhsids(ds)
+        except KeyError:
+            return False
+        return True
+
+
+    def precompute(self, *datasets):
+        """Compute and cache the kernel for all samples of the datasets
+
+        All datasets have to be derived from the same dataset (i.e. share
+        its `magic_id`), or have no `magic_id` at all.  The datasets are
+        not modified: datasets lacking sample `origids` are cached as
+        shallow copies with `origids` assigned, and only datasets derived
+        from these copies are found in the cache later on (see
+        `precompute_kernels()`, which returns them).  Nothing gets
+        computed if the kernel is already cached for all samples.
+
+        Returns
+        -------
+        bool
+          Whether the kernel was (re)computed.
+        """
+        datasets = [ds for ds in datasets if ds is not None]
+        if not len(datasets) \
+           or np.all([self.is_cached(ds) for ds in datasets]):
+            return False
+
+        datasets = get_identified(datasets)
+        if datasets is None:
+            if __debug__:
+                debug('KERNEL', "Cannot precompute %s for datasets of "
+                      "different origin" % self)
+            return False
+
+        if len(datasets) == 1:
+            ds = datasets[0]
+        else:
+            ds = vstack([ds.copy(deep=False, sa=['origids'], fa=[], a=[])
+                         for ds in datasets])
+            ds.a['magic_id'] = datasets[0].a.magic_id
+        if __debug__:
+            debug('KERNEL', "Precomputing %s for %i samples"
+                  % (self, ds.nsamples))
+        self._cache(ds)
+        return True
+
+
+def precompute_kernels(objs, datasets):
+    """Precompute `CachedKernel` instances of classifiers for all samples
+
+    Classifiers which provide a `precompute_samples` method (e.g. libsvm's
+    `SVM`, which converts the samples into its own representation only
+    once) get it called with the datasets as well.  The caches can only
+    serve datasets derived from the returned ones, which are the given
+    datasets, or shallow copies of them with `origids` and `magic_id`
+    assigned (see `get_identified()`).
+
+    Parameters
+    ----------
+    objs : sequence
+      Classifiers, or objects with a `clf` attribute (e.g. `TransferError`,
+      meta-classifiers, sensitivity analyzers), which are searched for
+      classifiers with a `CachedKernel`.
+    datasets : sequence of Dataset
+      The kernel is computed for all samples of these datasets.  Items
+      might be None.
+
+    Returns
+    -------
+    list
+      Datasets to use instead of the given ones.
+    """
+    kernels = []
+    machines = []
+    for obj in objs:
+        seen = []
+        while obj is not None and not obj in seen:
+            seen.append(obj)
+            params = getattr(obj, 'params', None)
+            if params is not None and 'kernel' in params:
+                kernel = params.kernel
+                if isinstance(kernel, CachedKernel) \
+                   and not kernel in kernels:
+                    kernels.append(kernel)
+            if hasattr(obj, 'precompute_samples') and not obj in machines:
+                machines.append(obj)
+            obj = getattr(obj, 'clf', None)
+    if not len(kernels) and not len(machines):
+        return list(datasets)
+    identified = get_identified(datasets)
+    if identified is None:
+        if __debug__:
+            debug('KERNEL', "Cannot precompute kernels for datasets of "
+                  "different origin")
+        return list(datasets)
+    for kernel in kernels:
+        kernel.precompute(*identified)
+    for machine in machines:
+        machine.precompute_samples(*identified)
+    return identified
+
 __BOGUS_NOTES__ = """
 if ds1 is the "derived" dataset as it was computed on:
     * ds2 is None
@@ -212,6 +212,65 @@ class FxMapper(Mapper):
         return mdata, attrs
 
 
+    def forward_segments(self, ds, offsets):
+        """Forward-map consecutive segments of features separately.
+
+        The result is identical to horizontally stacking the outputs of
+        forward-mapping ``ds[:, offsets[i]:offsets[i+1]]`` for all
+        segments, e.g. to post-process the results of all searchlight
+        spheres computed in a batch (see `DatasetMeasure.call_batched()`).
+        Any mapping along the samples axis processes each feature
+        separately, and hence is done for all segments at once.  Along
+        the features axis only reductions with `np.sum`, `np.mean`,
+        `np.max` or `np.min` (without `fxargs` and `uattrs`) of non-empty
+        segments are supported.  Their values might differ from the ones
+        of the separate segments by rounding errors.
+
+        Parameters
+        ----------
+        ds : Dataset
+        offsets : array of int
+          Boundaries of the segments: one more than the number of
+          segments with the last being the number of features.
+
+        Returns
+        -------
+        Dataset or None
+          None if the segments cannot be mapped in one go.
+        """
+        if self.__axis == 'samples':
+            return self.forward(ds)
+
+        ufunc = _segment_ufuncs.get(self.__fx, None)
+        if ufunc is None or self.__uattrs is not None \
+           or self.__fxargs != () or self.__attrfx is None:
+            return None
+        starts = np.asanyarray(offsets[:-1])
+        sizes = np.diff(offsets)
+        if not len(sizes) or np.any(sizes == 0):
+            return None
+
+        samples = ufunc.reduceat(ds.samples, starts, axis=1)
+        if self.__fx is np.mean:
+            samples = samples / sizes.astype(float)
+
+        out = ds.copy(deep=False, fa=[])
+        out.fa.set_length_check(len(sizes))
+        out.samples = samples
+        bounds = zip(starts, starts + sizes)
+        for attr in ds.fa:
+            value = ds.fa[attr].value
+            out.fa[attr] = [self.__attrfx(value[start:stop])
+                            for start, stop in bounds]
+        return out
+
+
+
+_segment_ufuncs = {np.sum: np.add, np.mean: np.add,
+                   np.max: np.maximum, np.min: np.minimum}
+"""Reductions supported by `FxMapper.forward_segments()`"""
+
+
 #
 # Convenience functions to create some useful mapper with less complexity
 #
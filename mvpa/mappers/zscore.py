@@ -17,6 +17,66 @@ from mvpa.base.dochelpers import _str, borrowkwargs
 from mvpa.mappers.base import accepts_dataset_as_samples, Mapper
 from mvpa.datasets.base import Dataset
 from mvpa.datasets.miscfx import get_nsamples_per_attr, get_samples_by_attr
+from mvpa.misc.parallel import get_nproc, map_workers
+
+if __debug__:
+    from mvpa.base import debug
+
+
+def _merge_stats(a, b):
+    """Merge two sets of (nsamples, mean, sum of squared deviations)
+
+    This is the parallel update of Chan et al. (1979), hence merging
+    statistics of two sets of samples is equivalent to computing them on
+    the union of both sets.
+    """
+    na, meana, m2a = a
+    nb, meanb, m2b = b
+    if na == 0:
+        return b
+    if nb == 0:
+        return a
+    n = na + nb
+    delta = meanb - meana
+    return (n, meana + delta * (float(nb) / n),
+            m2a + m2b + delta ** 2 * (float(na) * nb / n))
+
+
+def _get_stats(samples, ids, block_size):
+    """Compute (nsamples, mean, sum of squared deviations) blockwise
+
+    Parameters
+    ----------
+    samples : array-like
+      Anything which supports selecting samples along the first axis, e.g.
+      a memory-mapped array or lazily loaded samples (see
+      `mvpa.base.hdf5.HDF5Samples`).
+    ids : None or slice or array
+      Samples to consider.
+    block_size : int
+      Number of samples to process at once.
+    """
+    if ids is None:
+        ids = slice(0, len(samples))
+    if isinstance(ids, slice):
+        start, stop, step = ids.indices(len(samples))
+        blocks = [slice(i, min(stop, i + block_size * step), step)
+                  for i in xrange(start, stop, block_size * step)]
+    else:
+        blocks = [ids[i:i + block_size]
+                  for i in xrange(0, len(ids), block_size)]
+
+    stats = (0, 0., 0.)
+    for block in blocks:
+        # private copy, since it gets modified below
+        block = np.array(samples[block], dtype=np.float64)
+        if not len(block):
+            continue
+        mean = block.mean(axis=0)
+        block -= mean
+        stats = _merge_stats(stats, (len(block), mean,
+                                     np.sum(block ** 2, axis=0)))
+    return stats
 
 
 class ZScoreMapper(Mapper):
@@ -45,10 +105,17 @@ class ZScoreMapper(Mapper):
     without prior training. Also, for obvious reasons, it is also not possible
     to perform chunk-wise Z-scoring of plain data arrays.
 
+    Parameters are estimated blockwise with numerically stable updates, so
+    only a limited number of samples has to be in memory at once, e.g. when
+    the samples are memory-mapped or loaded lazily.  Statistics of multiple
+    chunks, or of multiple portions of the data can be computed in parallel,
+    and the estimates can be updated with additional data later on (see
+    `partial_train()`).  Forward-mapping is done blockwise as well.
+
     Reverse-mapping is currently not implemented.
     """
     def __init__(self, params=None, param_est=None, chunks_attr='chunks',
-                 dtype='float64', inspace=None):
+                 dtype='float64', inspace=None, block_size=None, nproc=1):
         """
         Parameters
         ----------
@@ -74,6 +141,12 @@ class ZScoreMapper(Mapper):
           Z-scored.
         inspace : None
           Currently, this argument has no effect.
+        block_size : None or int
+          Number of samples to process at once.  If None, blocks of
+          about 4M values are used.
+        nproc : None or int
+          Number of processes to estimate parameters in parallel.  If None,
+          all available CPU cores are used.
         """
         Mapper.__init__(self, inspace=inspace)
 
@@ -81,7 +154,10 @@ class ZScoreMapper(Mapper):
         self.__params = params
         self.__param_est = param_est
         self.__params_dict = None
+        self.__stats = None
         self.__dtype = dtype
+        self.__block_size = block_size
+        self.__nproc = get_nproc(nproc)
 
         # secret switch to perform in-place z-scoring
         self._secret_inplace_zscore = False
@@ -109,10 +185,7 @@ class ZScoreMapper(Mapper):
 
 
     def _train(self, ds):
-        # local binding
-        chunks_attr = self.__chunks_attr
         params = self.__params
-        param_est = self.__param_est
 
         # populate a dictionary with tuples of (mean,std) for all chunks, or
         # a global value that is is used for the whole data
@@ -122,31 +195,89 @@ class ZScoreMapper(Mapper):
                 # turn into dict, otherwise assume that we have parameters per
                 # chunk
                 params = {'__all__': params}
+            self.__params_dict = params
         else:
             # no parameters given, need to estimate
-            if not param_est is None:
-                est_attr, est_attr_values = param_est
-                # which samples to use for estimation
-                est_ids = set(get_samples_by_attr(ds, est_attr,
-                                                  est_attr_values))
-            else:
-                est_ids = slice(None)
-
-            # now we can either do it one for all, or per chunk
-            if not chunks_attr is None:
-                # per chunk estimate
-                params = {}
-                for c in ds.sa[chunks_attr].unique:
-                    slicer = np.where(ds.sa[chunks_attr].value == c)[0]
-                    if not isinstance(est_ids, slice):
-                        slicer = list(est_ids.intersection(set(slicer)))
-                    params[c] = self._compute_params(ds.samples[slicer])
-            else:
-                # global estimate
-                params = {'__all__': self._compute_params(ds.samples[est_ids])}
+            self.__stats = {}
+            self._update_params(ds)
+
+
+    def partial_train(self, ds):
+        """Update the estimated parameters with additional samples.
+
+        Only the sufficient statistics (number of samples, mean, and sum of
+        squared deviations) per chunk get updated, hence training on
+        multiple datasets one after another is equivalent to training on
+        all of them at once.  New chunks might appear in `ds`.  An untrained
+        mapper, or one with fixed parameters, simply gets trained.
+        """
+        if self.__stats is None or not self.__params is None:
+            return self.train(ds)
+        self._pretrain(ds)
+        self._update_params(ds)
+        self._posttrain(ds)
 
 
-        self.__params_dict = params
+    def _get_block_size(self, nfeatures):
+        if self.__block_size is None:
+            return max(1, 2 ** 22 / max(1, nfeatures))
+        return self.__block_size
+
+
+    def _update_params(self, ds):
+        """Incorporate samples of the dataset into the estimates
+        """
+        # local binding
+        chunks_attr = self.__chunks_attr
+        param_est = self.__param_est
+        samples = ds.samples
+
+        if not param_est is None:
+            est_attr, est_attr_values = param_est
+            # which samples to use for estimation
+            est_mask = np.zeros(len(ds), dtype='bool')
+            est_mask[get_samples_by_attr(ds, est_attr, est_attr_values)] = True
+        else:
+            est_mask = None
+
+        # list of (key, ids) to compute statistics on
+        tasks = []
+        if not chunks_attr is None:
+            # per chunk estimate
+            chunks = ds.sa[chunks_attr].value
+            for c in ds.sa[chunks_attr].unique:
+                mask = chunks == c
+                if not est_mask is None:
+                    mask &= est_mask
+                tasks.append((c, np.where(mask)[0]))
+        elif not est_mask is None:
+            tasks.append(('__all__', np.where(est_mask)[0]))
+        else:
+            # global estimate -- split into portions for parallel processing
+            nsamples = len(ds)
+            nportions = min(self.__nproc, nsamples)
+            bounds = np.linspace(0, nsamples, nportions + 1).astype(int)
+            tasks = [('__all__', slice(bounds[i], bounds[i + 1]))
+                     for i in xrange(nportions)]
+
+        block_size = self._get_block_size(ds.nfeatures)
+        compute = lambda i: _get_stats(samples, tasks[i][1], block_size)
+        nproc = min(self.__nproc, len(tasks))
+        if nproc > 1:
+            if __debug__:
+                debug('MAP', "Estimating Z-Scoring parameters from %i "
+                      "portions of the data in %i processes"
+                      % (len(tasks), nproc))
+            results = map_workers(compute, len(tasks), nproc=nproc)
+        else:
+            results = [compute(i) for i in xrange(len(tasks))]
+
+        stats = self.__stats
+        for (key, ids), result in zip(tasks, results):
+            stats[key] = _merge_stats(stats.get(key, (0, 0., 0.)), result)
+
+        self.__params_dict = dict([(k, self._compute_params(*v))
+                                   for k, v in stats.iteritems()])
 
 
     def _forward_dataset(self, ds):
@@ -172,13 +303,21 @@ class ZScoreMapper(Mapper):
             # shallow copy to put the new stuff in
             mds = ds.copy(deep=False)
 
-        # cast the data to float, since in-place operations below do not upcast!
-        if np.issubdtype(mds.samples.dtype, np.integer):
-            mds.samples = mds.samples.astype(dtype)
+        # cast the data to float, since in-place operations below do not
+        # upcast!  Also make sure not to modify the original samples
+        samples = mds.samples
+        if np.issubdtype(samples.dtype, np.integer):
+            mds.samples = np.asanyarray(samples).astype(dtype)
+        elif not self._secret_inplace_zscore \
+                 or not isinstance(samples, np.ndarray) \
+                 or not samples.flags.writeable:
+            # lazily loaded (e.g. HDF5Samples) or read-only samples cannot
+            # be modified in-place, hence they are replaced by an array
+            mds.samples = np.array(samples)
 
         if '__all__' in params:
             # we have a global parameter set
-            mds.samples = self._zscore(mds.samples, *params['__all__'])
+            self._zscore(mds.samples, *params['__all__'])
         else:
             # per chunk z-scoring
             for c in mds.sa[chunks_attr].unique:
@@ -188,8 +327,7 @@ class ZScoreMapper(Mapper):
                         "wasn't present in the training dataset!?"
                         % (self.__class__.__name__, c))
                 slicer = np.where(mds.sa[chunks_attr].value == c)[0]
-                mds.samples[slicer] = self._zscore(mds.samples[slicer],
-                                                   *params[c])
+                self._zscore(mds.samples, *params[c], ids=slicer)
 
         return mds
 
@@ -220,42 +358,72 @@ class ZScoreMapper(Mapper):
         return mdata
 
 
-    def _compute_params(self, samples):
-        return (samples.mean(axis=0), samples.std(axis=0))
+    def _compute_params(self, nsamples, mean, m2):
+        """(mean, std) from the sufficient statistics
+        """
+        if nsamples == 0:
+            # nothing to estimate from
+            nan = np.nan * np.ones(np.shape(mean))
+            return (nan, nan)
+        return (mean, np.sqrt(m2 / nsamples))
 
 
-    def _zscore(self, samples, mean, std):
-        # de-mean
-        if np.isscalar(mean) or samples.shape[1] == len(mean):
-            samples -= mean
-        else:
+    def _zscore(self, samples, mean, std, ids=None):
+        """Z-score samples in-place, block by block
+
+        Parameters
+        ----------
+        ids : None or array
+          Ids of the samples to Z-score.  All samples are processed if None.
+        """
+        if not (np.isscalar(mean) or samples.shape[1] == len(mean)):
             raise RuntimeError("mean should be a per-feature vector. Got: %r"
                                % (mean,))
-
-        # scale
         if np.isscalar(std):
             if std == 0:
-                samples[:] = 0
+                scale = None
             else:
-                samples /= std
+                scale = std
         else:
             if samples.shape[1] != len(std):
                 raise RuntimeError("std should be a per-feature vector.")
-            else:
-                # check for invariant features
-                std_nz = std != 0
-                samples[:, std_nz] /= np.asanyarray(std)[std_nz]
+            # leave invariant features de-meaned only
+            scale = np.where(np.asanyarray(std) == 0, 1, std)
+
+        if ids is None:
+            ids = slice(0, len(samples))
+        elif len(ids) and ids[-1] - ids[0] + 1 == len(ids):
+            # contiguous samples can be processed through views
+            ids = slice(ids[0], ids[-1] + 1)
+
+        block_size = self._get_block_size(samples.shape[1])
+        if isinstance(ids, slice):
+            for start in xrange(ids.start, ids.stop, block_size):
+                block = samples[start:min(ids.stop, start + block_size)]
+                if scale is None:
+                    block[:] = 0
+                else:
+                    block -= mean
+                    block /= scale
+        else:
+            for start in xrange(0, len(ids), block_size):
+                bids = ids[start:start + block_size]
+                if scale is None:
+                    samples[bids] = 0
+                else:
+                    samples[bids] = (samples[bids] - mean) / scale
         return samples
 
 
-
 @borrowkwargs(ZScoreMapper, '__init__')
 def zscore(ds, **kwargs):
     """In-place Z-scoring of a `Dataset` or `ndarray`.
 
     This function behaves identical to `ZScoreMapper`. The only difference is
     that the actual Z-scoring is done in-place -- potentially causing a
-    significant reduction of memory demands.
+    significant reduction of memory demands.  Samples which cannot be
+    modified in-place (e.g. read-only or lazily loaded from HDF5) are
+    replaced by a Z-scored array.
 
     Parameters
     ----------
@@ -44,6 +44,8 @@ class OneWayAnova(FeaturewiseDatasetMeasure):
     from the 'fprob' feature attribute.
     """
 
+    _univariate = True
+
     def _call(self, dataset, labels=None):
         # This code is based on SciPy's stats.f_oneway()
         # Copyright (c) Gary Strangman.  All rights reserved
@@ -131,6 +131,72 @@ class DatasetMeasure(ClassWithCollections):
         raise NotImplemented
 
 
+    def call_batched(self, dataset, neighborhoods):
+        """Compute the measure for many subsets of features at once
+
+        Parameters
+        ----------
+        dataset : Dataset
+        neighborhoods : NeighborhoodIndex
+          Precomputed subsets of features, e.g. searchlight spheres
+          (see :class:`~mvpa.misc.neighborhood.NeighborhoodIndex`).
+
+        Returns
+        -------
+        Dataset or None
+          Identical to stacking the results of calling the measure on all
+          subsets horizontally.  None, if the measure cannot compute all
+          subsets at once.
+
+        Notes
+        -----
+        A post-processing mapper is applied to the results of all subsets
+        at once, if it provides `forward_segments()` (as e.g. `FxMapper`
+        computing the mean across the features of a subset does) and
+        supports the particular mapping.  Estimation of a NULL
+        distribution requires each subset to be processed separately.
+        """
+        if self.__null_dist is not None:
+            return None
+        postproc = self.__postproc
+        if postproc is None:
+            return self._call_batched(dataset, neighborhoods)
+        if not hasattr(postproc, 'forward_segments'):
+            return None
+
+        # raw results of all subsets
+        measure = copy.copy(self)
+        measure.__postproc = None
+        result = measure._call_batched(dataset, neighborhoods)
+        if result is None:
+            return None
+        if not isinstance(result, AttrDataset):
+            result = Dataset(np.atleast_2d(result))
+
+        # boundaries of the subsets' results within the stacked results
+        if result.nfeatures == len(neighborhoods.fids):
+            offsets = neighborhoods.offsets
+        elif result.nfeatures == len(neighborhoods.center_ids):
+            offsets = np.arange(result.nfeatures + 1)
+        else:
+            return None
+        if __debug__:
+            debug("SA_", "Applying mapper %s to %i subsets"
+                  % (postproc, len(offsets) - 1))
+        return postproc.forward_segments(result, offsets)
+
+
+    def _call_batched(self, dataset, neighborhoods):
+        """Actually compute the measure for many subsets of features
+
+        Measures which can do it more efficiently than by calling them on
+        each subset separately should implement it and return a dataset
+        equivalent to hstack-ing those results.  By default None is
+        returned to signal that no batched implementation is available.
+        """
+        return None
+
+
     def _postcall(self, dataset, result):
         """Some postprocessing on the result
         """
@@ -237,6 +303,11 @@ class FeaturewiseDatasetMeasure(DatasetMeasure):
         doc="Stores basic sensitivities if the sensitivity " +
             "relies on combining multiple ones")
 
+    _univariate = False
+    """Either the value of each feature depends only on that feature.
+    If so, the measure of any subset of features is just the
+    corresponding subset of the measure computed on all features"""
+
     def __init__(self, **kwargs):
         DatasetMeasure.__init__(self, **kwargs)
 
@@ -256,6 +327,17 @@ class FeaturewiseDatasetMeasure(DatasetMeasure):
         raise NotImplementedError
 
 
+    def _call_batched(self, dataset, neighborhoods):
+        """Compute univariate measures once and select all subsets
+        """
+        if not self._univariate:
+            return None
+        result = self(dataset)
+        if not isinstance(result, AttrDataset):
+            result = Dataset(np.atleast_2d(result))
+        return result[:, neighborhoods.fids]
+
+
     def _postcall(self, dataset, result):
         """Adjusts per-feature-measure for computed `result`
 
@@ -27,6 +27,8 @@ class CorrCoef(FeaturewiseDatasetMeasure):
     XXX: Explain me!
     """
 
+    _univariate = True
+
     def __init__(self, pvalue=False, attr='targets', **kwargs):
         """Initialize
 
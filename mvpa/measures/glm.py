@@ -35,6 +35,8 @@ class GLM(FeaturewiseDatasetMeasure):
     zstat = StateVariable(enabled=False,
         doc="Standardized parameter estimates (nfeatures x nparameters).")
 
+    _univariate = True
+
     def __init__(self, design, voi='pe', **kwargs):
         """
         Parameters
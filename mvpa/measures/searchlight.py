@@ -19,11 +19,15 @@ from mvpa.base import externals, warning
 from mvpa.base.dochelpers import borrowkwargs
 
 from mvpa.datasets import Dataset, hstack
+from mvpa.base.dataset import is_datasetlike
 from mvpa.support import copy
 from mvpa.mappers.base import FeatureSliceMapper
 from mvpa.measures.base import DatasetMeasure
 from mvpa.misc.state import StateVariable
-from mvpa.misc.neighborhood import IndexQueryEngine, Sphere
+from mvpa.misc.neighborhood import IndexQueryEngine, Sphere, \
+     NeighborhoodIndex
+from mvpa.misc.parallel import get_nproc, shared_array, chunk_queue, \
+     iter_queue, run_workers, map_workers
 from mvpa.base.dochelpers import _str, borrowkwargs
 
 class Searchlight(DatasetMeasure):
@@ -37,7 +41,7 @@ class Searchlight(DatasetMeasure):
         doc="Number of features in each ROI.")
 
     def __init__(self, datameasure, queryengine, center_ids=None,
-                 nproc=None, **kwargs):
+                 nproc=None, backend='pprocess', **kwargs):
         """
         Parameters
         ----------
@@ -51,19 +55,40 @@ class Searchlight(DatasetMeasure):
           List of feature ids (not coordinates) the shall serve as sphere
           centers. By default all features will be used.
         nproc : None or int
-          How many processes to use for computation.  Requires `pprocess`
-          external module.  If None -- all available cores will be used.
+          How many processes to use for computation.  If None -- all
+          available cores will be used, but with the 'pprocess' backend
+          only if the `pprocess` module is available (otherwise the
+          computation is serial).
+        backend : {'pprocess', 'native'}
+          Implementation of the multiprocess computation.  'pprocess'
+          requires the `pprocess` external module, pickles the dataset
+          for each process and collects the full result datasets.
+          'native' forks worker processes (via `multiprocessing`) which
+          share the dataset with the parent process, pick chunks of
+          centers from a queue and store their results directly into an
+          output array in shared memory (results with feature attributes
+          are sent back as a whole instead).  Workers draw random numbers
+          from streams derived from the one of the parent (see
+          `mvpa.misc.parallel`).  With both backends the state of the
+          measure in the parent process does not reflect the computations
+          done in the workers.
         **kwargs
           In addition this class supports all keyword arguments of its
           base-class :class:`~mvpa.measures.base.DatasetMeasure`.
       """
         DatasetMeasure.__init__(self, **(kwargs))
 
-        if nproc > 1 and not externals.exists('pprocess'):
+        if not backend in ('native', 'pprocess'):
+            raise ValueError("Unknown backend '%s' for multiprocess "
+                             "searchlights" % backend)
+        if backend == 'pprocess' and nproc > 1 \
+               and not externals.exists('pprocess'):
             raise RuntimeError("The 'pprocess' module is required for "
-                               "multiprocess searchlights. Please either "
-                               "install python-pprocess, or reduce `nproc` "
-                               "to 1 (got nproc=%i)" % nproc)
+                               "multiprocess searchlights with the "
+                               "'pprocess' backend. Please either install "
+                               "python-pprocess, use the 'native' backend, "
+                               "or reduce `nproc` to 1 (got nproc=%s)"
+                               % nproc)
 
         self.__datameasure = datameasure
         self.__qe = queryengine
@@ -72,6 +97,7 @@ class Searchlight(DatasetMeasure):
                   "Cannot run searchlight on an empty list of center_ids"
         self.__center_ids = center_ids
         self.__nproc = nproc
+        self.__backend = backend
 
 
     def _call(self, dataset):
@@ -79,15 +105,20 @@ class Searchlight(DatasetMeasure):
         """
         # local binding
         nproc = self.__nproc
-
-        if nproc is None and externals.exists('pprocess'):
-            import pprocess
-            try:
-                nproc = pprocess.get_number_of_cores() or 1
-            except AttributeError:
-                warning("pprocess version %s has no API to figure out maximal "
-                        "number of cores. Using 1" % externals.versions['pprocess'])
-                nproc = 1
+        backend = self.__backend
+
+        if nproc is None:
+            if backend == 'pprocess' and externals.exists('pprocess'):
+                import pprocess
+                try:
+                    nproc = pprocess.get_number_of_cores() or 1
+                except AttributeError:
+                    warning("pprocess version %s has no API to figure out "
+                            "maximal number of cores. Using 1"
+                            % externals.versions['pprocess'])
+                    nproc = 1
+            elif backend == 'native':
+                nproc = get_nproc()
         # train the queryengine
         self.__qe.train(dataset)
 
@@ -105,38 +136,66 @@ class Searchlight(DatasetMeasure):
         else:
             roi_ids = np.arange(dataset.nfeatures)
 
-        # compute
-        if nproc > 1:
-            # split all target ROIs centers into `nproc` equally sized blocks
-            roi_blocks = np.array_split(roi_ids, nproc)
-
-            # the next block sets up the infrastructure for parallel computing
-            # this can easily be changed into a ParallelPython loop, if we
-            # decide to have a PP job server in PyMVPA
-            import pprocess
-            p_results = pprocess.Map(limit=nproc)
-            compute = p_results.manage(
-                        pprocess.MakeParallel(self._proc_block))
-            for block in roi_blocks:
-                # should we maybe deepcopy the measure to have a unique and
-                # independent one per process?
-                compute(block, dataset, copy.copy(self.__datameasure))
-
-            # collect results
-            results = []
-            if self.ca.is_enabled('roisizes'):
-                roisizes = []
+        # precompute all neighborhoods at once if the engine is capable of
+        # it, so no per-center queries are necessary
+        qe = self.__qe
+        if hasattr(qe, 'compute_index'):
+            qe = qe.compute_index(roi_ids)
+
+        # measures which can compute all neighborhoods in a single call
+        # need neither per-ROI datasets nor multiple processes
+        results = None
+        if isinstance(qe, NeighborhoodIndex) \
+               and isinstance(self.__datameasure, DatasetMeasure):
+            results = self.__datameasure.call_batched(dataset, qe)
+            if results is not None:
+                if __debug__:
+                    debug('SLC', "Computed %i ROIs in a single batch"
+                          % len(roi_ids))
+                if self.ca.is_enabled('roisizes'):
+                    roisizes = qe.roisizes.tolist()
+                else:
+                    roisizes = None
+
+        if results is None:
+            if nproc > 1 and len(roi_ids) > 1 and backend == 'native':
+                results, roisizes = \
+                        self._proc_native(roi_ids, dataset,
+                                          self.__datameasure, qe, nproc)
+            elif nproc > 1:
+                # split all target ROIs centers into `nproc` equally sized
+                # blocks
+                roi_blocks = np.array_split(roi_ids, nproc)
+
+                # the next block sets up the infrastructure for parallel
+                # computing this can easily be changed into a ParallelPython
+                # loop, if we decide to have a PP job server in PyMVPA
+                import pprocess
+                p_results = pprocess.Map(limit=nproc)
+                compute = p_results.manage(
+                            pprocess.MakeParallel(self._proc_block))
+                for block in roi_blocks:
+                    # should we maybe deepcopy the measure to have a unique
+                    # and independent one per process?
+                    compute(block, dataset, copy.copy(self.__datameasure),
+                            qe)
+
+                # collect results
+                results = []
+                if self.ca.is_enabled('roisizes'):
+                    roisizes = []
+                else:
+                    roisizes = None
+
+                for r, rsizes in p_results:
+                    results += r
+                    if not roisizes is None:
+                        roisizes += rsizes
             else:
-                roisizes = None
-
-            for r, rsizes in p_results:
-                results += r
-                if not roisizes is None:
-                    roisizes += rsizes
-        else:
-            # otherwise collect the results in a list
-            results, roisizes = \
-                    self._proc_block(roi_ids, dataset, self.__datameasure)
+                # otherwise collect the results in a list
+                results, roisizes = \
+                        self._proc_block(roi_ids, dataset,
+                                         self.__datameasure, qe)
 
         if not roisizes is None:
             self.ca.roisizes = roisizes
@@ -144,10 +203,11 @@ class Searchlight(DatasetMeasure):
         if __debug__:
             debug('SLC', '')
 
-        # but be careful: this call also serves as conversion from parallel maps
-        # to regular lists!
-        # this uses the Dataset-hstack
-        results = hstack(results)
+        if isinstance(results, list):
+            # but be careful: this call also serves as conversion from
+            # parallel maps to regular lists!
+            # this uses the Dataset-hstack
+            results = hstack(results)
 
         if 'mapper' in dataset.a:
             # since we know the space we can stick the original mapper into the
@@ -169,7 +229,7 @@ class Searchlight(DatasetMeasure):
         return results
 
 
-    def _proc_block(self, block, ds, measure):
+    def _proc_block(self, block, ds, measure, qe):
         """Little helper to capture the parts of the computation that can be
         parallelized
         """
@@ -186,13 +246,13 @@ class Searchlight(DatasetMeasure):
         for i, f in enumerate(block):
             # retrieve the feature ids of all features in the ROI from the query
             # engine
-            roi_fids = self.__qe[f]
+            roi_fids = qe[f]
 
             if __debug__ and  debug_slc_:
                 debug('SLC_', 'For %r query returned ids %r' % (f, roi_fids))
 
             # slice the dataset
-            roi = ds[:, roi_fids]
+            roi = ds.get_view(features=roi_fids)
 
             # compute the datameasure and store in results
             results.append(measure(roi))
@@ -211,6 +271,105 @@ class Searchlight(DatasetMeasure):
         return results, roisizes
 
 
+    def _proc_native(self, roi_ids, ds, measure, qe, nproc):
+        """Compute the measure for all ROIs in forked worker processes
+
+        Results are stored into a (nresults x ncenters) array in shared
+        memory.
+        """
+        # the first ROI is done right away to figure out the layout
+        # of the results
+        first, first_size = self._proc_block(roi_ids[:1], ds, measure, qe)
+        first = first[0]
+        if is_datasetlike(first) and len(first.fa):
+            # feature attributes cannot go into the shared array -- send
+            # complete results back and stack them as in serial computation
+            return self._proc_native_full(roi_ids, ds, measure, qe, nproc,
+                                          first, first_size)
+        if is_datasetlike(first):
+            first_samples = first.samples
+        else:
+            first_samples = np.atleast_2d(first)
+
+        nroi = len(roi_ids)
+        results = shared_array((nroi,) + first_samples.shape,
+                               dtype=first_samples.dtype)
+        results[0] = first_samples
+        if first_size is None:
+            roisizes = None
+        else:
+            roisizes = shared_array(nroi, dtype='int')
+            roisizes[0] = first_size[0]
+
+        if __debug__:
+            debug('SLC', "Starting %i processes for %i ROIs"
+                  % (nproc, nroi - 1))
+        if roisizes is None:
+            other_roisizes = None
+        else:
+            other_roisizes = roisizes[1:]
+        queue = chunk_queue(nroi - 1, nproc)
+        run_workers(self._proc_queue,
+                    (queue, roi_ids[1:], ds, measure, qe,
+                     results[1:], other_roisizes),
+                    nproc)
+
+        # (ROIs x nresults x nfeatures) -> (nresults x (ROIs x nfeatures))
+        samples = np.array(results.swapaxes(0, 1).reshape(
+            first_samples.shape[0], -1))
+        if is_datasetlike(first):
+            results = first.__class__(samples)
+            results.sa.update(first.sa)
+        else:
+            results = Dataset(samples)
+        if roisizes is not None:
+            roisizes = roisizes.tolist()
+        return results, roisizes
+
+
+    def _proc_native_full(self, roi_ids, ds, measure, qe, nproc,
+                          first, first_size):
+        """Compute the remaining ROIs in forked workers, pickling results
+        """
+        blocks = [b for b in np.array_split(roi_ids[1:], 10 * nproc)
+                  if len(b)]
+        if __debug__:
+            debug('SLC', "Starting %i processes for %i ROIs in %i blocks"
+                  % (nproc, len(roi_ids) - 1, len(blocks)))
+        block_results = map_workers(
+            lambda i: self._proc_block(blocks[i], ds, measure, qe),
+            len(blocks), nproc)
+        results = [first]
+        roisizes = first_size
+        for r, rsizes in block_results:
+            results += r
+            if roisizes is not None:
+                roisizes += rsizes
+        return results, roisizes
+
+
+    def _proc_queue(self, queue, roi_ids, ds, measure, qe, results, roisizes):
+        """Worker of the native backend: process chunks from the queue
+        """
+        for start, stop in iter_queue(queue):
+            block_results, block_roisizes = \
+                    self._proc_block(roi_ids[start:stop], ds, measure, qe)
+            for i, r in enumerate(block_results):
+                if is_datasetlike(r):
+                    r = r.samples
+                else:
+                    r = np.atleast_2d(r)
+                if r.shape != results.shape[1:]:
+                    raise ValueError("Native multiprocess searchlight "
+                                     "requires results of identical shape "
+                                     "for all ROIs (got %s and %s)"
+                                     % (r.shape, results.shape[1:]))
+                results[start + i] = r
+            if block_roisizes is not None:
+                roisizes[start:stop] = block_roisizes
+
+
+
 @borrowkwargs(Searchlight, '__init__')
 def sphere_searchlight(datameasure, radius=1, center_ids=None,
                        space='voxel_indices', **kwargs):
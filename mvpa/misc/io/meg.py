@@ -10,9 +10,28 @@
 
 __docformat__ = 'restructuredtext'
 
+import os
 import numpy as np
 
-from mvpa.base import externals
+from mvpa.base import externals, warning
+
+if __debug__:
+    from mvpa.base import debug
+
+def _is_seekable(infile):
+    """Whether a file-like object can be rewound cheaply
+    """
+    # compressed files emulate seek() by decompressing everything again
+    if externals.exists('gzip'):
+        import gzip
+        if isinstance(infile, gzip.GzipFile):
+            return False
+    try:
+        infile.seek(infile.tell())
+    except (AttributeError, IOError, ValueError):
+        return False
+    return True
+
 
 class TuebingenMEG(object):
     """Reader for MEG data from line-based textfile format.
@@ -42,10 +61,13 @@ class TuebingenMEG(object):
     'Time') in a NumPy array (nsamples x nchannels x ntimepoints).
 
     The reader supports uncompressed as well as gzipped input files (or other
-    file-like objects).
+    file-like objects).  Uncompressed seekable sources are read in two
+    passes: the first determines the channels, while the second parses
+    their data directly into a preallocated array.  Compressed and
+    non-seekable sources are read in a single pass.
     """
 
-    def __init__(self, source):
+    def __init__(self, source, channels=None, cache=False):
         """Reader MEG data from texfiles or file-like objects.
 
         Parameters
@@ -53,26 +75,70 @@ class TuebingenMEG(object):
         source : str or file-like
           Strings are assumed to be filenames (with `.gz` suffix
           compressed), while all other object types are treated as file-like
-          objects.
+          objects (or any other iterable of lines).
+        channels : None or sequence of str
+          Ids of the channels to read.  Data of all other channels is
+          skipped without being parsed.  If None, all channels are read.
+          Channels are stored in the order of the file.
+        cache : bool or str
+          If enabled, the parsed data of all channels is stored in a binary
+          `.npz` file next to the source file (or under the given filename),
+          and read from it whenever it is newer than the source.  Only
+          applicable if `source` is a filename.
         """
         self.ntimepoints = None
         self.timepoints = None
         self.nsamples = None
         self.channelids = []
-        self.data = []
+        self.data = None
         self.samplingrate = None
 
+        if not channels is None:
+            channels = set(channels)
+
+        if isinstance(source, str) and cache:
+            if isinstance(cache, str):
+                cachefile = cache
+            else:
+                cachefile = source + '.npz'
+        else:
+            cachefile = None
+
+        if not cachefile is None and self._load_cache(cachefile, source,
+                                                      channels):
+            return
+
         # open textfiles
         if isinstance(source, str):
             if source.endswith('.gz'):
                 externals.exists('gzip', raise_=True)
                 import gzip
-                source = gzip.open(source, 'r')
+                infile = gzip.open(source, 'r')
+            else:
+                infile = open(source, 'r')
+        else:
+            infile = source
+
+        try:
+            if _is_seekable(infile):
+                self._read_twopass(infile, channels)
             else:
-                source = open(source, 'r')
+                self._read_onepass(infile, channels)
+        finally:
+            if not infile is source:
+                infile.close()
+
+        if not cachefile is None and channels is None:
+            self._save_cache(cachefile)
+
 
-        # read file
-        for line in source:
+    def _get_items(self, lines, channels):
+        """Parse timing information and yield (id, data) of channels
+
+        Yields data of all channels if `channels` is None.  Otherwise only
+        those in `channels` are yielded.
+        """
+        for line in lines:
             # split ID
             colon = line.find(':')
 
@@ -94,17 +160,91 @@ class TuebingenMEG(object):
                                                sep='\t')
                 self.samplingrate = self.ntimepoints \
                     / (self.timepoints[-1] - self.timepoints[0])
+            elif channels is None or id in channels:
+                yield id, data
+
+
+    def _parse_channel(self, data):
+        """Parse the data of a single channel (nsamples x ntimepoints)
+        """
+        return np.fromstring(data, dtype=float, sep='\t').reshape(
+                        self.nsamples, self.ntimepoints)
+
+
+    def _read_twopass(self, infile, channels):
+        """Determine the channels first and fill a preallocated array
+        """
+        start = infile.tell()
+        self.channelids = [id for id, data in self._get_items(infile,
+                                                              channels)]
+        self.data = np.empty((self.nsamples, len(self.channelids),
+                              self.ntimepoints))
+        infile.seek(start)
+        for i, (id, data) in enumerate(self._get_items(infile, channels)):
+            self.data[:, i] = self._parse_channel(data)
+
+
+    def _read_onepass(self, lines, channels):
+        """Read channels in a single pass over non-seekable sources
+        """
+        chdata = []
+        for id, data in self._get_items(lines, channels):
+            chdata.append(self._parse_channel(data))
+            # store id
+            self.channelids.append(id)
+        # (samples x chanels x timepoints), while releasing the parsed
+        # channels as soon as possible
+        self.data = np.empty((self.nsamples, len(chdata), self.ntimepoints))
+        for i in xrange(len(chdata)):
+            self.data[:, i] = chdata[i]
+            chdata[i] = None
+
+
+    def _load_cache(self, cachefile, source, channels):
+        """Read data from a cache file if it is up to date
+
+        Returns
+        -------
+        bool
+          Whether the data was read from the cache.
+        """
+        if not os.path.exists(cachefile) \
+               or os.path.getmtime(cachefile) < os.path.getmtime(source):
+            return False
+        cached = np.load(cachefile)
+        try:
+            channelids = list(cached['channelids'])
+            if channels is None:
+                select = slice(None)
             else:
-                # load data
-                self.data.append(
-                    np.fromstring(data, dtype=float, sep='\t').reshape(
-                        self.nsamples, self.ntimepoints))
-                # store id
-                self.channelids.append(id)
-
-        # reshape data from (channels x samples x timepoints) to
-        # (samples x chanels x timepoints)
-        self.data = np.swapaxes(np.array(self.data), 0, 1)
+                if not channels.issubset(channelids):
+                    return False
+                select = [i for i, id in enumerate(channelids)
+                            if id in channels]
+                channelids = [channelids[i] for i in select]
+            if __debug__:
+                debug('IOH', "Reading MEG data from cache '%s'" % cachefile)
+            self.channelids = channelids
+            self.data = cached['data'][:, select]
+            self.timepoints = cached['timepoints']
+        finally:
+            cached.close()
+        self.nsamples, self.ntimepoints = self.data.shape[0], \
+                                          self.data.shape[2]
+        self.samplingrate = self.ntimepoints \
+            / (self.timepoints[-1] - self.timepoints[0])
+        return True
+
+
+    def _save_cache(self, cachefile):
+        """Store the data in a cache file
+        """
+        try:
+            np.savez(cachefile, data=self.data, timepoints=self.timepoints,
+                     channelids=np.array(self.channelids))
+        except IOError, e:
+            warning("Cannot store MEG data in cache '%s': %s"
+                    % (cachefile, e))
 
 
     def __str__(self):
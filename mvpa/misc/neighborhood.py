@@ -13,11 +13,25 @@ from numpy import array
 import operator
 import sys
 
-from mvpa.clfs.distance import cartesian_distance
+from mvpa.clfs.distance import cartesian_distance, absmin_distance, \
+     manhatten_distance
 
 if __debug__:
     from mvpa.base import debug
 
+# Vectorized counterparts of distance functions, which compute the distance
+# of each row of an array to the origin
+_vectorized_distances = {
+    cartesian_distance: lambda x: np.sqrt(np.sum(x * x, axis=1)),
+    absmin_distance: lambda x: np.max(np.abs(x), axis=1),
+    manhatten_distance: lambda x: np.sum(np.abs(x), axis=1),
+    }
+
+# Templates of increments shared among all neighborhood objects with
+# identical parameters
+_increments_cache = {}
+
+
 class Sphere(object):
     """N-Dimensional hypersphere.
 
@@ -25,7 +39,8 @@ class Sphere(object):
     radius from a point in a space with arbitrary number of dimensions
     assuming that the space is discrete.
 
-    No validation of producing coordinates within any extent is done.
+    No validation of producing coordinates within any extent is done,
+    unless neighbors are requested via `get_neighbors`.
 
     Examples
     --------
@@ -94,7 +109,41 @@ class Sphere(object):
         return self._distance_func
 
     def _get_increments(self, ndim):
-        """Creates a list of increments for a given dimensionality
+        """Creates an array of increments for a given dimensionality
+
+        Templates are cached, so they are computed only once for any
+        combination of parameters and dimensionality.
+        """
+        key = self._get_increments_key(ndim)
+        increments = _increments_cache.get(key, None)
+        if increments is None:
+            distances, tentative_increments = self._get_distances(ndim)
+            increments = tentative_increments[self._select(distances)]
+            # shared among instances -- guard against modifications
+            increments.flags.writeable = False
+            _increments_cache[key] = increments
+        return increments
+
+
+    def _get_increments_key(self, ndim):
+        """Key identifying a template of increments in the cache
+        """
+        element_sizes = self._element_sizes
+        if element_sizes is not None:
+            element_sizes = tuple(element_sizes)
+        return (self.__class__, self._radius, element_sizes,
+                self._distance_func, ndim)
+
+
+    def _get_distances(self, ndim):
+        """Distances of all increments within the bounding box of the sphere
+
+        Returns
+        -------
+        distances : array
+          Distance of each tentative increment to the center.
+        tentative_increments : array
+          (N x ndim) array of all increments within the bounding box.
         """
         # Set element_sizes
         element_sizes = self._element_sizes
@@ -107,18 +156,72 @@ class Sphere(object):
                       "to constructor had %i dimensions, whenever queried " \
                       "coordinate had %i" \
                       % (element_sizes, len(element_sizes), ndim)
-        center = np.zeros(ndim)
 
         element_sizes = np.asanyarray(element_sizes)
         # What range for each dimension
         erange = np.ceil(self._radius / element_sizes).astype(int)
 
-        tentative_increments = np.array(list(np.ndindex(tuple(erange*2 + 1)))) \
-                               - erange
-        # Filter out the ones beyond the "sphere"
-        return array([x for x in tentative_increments
-                      if self._distance_func(x * element_sizes, center)
-                      <= self._radius])
+        # all offsets within the bounding box in the same order as
+        # np.ndindex would provide them
+        tentative_increments = \
+            np.indices(tuple(erange*2 + 1)).reshape(ndim, -1).T - erange
+        scaled = tentative_increments * element_sizes
+
+        distance_func = self._distance_func
+        if distance_func in _vectorized_distances:
+            distances = _vectorized_distances[distance_func](scaled)
+        else:
+            center = np.zeros(ndim)
+            distances = np.array([distance_func(x, center) for x in scaled])
+        return distances, tentative_increments
+
+
+    def _select(self, distances):
+        """Mask of the increments which belong to the sphere
+        """
+        return distances <= self._radius
+
+
+    def get_neighbors(self, centers, extent=None):
+        """Get neighbors of multiple centers at once
+
+        Parameters
+        ----------
+        centers : array
+          (N x ndim) array of integer coordinates.
+        extent : None or sequence of int
+          Size of the space in each dimension.  If provided, neighbors
+          outside of [0, extent) are marked as invalid.
+
+        Returns
+        -------
+        coords : array
+          (N x nincrements x ndim) array with the coordinates of all
+          neighbors of each center.
+        valid : array
+          (N x nincrements) boolean mask of neighbors within the extent.
+
+        Examples
+        --------
+        >>> s = Sphere(1)
+        >>> coords, valid = s.get_neighbors([[0, 0], [2, 1]], extent=(3, 3))
+        >>> coords[1][valid[1]].tolist()
+        [[1, 1], [2, 0], [2, 1], [2, 2]]
+        >>> valid.sum(axis=1)
+        array([3, 4])
+        """
+        centers = np.asanyarray(centers)
+        if centers.ndim != 2:
+            raise ValueError("Centers must be provided as a 2D array "
+                             "(got shape %s)" % (centers.shape,))
+        increments = self._get_increments(centers.shape[1])
+        coords = centers[:, None] + increments[None]
+        if extent is None:
+            valid = np.ones(coords.shape[:2], dtype=bool)
+        else:
+            valid = np.logical_and(coords >= 0,
+                                   coords < np.asanyarray(extent)).all(axis=-1)
+        return coords, valid
 
 
     def train(self, dataset):
@@ -243,36 +346,13 @@ class HollowSphere(Sphere):
     def inner_radius(self):
         return self._inner_radius
 
-    def _get_increments(self, ndim):
-        """Creates a list of increments for a given dimensionality
+    def _get_increments_key(self, ndim):
+        return Sphere._get_increments_key(self, ndim) + (self._inner_radius,)
 
-        RF: lame yoh just cut-pasted and tuned up because everything
-            depends on ndim...
-        """
-        # Set element_sizes
-        element_sizes = self._element_sizes
-        if element_sizes is None:
-            element_sizes = np.ones(ndim)
-        else:
-            if (ndim != len(element_sizes)):
-                raise ValueError, \
-                      "Dimensionality mismatch: element_sizes %s provided " \
-                      "to constructor had %i dimensions, whenever queried " \
-                      "coordinate had %i" \
-                      % (element_sizes, len(element_sizes), ndim)
-        center = np.zeros(ndim)
-
-        element_sizes = np.asanyarray(element_sizes)
-        # What range for each dimension
-        erange = np.ceil(self._radius / element_sizes).astype(int)
 
-        tentative_increments = np.array(list(np.ndindex(tuple(erange*2 + 1)))) \
-                               - erange
-        # Filter out the ones beyond the "sphere"
-        return array([x for x in tentative_increments
-                      if self._inner_radius
-                      < self._distance_func(x * element_sizes, center)
-                      <= self._radius])
+    def _select(self, distances):
+        return np.logical_and(self._inner_radius < distances,
+                              distances <= self._radius)
 
 
 class QueryEngine(object):
@@ -352,6 +432,10 @@ class IndexQueryEngine(QueryEngine):
         """Actual searcharray"""
         self.sorted = True
         """Either to sort the query results"""
+        self._selectors = {}
+        """Index within the search array for each feature, per space"""
+        self._nfeatures = None
+        """Number of features in the training dataset"""
 
     def _train(self, dataset):
         # local binding
@@ -363,6 +447,7 @@ class IndexQueryEngine(QueryEngine):
         dims = []                       # dimensionality of each space
         lookups = self._lookups = {}
         sliceall = self._sliceall = {}
+        selectors = self._selectors = {}
         selector = []
         for space in self._spaceorder:
             # local binding for the attribute
@@ -391,7 +476,8 @@ class IndexQueryEngine(QueryEngine):
             # to select things ;)
             sliceall[space] = np.arange(dim)
             # And fill out selector using current values from qattr
-            selector.append([lookup[x] for x in qattr])
+            selectors[space] = np.array([lookup[x] for x in qattr], dtype=int)
+            selector.append(selectors[space])
 
         # now check whether we have sufficient information to put each feature
         # id into one unique search array element
@@ -408,6 +494,7 @@ class IndexQueryEngine(QueryEngine):
                              "#actual features: %i)."
                              % (str(self._spaceorder), np.prod(dims),
                                    dataset.nfeatures))
+        self._nfeatures = dataset.nfeatures
         # now we can create the search array
         self._searcharray = np.zeros(dims, dtype='int')
         # and fill it with feature ids, but start from ONE to be different from
@@ -462,3 +549,311 @@ class IndexQueryEngine(QueryEngine):
             return sorted(res)
         else:
             return res
+
+
+    def compute_index(self, center_ids=None, block_size=1000):
+        """Precompute neighborhoods of all centers at once
+
+        If a single space is queried via a `Sphere` on integer
+        coordinates, while all other spaces have no ROI generator, the
+        neighborhoods get computed by a vectorized pass over blocks of
+        centers.  Otherwise `query_byid` is called for every center.
+
+        Parameters
+        ----------
+        center_ids : None or sequence of int
+          Feature ids of the centers to compute neighborhoods for.  If
+          None, all features of the training dataset are used.
+        block_size : int
+          Number of centers to process at once in the vectorized pass.
+          Bounds the memory of temporary arrays.
+
+        Returns
+        -------
+        NeighborhoodIndex
+        """
+        if self._searcharray is None:
+            raise RuntimeError("%s has to be trained before neighborhoods "
+                               "can be computed" % self)
+        nfeatures = self._nfeatures
+        if center_ids is None:
+            center_ids = np.arange(nfeatures)
+        center_ids = np.asanyarray(center_ids, dtype=int)
+
+        # figure out whether there is a vectorized way
+        gen_spaces = [s for s in self._spaceorder
+                      if self._queryobjs[s] is not None]
+        vectorized = len(gen_spaces) == 1 \
+                     and isinstance(self._queryobjs[gen_spaces[0]], Sphere) \
+                     and self._queryattrs[gen_spaces[0]].dtype.char \
+                             in np.typecodes['AllInteger']
+
+        if __debug__:
+            debug('NBH', "Computing %s neighborhood index for %d centers"
+                  % (('sequential', 'vectorized')[int(vectorized)],
+                     len(center_ids)))
+
+        if vectorized:
+            fids, roisizes = self._compute_index_vectorized(
+                gen_spaces[0], center_ids, block_size)
+        else:
+            rois = [np.asanyarray(self.query_byid(c), dtype=int)
+                    for c in center_ids]
+            roisizes = np.array([len(r) for r in rois], dtype=int)
+            if len(rois):
+                fids = np.concatenate(rois)
+            else:
+                fids = np.array([], dtype=int)
+
+        offsets = np.zeros(len(center_ids) + 1, dtype=int)
+        np.cumsum(roisizes, out=offsets[1:])
+        return NeighborhoodIndex(center_ids, offsets,
+                                 fids.astype(np.int32), nfeatures,
+                                 coords=dict(self._queryattrs))
+
+
+    def _compute_index_vectorized(self, space, center_ids, block_size):
+        """Vectorized neighborhoods for a single `Sphere` space
+
+        Returns flat array of feature ids and the size of each
+        neighborhood.
+        """
+        nfeatures = self._nfeatures
+        sphere = self._queryobjs[space]
+        coords = np.asanyarray(self._queryattrs[space])
+        if coords.ndim == 1:
+            coords = coords[:, None]
+
+        # dense grid translating coordinates into indices along the
+        # corresponding axis of the searcharray (-1 for unknown coordinates)
+        cmin = coords.min(axis=0)
+        cextent = coords.max(axis=0) - cmin + 1
+        grid = -np.ones(tuple(cextent), dtype=int)
+        grid[tuple((coords - cmin).T)] = self._selectors[space]
+
+        fids, roisizes = [], []
+        for start in xrange(0, len(center_ids), block_size):
+            block = center_ids[start:start + block_size]
+            # (centers x increments x ndim) coordinates relative to the grid
+            rel, inside = sphere.get_neighbors(coords[block] - cmin,
+                                               extent=cextent)
+            rel[~inside] = 0
+            axisids = grid[tuple(np.rollaxis(rel, -1))]
+            valid = np.logical_and(inside, axisids >= 0)
+            # assemble index into the searcharray -- for the spaces without
+            # a generator it is simply the value of the center
+            slicer = []
+            for s in self._spaceorder:
+                if s == space:
+                    slicer.append(np.where(valid, axisids, 0))
+                else:
+                    slicer.append(self._selectors[s][block][:, None])
+            ids = self._searcharray[tuple(slicer)] - 1
+            # unknown ones become nfeatures to be sorted to the end
+            ids[np.logical_or(~valid, ids < 0)] = nfeatures
+            if self.sorted:
+                ids.sort(axis=1)
+            known = ids < nfeatures
+            fids.append(ids[known])
+            roisizes.append(known.sum(axis=1))
+
+        if not len(fids):
+            return np.array([], dtype=int), np.array([], dtype=int)
+        return np.concatenate(fids), np.concatenate(roisizes)
+
+
+
+class NeighborhoodIndex(QueryEngine):
+    """Precomputed neighborhoods of a set of centers
+
+    Neighborhoods are stored in a compressed sparse row layout: feature
+    ids of all neighborhoods are kept in a single flat `fids` array and
+    the neighborhood of the i-th center is
+    ``fids[offsets[i]:offsets[i+1]]``.  Querying by id therefore
+    requires no computation, and since the index is a plain picklable
+    object it can be stored and reused for any dataset with the same
+    features (e.g. across subjects sharing a mask).
+
+    Instances are usually created by `IndexQueryEngine.compute_index`
+    and can be used as a query engine themselves.  Besides by feature
+    id, neighborhoods can be queried by the coordinates of their center,
+    if those were stored with the index.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from mvpa.datasets import Dataset
+    >>> ds = Dataset(np.zeros((1, 4)), fa={'ind': np.arange(4)})
+    >>> qe = IndexQueryEngine(ind=Sphere(1))
+    >>> qe.train(ds)
+    >>> nbh = qe.compute_index()
+    >>> nbh[0]
+    array([0, 1], dtype=int32)
+    >>> nbh.roisizes
+    array([2, 3, 3, 2])
+    >>> nbh(ind=3)
+    array([2, 3], dtype=int32)
+    """
+
+    def __init__(self, center_ids, offsets, fids, nfeatures, coords=None):
+        """
+        Parameters
+        ----------
+        center_ids : sequence of int
+          Feature ids of the centers.
+        offsets : array of int
+          Start of each center's neighborhood in `fids`, with an additional
+          trailing element for the end of the last one.
+        fids : array of int
+          Flat array with feature ids of all neighborhoods.
+        nfeatures : int
+          Number of features in the dataset the index was computed for.
+        coords : None or dict
+          Coordinates of all features per space (i.e. feature attributes
+          the neighborhoods were computed from), to be able to `query`
+          neighborhoods by the coordinates of their centers.
+        """
+        QueryEngine.__init__(self)
+        center_ids = np.asanyarray(center_ids, dtype=int)
+        if len(offsets) != len(center_ids) + 1:
+            raise ValueError("Number of offsets (got %i) must be one more "
+                             "than the number of centers (got %i)"
+                             % (len(offsets), len(center_ids)))
+        self.center_ids = center_ids
+        self.offsets = np.asanyarray(offsets)
+        self.fids = np.asanyarray(fids)
+        self.nfeatures = nfeatures
+        if coords is None:
+            coords = {}
+        self._coords = coords
+        # translation of feature ids into rows
+        self._rows = -np.ones(nfeatures, dtype=int)
+        self._rows[center_ids] = np.arange(len(center_ids))
+
+
+    def __repr__(self):
+        return "%s(<%i centers>, <%i offsets>, <%i fids>, %i)" \
+               % (self.__class__.__name__, len(self.center_ids),
+                  len(self.offsets), len(self.fids), self.nfeatures)
+
+
+    def __len__(self):
+        return len(self.center_ids)
+
+
+    def _train(self, dataset):
+        if dataset.nfeatures != self.nfeatures:
+            raise ValueError("%s was computed for %i features, but the "
+                             "dataset has %i" % (self, self.nfeatures,
+                                                 dataset.nfeatures))
+
+
+    def query_byid(self, fid):
+        row = self._rows[fid]
+        if row < 0:
+            raise IndexError("Feature %i is not a center in %s" % (fid, self))
+        return self.fids[self.offsets[row]:self.offsets[row + 1]]
+
+
+    def query(self, **kwargs):
+        """Neighborhood of the center with the given coordinates
+
+        Coordinates have to be given for all spaces stored with the index.
+        An empty list is returned if no feature has these coordinates, and
+        IndexError is raised if the feature is not a center.
+        """
+        coords = self._coords
+        if not len(coords):
+            raise ValueError("%s has no coordinates stored, it can only be "
+                             "queried by feature id" % self)
+        if set(kwargs) != set(coords):
+            raise ValueError("Coordinates for spaces %s have to be given "
+                             "(got: %s)" % (coords.keys(), kwargs.keys()))
+        match = np.ones(self.nfeatures, dtype=bool)
+        for space, value in kwargs.iteritems():
+            equal = np.asanyarray(coords[space]) == np.asanyarray(value)
+            if equal.ndim > 1:
+                equal = equal.all(axis=1)
+            match &= equal
+        fids = np.flatnonzero(match)
+        if not len(fids):
+            return []
+        return self.query_byid(fids[0])
+
+
+    def compute_index(self, center_ids=None, block_size=None):
+        """Index for a subset (or a different order) of centers
+
+        Parameters are the same as for `IndexQueryEngine.compute_index`
+        (`block_size` is ignored).  All `center_ids` must be centers of
+        this index.
+        """
+        if center_ids is None:
+            center_ids = np.arange(self.nfeatures)
+        center_ids = np.asanyarray(center_ids, dtype=int)
+        if len(center_ids) == len(self.center_ids) \
+               and np.all(center_ids == self.center_ids):
+            return self
+        rows = self._rows[center_ids]
+        if np.any(rows < 0):
+            raise IndexError("Features %s are not centers in %s"
+                             % (center_ids[rows < 0], self))
+        roisizes = self.roisizes[rows]
+        offsets = np.zeros(len(center_ids) + 1, dtype=int)
+        np.cumsum(roisizes, out=offsets[1:])
+        # position of each neighbor in the original fids
+        pos = np.repeat(self.offsets[rows] - offsets[:-1], roisizes) \
+              + np.arange(offsets[-1])
+        return NeighborhoodIndex(center_ids, offsets, self.fids[pos],
+                                 self.nfeatures, coords=self._coords)
+
+
+    @property
+    def roisizes(self):
+        """Number of features in each neighborhood"""
+        return np.diff(self.offsets)
+
+
+
+class CandidateSets(NeighborhoodIndex):
+    """Feature sets of common selected features plus one candidate each
+
+    Used by incremental feature search (see `IFS`) to evaluate a measure
+    for all candidates of a step in a batch (see
+    `DatasetMeasure.call_batched`).  The i-th set consists of all
+    `selected` features followed by the i-th candidate, and serves as the
+    neighborhood of that candidate.  Measures can exploit the common
+    features, e.g. by combining their statistics only once and then
+    updating them for each candidate (see `GNB.predict_batched`).
+
+    Examples
+    --------
+    >>> sets = CandidateSets([3, 1], [0, 2, 4], 5)
+    >>> sets[2]
+    array([3, 1, 2])
+    >>> sets.roisizes
+    array([3, 3, 3])
+    """
+
+    def __init__(self, selected, candidates, nfeatures):
+        """
+        Parameters
+        ----------
+        selected : sequence of int
+          Ids of the features common to all sets.
+        candidates : sequence of int
+          Ids of the candidate features, none of which may be selected.
+        nfeatures : int
+          Number of features in the dataset.
+        """
+        selected = np.asanyarray(selected, dtype=int)
+        candidates = np.asanyarray(candidates, dtype=int)
+        nselected = len(selected)
+        fids = np.empty((len(candidates), nselected + 1), dtype=int)
+        fids[:, :nselected] = selected
+        fids[:, nselected] = candidates
+        offsets = np.arange(len(candidates) + 1) * (nselected + 1)
+        NeighborhoodIndex.__init__(self, candidates, offsets, fids.ravel(),
+                                   nfeatures)
+        self.selected = selected
+        self.candidates = candidates
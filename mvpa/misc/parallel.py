@@ -0,0 +1,288 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the PyMVPA package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Helpers for multiprocess computation based on `multiprocessing`
+
+Worker processes are forked, hence they inherit all data of the parent
+(e.g. dataset samples) through copy-on-write memory, without any
+pickling.  Only results have to be transferred back -- either via
+arrays in shared memory or via pickles sent through a queue.  Any other
+modification of the state of objects in the workers is lost.
+
+Workers reseed NumPy's random number generator for each chunk (or item)
+of work, with a seed derived from the state inherited from the parent
+and the position of the chunk.  Hence workers do not produce identical
+random numbers, while the results stay reproducible regardless of which
+worker computes a chunk, if the parent was seeded.  Computations which
+have to match a serial run in the parent can seed each item explicitly
+with `reseed()` from a `random_key()` taken before forking.
+"""
+
+__docformat__ = 'restructuredtext'
+
+import os
+import sys
+import traceback
+import multiprocessing
+from Queue import Empty
+
+import numpy as np
+
+if __debug__:
+    from mvpa.base import debug
+
+
+def get_nproc(nproc=None):
+    """Number of processes to use
+
+    Parameters
+    ----------
+    nproc : None or int
+      If None, the number of available CPU cores is returned.
+    """
+    if nproc is None:
+        try:
+            nproc = multiprocessing.cpu_count()
+        except NotImplementedError:
+            nproc = 1
+    return max(1, nproc)
+
+
+def shared_array(shape, dtype='float'):
+    """Allocate an array in memory shared with forked worker processes
+
+    Examples
+    --------
+    >>> a = shared_array((2, 3), dtype='int')
+    >>> a.shape, a.dtype == np.dtype('int'), a.sum()
+    ((2, 3), True, 0)
+    """
+    dtype = np.dtype(dtype)
+    shape = tuple(np.atleast_1d(shape))
+    nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+    buf = multiprocessing.RawArray('c', nbytes)
+    return np.frombuffer(buf, dtype=dtype,
+                         count=int(np.prod(shape))).reshape(shape)
+
+
+def _check_fork():
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("Multiprocess computation requires a platform "
+                           "which supports fork(). Please use nproc=1")
+
+
+_inherited_key = None
+"""Key of the random state a worker inherited from the parent"""
+
+
+def random_key():
+    """Key of the current random state to derive seeds from (see `reseed`)
+    """
+    return np.random.get_state()[1].copy()
+
+
+def reseed(i, key):
+    """Seed NumPy's random number generator for the i-th item of work
+
+    The seed only depends on `key` (see `random_key`) and `i`, hence the
+    same random numbers are drawn for an item, regardless of the process
+    computing it.
+    """
+    np.random.seed(np.concatenate((key, [i + 1])).astype(np.uint32))
+
+
+def _init_worker():
+    global _inherited_key
+    _inherited_key = random_key()
+
+
+def _reseed(i):
+    """Derive the random state for the i-th chunk from the inherited one
+    """
+    if _inherited_key is not None:
+        reseed(i, _inherited_key)
+
+
+def _worker(target, args, errors):
+    """Run target in a worker and report exceptions back to the parent
+    """
+    try:
+        _init_worker()
+        target(*args)
+    except Exception, e:
+        errors.put(''.join(traceback.format_exception(*sys.exc_info())))
+        # make sure the message got through before exiting with failure
+        errors.close()
+        errors.join_thread()
+        os._exit(1)
+
+
+def run_workers(target, args=(), nproc=None):
+    """Run `target(*args)` in `nproc` forked processes and wait for them
+
+    Any exception raised in a worker is re-raised in the parent as a
+    RuntimeError carrying the traceback of the worker.
+    """
+    _check_fork()
+    nproc = get_nproc(nproc)
+    errors = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_worker,
+                                       args=(target, args, errors))
+               for i in xrange(nproc)]
+    if __debug__:
+        debug('PAR', "Starting %i worker processes" % nproc)
+    for w in workers:
+        w.start()
+    # failing workers block until their traceback went through the pipe,
+    # hence it has to be drained while waiting for them
+    msgs = []
+    while True:
+        try:
+            msgs.append(errors.get(timeout=0.01))
+            continue
+        except Empty:
+            pass
+        if not len([w for w in workers if w.is_alive()]):
+            break
+    # tracebacks sent right before the last worker exited
+    while True:
+        try:
+            msgs.append(errors.get_nowait())
+        except Empty:
+            break
+    for w in workers:
+        w.join()
+    failures = [w.exitcode for w in workers if w.exitcode != 0]
+    if len(failures):
+        if len(msgs):
+            msg = msgs[0]
+        else:
+            msg = "exit codes %s" % failures
+        raise RuntimeError("%i out of %i worker processes failed: %s"
+                           % (len(failures), nproc, msg))
+
+
+def chunk_queue(nitems, nproc, chunksize=None):
+    """Queue of (start, stop) chunks for dynamic load balancing
+
+    The queue is terminated by one `None` per process.
+    """
+    if chunksize is None:
+        # have about ten chunks per process, but not too large ones
+        chunksize = max(1, min(100, nitems // (10 * nproc)))
+    queue = multiprocessing.Queue()
+    for start in xrange(0, nitems, chunksize):
+        queue.put((start, min(nitems, start + chunksize)))
+    for i in xrange(nproc):
+        queue.put(None)
+    return queue
+
+
+def iter_queue(queue):
+    """Iterate over items of a queue created by `chunk_queue`
+
+    Within workers the random state is reseeded for every chunk.
+    """
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        _reseed(item[0])
+        yield item
+
+
+def _map_worker(func, queue, output):
+    """Compute items from the queue and send them back to the parent
+    """
+    try:
+        _init_worker()
+        for start, stop in iter_queue(queue):
+            for i in xrange(start, stop):
+                _reseed(i)
+                output.put((i, func(i)))
+    except Exception, e:
+        output.put((None,
+                    ''.join(traceback.format_exception(*sys.exc_info()))))
+        # make sure the message got through before exiting with failure
+        output.close()
+        output.join_thread()
+        os._exit(1)
+
+
+def map_workers(func, nitems, nproc=None, nlocal=0):
+    """Compute `func(i)` for all `i` in `range(nitems)` in forked processes
+
+    Results get pickled and sent back to the parent, where they are
+    returned in a list in the order of `i`.  Any exception raised in a
+    worker is re-raised in the parent as a RuntimeError carrying the
+    traceback of the worker.
+
+    Parameters
+    ----------
+    func : callable
+      Computes a single item, given its index.
+    nitems : int
+      Number of items to compute.
+    nproc : None or int
+      Number of worker processes.  If None, the number of available CPU
+      cores is used.
+    nlocal : int
+      Number of trailing items which are computed in the parent process
+      while the workers are busy.  This is useful if the state of the
+      parent has to match the one after a serial computation.
+
+    Examples
+    --------
+    >>> map_workers(lambda i: i * 2, 5, nproc=2, nlocal=1)
+    [0, 2, 4, 6, 8]
+    """
+    _check_fork()
+    nremote = nitems - nlocal
+    nproc = min(get_nproc(nproc), max(1, nremote))
+    queue = chunk_queue(nremote, nproc, chunksize=1)
+    output = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_map_worker,
+                                       args=(func, queue, output))
+               for i in xrange(nproc)]
+    if __debug__:
+        debug('PAR', "Starting %i worker processes for %i items "
+              "(%i computed locally)" % (nproc, nitems, nlocal))
+    for w in workers:
+        w.start()
+
+    results = [None] * nitems
+    try:
+        for i in xrange(nremote, nitems):
+            results[i] = func(i)
+        for n in xrange(nremote):
+            i, value = _get_result(output, workers)
+            if i is None:
+                raise RuntimeError("Worker process failed: %s" % value)
+            results[i] = value
+    except:
+        for w in workers:
+            w.terminate()
+        raise
+    for w in workers:
+        w.join()
+    return results
+
+
+def _get_result(output, workers):
+    """Wait for a result while watching out for crashed workers
+    """
+    while True:
+        try:
+            return output.get(timeout=1)
+        except Empty:
+            failures = [w.exitcode for w in workers
+                        if not w.exitcode in (None, 0)]
+            if len(failures):
+                raise RuntimeError("%i worker processes died unexpectedly "
+                                   "(exit codes %s)"
+                                   % (len(failures), failures))
@@ -8,12 +8,25 @@
 ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 """Helper to map and validate samples' origids into indices"""
 
+import weakref
 import numpy as np
 
+from mvpa.misc.support import fingerprint
+
+
 class SamplesLookup(object):
     """Map to translate sample origids into unique indices.
+
+    Integer origids are mapped through an inverse index array, any other
+    origids by a binary search in their sorted array, hence translating all
+    origids of a dataset takes just a few vectorized operations.  The index
+    is shared among all lookups created for the same origids of a dataset
+    (identified by its `magic_id`).
     """
 
+    _indexes = {}
+    """Indexes of recently looked up datasets per `magic_id`"""
+
     def __init__(self, ds):
         """
         Parameters
@@ -44,8 +57,36 @@ class SamplesLookup(object):
             if __debug__:
                 Warning("Generating dataset magic_id in SamplesLookup")
                 
-        self._map = dict(zip(sample_ids,
-                             range(len(sample_ids))))
+        self._inverse, self._sorted, self._order = \
+                       self._get_index(self._orig_ds_id, sample_ids)
+
+
+    @classmethod
+    def _get_index(cls, magic_id, ids):
+        """Index of `ids`, reused if they were indexed already
+        """
+        cached = cls._indexes.get(magic_id, None)
+        if cached is not None and cached[0]() is ids \
+           and cached[1] == fingerprint(ids):
+            return cached[2]
+        ids = np.asanyarray(ids)
+        nids = len(ids)
+        if ids.dtype.kind in 'iu' and nids and ids.min() >= 0 \
+           and ids.max() < 2 * nids:
+            # dense non-negative ids -- direct inverse index
+            inverse = np.empty(ids.max() + 1, dtype=int)
+            inverse.fill(-1)
+            inverse[ids] = np.arange(nids)
+            index = (inverse, None, None)
+        else:
+            order = np.argsort(ids, kind='mergesort')
+            index = (None, ids[order], order)
+        # forget the indexes of datasets which are gone
+        for key in [k for k, v in cls._indexes.iteritems() if v[0]() is None]:
+            del cls._indexes[key]
+        cls._indexes[magic_id] = (weakref.ref(ids), fingerprint(ids), index)
+        return index
+
 
     def __call__(self, ds):
         """
@@ -55,6 +96,142 @@ class SamplesLookup(object):
            """
         if (not 'magic_id' in ds.a) or ds.a.magic_id != self._orig_ds_id:
             raise KeyError, 'This dataset is not indexed by this SamplesLookup'
-        _map = self._map
-        return np.array([_map[i] for i in ds.sa.origids])
+        ids = np.asanyarray(ds.sa.origids)
+        if self._inverse is not None:
+            inverse = self._inverse
+            if len(ids) and ids.dtype.kind not in 'iu':
+                raise KeyError, 'Origids of type %s are not indexed' % ids.dtype
+            known = (ids >= 0) & (ids < len(inverse))
+            res = inverse[np.where(known, ids, 0)]
+            known &= res >= 0
+        else:
+            sorted_ = self._sorted
+            if len(ids) and len(sorted_) \
+               and (ids.dtype.kind in 'iu') != (sorted_.dtype.kind in 'iu'):
+                raise KeyError, 'Origids of type %s are not indexed' % ids.dtype
+            # the last of duplicate ids wins, as it would in a dict
+            pos = np.searchsorted(sorted_, ids, side='right') - 1
+            known = pos >= 0
+            pos[~known] = 0
+            if len(sorted_):
+                known &= sorted_[pos] == ids
+                res = self._order[pos]
+            else:
+                res = pos
+        if not np.all(known):
+            raise KeyError, 'Unknown origids: %s' \
+                  % ', '.join([str(i) for i in ids[~known][:5]])
+        return res
+
+
+
+class SamplesCache(object):
+    """Samples of a dataset to locate the samples of derived datasets in.
+
+    Used by caches of anything computed per sample (e.g. `CachedKernel`,
+    the nodes of libsvm's `SVM`) to find the cached rows of the samples
+    of a dataset.  The samples are found by their `origids` (see
+    `SamplesLookup`), if the dataset has them, and it is verified that
+    they do not differ in their features (e.g. after a feature selection)
+    by comparing a fixed number of evenly spaced elements of the samples
+    with the cached ones.
+    """
+
+    def __init__(self, ds, identify=False, nitems=1000):
+        """
+        Parameters
+        ----------
+        ds : Dataset
+          Dataset whose samples are cached.  Without `origids` and
+          `magic_id` only the very same samples array can be found.
+        identify : bool
+          If True, missing `origids` and `magic_id` are assigned to `ds`
+          in-place (see `SamplesLookup`).
+        nitems : int
+          Maximal number of elements to compare.
+        """
+        self.samples = ds.samples
+        self._fingerprint = fingerprint(ds.samples)
+        if identify or ('origids' in ds.sa and 'magic_id' in ds.a):
+            self._lookup = SamplesLookup(ds)
+        else:
+            self._lookup = None
+        self._nitems = nitems
+
+
+    def is_modified(self):
+        """Whether the cached samples were modified since"""
+        return fingerprint(self.samples) != self._fingerprint
+
+
+    def __call__(self, ds):
+        """Indices of the samples of `ds` in the cached samples
 
+        Raises KeyError if the samples are not cached, or their features
+        differ from the cached ones.
+        """
+        cached = self.samples
+        samples = ds.samples
+        if samples is cached:
+            return np.arange(len(cached))
+        if self._lookup is None:
+            raise KeyError, 'Cached samples cannot be looked up'
+        rows = self._lookup(ds)
+        if samples.shape[1:] != cached.shape[1:]:
+            raise KeyError, 'Features of the dataset differ from the cached ones'
+        if samples.size:
+            # evenly spaced elements (rows x columns) of the samples
+            pos = np.unravel_index(
+                np.linspace(0, samples.size - 1,
+                            min(samples.size, self._nitems)).astype(int),
+                samples.shape)
+            values = samples[pos]
+            cvalues = cached[(rows[pos[0]],) + pos[1:]]
+            if not np.all((values == cvalues)
+                          | ((values != values) & (cvalues != cvalues))):
+                raise KeyError, \
+                      'Features of the dataset differ from the cached ones'
+        return rows
+
+
+
+def get_identified(datasets):
+    """Datasets whose samples can be located by `SamplesCache`
+
+    All datasets must be derived from the same dataset (i.e. share its
+    `magic_id`), or have no `magic_id`.  Datasets lacking `origids` or
+    `magic_id` are replaced by shallow copies which have them assigned,
+    so the given datasets are never modified.  Subsets of the returned
+    datasets can then be located in a cache of all their samples.
+
+    Parameters
+    ----------
+    datasets : sequence of Dataset
+      Items might be None.
+
+    Returns
+    -------
+    list or None
+      The datasets in the same order, or None if they are of different
+      origin.
+    """
+    magic_ids = set([ds.a.magic_id for ds in datasets
+                     if ds is not None and 'magic_id' in ds.a])
+    if len(magic_ids) > 1:
+        return None
+    if len(magic_ids):
+        magic_id = magic_ids.pop()
+    else:
+        magic_id = None
+    res = []
+    for ds in datasets:
+        if ds is not None \
+           and not ('origids' in ds.sa and 'magic_id' in ds.a):
+            ds = ds.copy(deep=False)
+            if not 'origids' in ds.sa:
+                ds.init_origids('samples')
+            if magic_id is None:
+                magic_id = hash(ds)
+            ds.a['magic_id'] = magic_id
+        res.append(ds)
+    return res
@@ -309,6 +309,44 @@ def idhash(val):
         pass
     return res
 
+
+def fingerprint(val, version=None, nitems=1000):
+    """Craft a cheap id+digest for an object
+
+    In contrast to `idhash`, which hashes the whole buffer, of arrays only
+    up to `nitems` evenly spaced elements get hashed, along with the
+    memory location, shape, strides and dtype.  Hence the cost does not
+    grow with the size of an array, but in-place modifications of only a
+    few elements might go unnoticed.  Objects carrying a modification
+    counter (e.g. `Collectable.version`) should provide it as `version`.
+
+    Examples
+    --------
+    >>> a = np.arange(10000)
+    >>> fp = fingerprint(a)
+    >>> fp == fingerprint(a)
+    True
+    >>> a += 1
+    >>> fp == fingerprint(a)
+    False
+    """
+    if not isinstance(val, np.ndarray):
+        res = idhash(val)
+    else:
+        res = "%s" % id(val)
+        if val.size > nitems:
+            ids = np.linspace(0, val.size - 1, nitems).astype(int)
+            sample = val[np.unravel_index(ids, val.shape)]
+        else:
+            sample = val
+        res += ":%s:%s" % (hash((val.__array_interface__['data'][0],
+                                 val.shape, val.strides, val.dtype.str)),
+                           hash(buffer(np.ascontiguousarray(sample))))
+    if version is not None:
+        res += "#%s" % version
+    return res
+
+
 ##REF: Name was automagically refactored
 def is_sorted(items):
     """Check if listed items are in sorted order.
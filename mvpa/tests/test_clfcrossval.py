@@ -13,11 +13,26 @@ from mvpa.testing.tools import assert_equal, ok_, assert_array_equal
 from mvpa.datasets.splitters import NFoldSplitter
 from mvpa.algorithms.cvtranserror import CrossValidatedTransferError
 from mvpa.clfs.transerror import TransferError
+from mvpa.clfs.base import Classifier, accepts_dataset_as_samples
 
 from mvpa.testing import *
 from mvpa.testing.datasets import pure_multivariate_signal, get_mv_pattern
 from mvpa.testing.clfs import *
 
+class RandomClassifier(Classifier):
+    """Dummy classifier which predicts random targets"""
+
+    def _train(self, dataset):
+        self.__targets = dataset.sa[self.params.targets_attr].unique
+
+    @accepts_dataset_as_samples
+    def _predict(self, data):
+        predictions = list(self.__targets[
+            np.random.randint(len(self.__targets), size=len(data))])
+        self.ca.estimates = predictions
+        return predictions
+
+
 class CrossValidationTests(unittest.TestCase):
 
 
@@ -95,6 +110,77 @@ class CrossValidationTests(unittest.TestCase):
                      len(data.UC))
 
 
+    @sweepargs(backend=('native', 'pprocess'))
+    def test_parallel_cv(self, backend):
+        if backend == 'pprocess' and not externals.exists('pprocess'):
+            return
+        data = get_mv_pattern(3)
+        data.init_origids('samples')
+        cvs = []
+        for nproc in (1, 3):
+            cv = CrossValidatedTransferError(
+                    TransferError(sample_clf_lin),
+                    NFoldSplitter(cvtype=1),
+                    harvest_attribs=['transerror.clf.trained', 'clf.trained',
+                                     'result', 'splitinfo', 'lastsplit',
+                                     'dataset.nsamples'],
+                    enable_ca=['confusion', 'training_confusion',
+                               'samples_error', 'transerrors'],
+                    nproc=nproc, backend=backend)
+            results = cv(data)
+            cvs.append((cv, results))
+        (cv1, res1), (cv3, res3) = cvs
+
+        assert_array_equal(res1.samples, res3.samples)
+        assert_array_equal(res1.sa.cv_fold, res3.sa.cv_fold)
+        for state_var in ('confusion', 'training_confusion'):
+            assert_array_equal(cv1.ca[state_var].value.matrix,
+                               cv3.ca[state_var].value.matrix)
+            for s1, s3 in zip(cv1.ca[state_var].value.sets,
+                              cv3.ca[state_var].value.sets):
+                assert_array_equal(s1[0], s3[0])
+                assert_array_equal(s1[1], s3[1])
+        assert_equal(cv1.ca.samples_error, cv3.ca.samples_error)
+        assert_equal(cv1.ca.harvested, cv3.ca.harvested)
+        assert_equal(sorted(cv3.ca.harvested.keys()),
+                     ['clf.trained', 'dataset.nsamples', 'lastsplit',
+                      'result', 'splitinfo', 'transerror.clf.trained'])
+        assert_equal(cv3.ca.harvested['result'], list(res3.samples[:, 0]))
+        assert_equal(cv3.ca.harvested['splitinfo'][-1], list(res3.sa.cv_fold))
+        assert_equal(cv3.ca.harvested['lastsplit'][-1], True)
+        assert_equal(cv3.ca.harvested['dataset.nsamples'],
+                     [len(data)] * len(data.UC))
+        assert_equal(len(cv3.ca.transerrors), len(data.UC))
+        # last fold is done with the original transerror
+        ok_(cv3.ca.transerrors[-1] is cv3.transerror)
+        ok_(cv3.transerror.clf.trained)
+
+
+    @sweepargs(backend=('native', 'pprocess'))
+    def test_parallel_cv_random(self, backend):
+        if backend == 'pprocess' and not externals.exists('pprocess'):
+            return
+        data = get_mv_pattern(3)
+        cvs = []
+        for nproc in (1, 3):
+            cv = CrossValidatedTransferError(
+                    TransferError(RandomClassifier()),
+                    NFoldSplitter(cvtype=1),
+                    enable_ca=['confusion'], nproc=nproc, backend=backend)
+            np.random.seed(42)
+            results = cv(data)
+            cvs.append((cv, results, np.random.rand()))
+        (cv1, res1, r1), (cv3, res3, r3) = cvs
+        # stochastic classifiers give the same results serially and in
+        # parallel
+        assert_array_equal(res1.samples, res3.samples)
+        assert_array_equal(cv1.ca.confusion.matrix, cv3.ca.confusion.matrix)
+        # and the random state afterwards is the same too
+        assert_equal(r1, r3)
+        # different seeds give different results
+        np.random.seed(43)
+        ok_(np.any(cv1(data).samples != res1.samples))
+
 
 def suite():
     return unittest.makeSuite(CrossValidationTests)
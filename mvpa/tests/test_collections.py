@@ -54,6 +54,22 @@ def test_basic_collectable():
     assert_raises(ValueError, c._set_name, "_underscore")
 
 
+def test_collectable_version():
+    c = ArrayCollectable(np.arange(5))
+    v = c.version
+    # access does not change the version
+    c.value[2] = 10
+    assert_equal(c.version, v)
+    # but any assignment does
+    c.value = c.value
+    assert_true(c.version > v)
+    # slicing lazily does not count as modification
+    s = c.get_lazy_slice(slice(1, 3))
+    v = s.version
+    assert_array_equal(s.value, [1, 10])
+    assert_equal(s.version, v)
+
+
 def test_array_collectable():
     c = ArrayCollectable()
 
@@ -16,7 +16,8 @@ import numpy as np
 from mvpa.base import externals
 from mvpa.datasets.base import dataset_wizard
 from mvpa.datasets.miscfx import remove_invariant_features, coarsen_chunks, \
-        aggregate_features, SequenceStats
+        aggregate_features, SequenceStats, iter_permutations, \
+        get_permutations, permute_targets, get_nsamples_per_attr
 
 
 from mvpa.misc.data_generators import normal_feature_dataset
@@ -86,6 +87,42 @@ class MiscDatasetFxTests(unittest.TestCase):
             self.failUnless(np.all(ds.samples == ds_data),
                 msg="Function %s should have not modified original dataset" % f)
 
+    def test_permutations_generator(self):
+        chunks = np.array([2, 0, 1, 0, 2, 1, 1, 0, 2, 2])
+        perms = list(iter_permutations(chunks, npermutations=7, seed=3))
+        self.failUnlessEqual(len(perms), 7)
+        for perm in perms:
+            assert_array_equal(np.sort(perm), np.arange(len(chunks)))
+            assert_array_equal(chunks[perm], chunks)
+        # batches yield the same permutations given the same seed
+        batches = list(iter_permutations(chunks, npermutations=7,
+                                         batchsize=3, seed=3))
+        assert_equal([len(b) for b in batches], [3, 3, 1])
+        assert_array_equal(np.vstack(batches), get_permutations(chunks, 7,
+                                                                 seed=3))
+        # generator without a limit
+        gen = iter_permutations(nsamples=4, seed=1)
+        for i in xrange(100):
+            assert_array_equal(np.sort(gen.next()), np.arange(4))
+        self.failUnlessRaises(ValueError, iter_permutations().next)
+
+    def test_permute_targets(self):
+        ds = dataset_wizard(np.zeros((20, 1)), targets=range(5) * 4,
+                            chunks=np.repeat(range(4), 5))
+        orig = ds.targets.copy()
+        permute_targets(ds, assure_permute=True, seed=5)
+        ok_((ds.targets != orig).any())
+        for c in range(4):
+            assert_array_equal(np.sort(ds.targets[ds.chunks == c]),
+                               range(5))
+        ptargets = ds.targets.copy()
+        ds.targets = orig
+        permute_targets(ds, assure_permute=True, seed=5)
+        assert_array_equal(ds.targets, ptargets)
+        assert_equal(get_nsamples_per_attr(ds, 'chunks'),
+                     {0: 5, 1: 5, 2: 5, 3: 5})
+
+
     def test_sequence_stat(self):
         """Test sequence statistics
         """
@@ -381,6 +381,40 @@ def test_mergeds():
     assert_array_equal(merged.fa.one, [1]*5 + [0]*5)
 
 
+def test_stack_out():
+    dss = [Dataset(np.arange(i * 3, (i + 1) * 3)[None].T * np.ones((1, 2)),
+                   sa={'targets': ['a', 'bb', 'c'], 'run': [i] * 3},
+                   fa={'fid': [[i, 0], [i, 1]]})
+           for i in xrange(4)]
+    merged = vstack(dss)
+    assert_equal(merged.shape, (12, 2))
+    assert_array_equal(merged.samples[:, 0], np.arange(12))
+    assert_array_equal(merged.sa.run, np.repeat(range(4), 3))
+    # multidimensional feature attributes from the last dataset
+    assert_array_equal(merged.fa.fid, [[3, 0], [3, 1]])
+
+    # results can go straight into a memory-mapped file
+    tmpdir = tempfile.mkdtemp()
+    try:
+        out = np.memmap(os.path.join(tmpdir, 'stacked'), dtype='float32',
+                        mode='w+', shape=(3, 8))
+        merged = hstack(dss, out=out)
+        ok_(merged.samples is out)
+        assert_array_equal(merged.samples,
+                           np.hstack([ds.samples for ds in dss]))
+        assert_equal(merged.fa.fid.shape, (8, 2))
+        assert_array_equal(merged.fa.fid[:, 0], np.repeat(range(4), 2))
+        assert_array_equal(merged.sa.run, [3] * 3)
+        del merged, out
+    finally:
+        shutil.rmtree(tmpdir)
+
+    # wrong shape of the output array
+    assert_raises(ValueError, vstack, dss, out=np.empty((3, 8)))
+    # mismatching number of features
+    assert_raises(ValueError, vstack, (dss[0], dss[1][:, :1]))
+
+
 def test_mergeds2():
     """Test composition of new datasets by addition of existing ones
     """
@@ -475,6 +509,67 @@ def test_combined_samplesfeature_selection():
 
 
 
+def test_dataset_view():
+    data = dataset_wizard(np.arange(20).reshape((4, 5)).view(myarray),
+                          targets=[1, 2, 3, 4], chunks=[5, 6, 7, 8])
+    data.fa['ids'] = np.arange(5)
+
+    for sargs, fargs in (([0, 3], [1, 2]),
+                         (None, [4, 0]),
+                         (slice(1, 3), None),
+                         (np.array([True, False, True, True]), slice(2, 5)),
+                         (2, 3)):
+        view = data.get_view(samples=sargs, features=fargs)
+        if sargs is None:
+            sargs = slice(None)
+        if fargs is None:
+            fargs = slice(None)
+        sel = data[sargs, fargs]
+        ok_(view.__class__ is sel.__class__)
+        # attributes are not sliced until accessed
+        ok_(view.sa['targets']._pending is not None)
+        assert_equal(sorted(view.sa.keys()), sorted(sel.sa.keys()))
+        assert_equal(sorted(view.fa.keys()), sorted(sel.fa.keys()))
+        assert_array_equal(view.samples, sel.samples)
+        ok_(isinstance(view.samples, myarray))
+        assert_array_equal(view.targets, sel.targets)
+        ok_(view.sa['targets']._pending is None)
+        assert_array_equal(view.chunks, sel.chunks)
+        assert_array_equal(view.fa.ids, sel.fa.ids)
+        # views of views
+        view2 = view.get_view(features=[0])
+        assert_array_equal(view2.fa.ids, sel.fa.ids[[0]])
+        assert_array_equal(view2.samples, sel.samples[:, [0]])
+
+    # length checks work as usual
+    view = data.get_view(samples=[0, 1])
+    assert_raises(ValueError, view.sa.__setitem__, 'new', [1, 2, 3])
+    view.sa['new'] = [1, 2]
+    ok_(not 'new' in data.sa)
+
+    # dataset attributes are shared until reassigned
+    data.a['info'] = ['some']
+    view = data.get_view(features=[1, 3])
+    ok_(view.a.info is data.a.info)
+    view.a.info = ['other']
+    assert_array_equal(data.a.info, ['some'])
+
+    # mapper gets extended without altering the original one
+    data = dataset_wizard(np.arange(24).reshape((2, 3, 4)), targets=[1, 2])
+    orig_mapper = data.a.mapper
+    orig_repr = repr(orig_mapper)
+    view = data.get_view(features=[2, 3, 7])
+    sel = data[:, [2, 3, 7]]
+    ok_(data.a.mapper is orig_mapper)
+    assert_equal(repr(data.a.mapper), orig_repr)
+    assert_equal(repr(view.a.mapper), repr(sel.a.mapper))
+    assert_array_equal(view.a.mapper.reverse(view.samples),
+                       sel.a.mapper.reverse(sel.samples))
+    view2 = view.get_view(features=[0, 2])
+    assert_equal(repr(view2.a.mapper), repr(sel[:, [0, 2]].a.mapper))
+    assert_equal(repr(view.a.mapper), repr(sel.a.mapper))
+
+
 def test_labelpermutation_randomsampling():
     ds  = Dataset.from_wizard(np.ones((5, 1)),     targets=range(5), chunks=1)
     ds.append(Dataset.from_wizard(np.ones((5, 1)) + 1, targets=range(5), chunks=2))
@@ -14,9 +14,10 @@ import numpy as np
 from mvpa import pymvpa_dataroot
 from mvpa.base import externals
 from mvpa.datasets.eep import eep_dataset, EEPBin
+from mvpa.mappers.zscore import zscore
 
-from mvpa.testing.tools import assert_equal, assert_true, \
-     assert_array_almost_equal
+from mvpa.testing.tools import assert_equal, assert_true, assert_false, \
+     assert_array_equal, assert_array_almost_equal
 
 def test_eep_load():
     eb = EEPBin(os.path.join(pymvpa_dataroot, 'eep.bin'))
@@ -43,6 +44,40 @@ def test_eep_bin():
     assert_equal(eb.data.shape, (2, 32, 4))
 
 
+def test_eep_mmap():
+    fname = os.path.join(pymvpa_dataroot, 'eep.bin')
+    eb = EEPBin(fname)
+    ebm = EEPBin(fname, mmap=False)
+    assert_true(isinstance(eb.data, np.memmap))
+    assert_false(isinstance(ebm.data, np.memmap))
+    assert_array_equal(eb.data, ebm.data)
+    assert_equal(eb.props['offset'], ebm.props['offset'])
+
+    # selections
+    assert_array_equal(eb.get_data(), ebm.data)
+    assert_array_equal(eb.get_data(trials=[1]), ebm.data[[1]])
+    assert_array_equal(eb.get_data(channels=['Pz', 3]),
+                       ebm.data[:, [eb.channels.index('Pz'), 3]])
+    assert_array_equal(eb.get_data(trials=[1, 0], channels=[5, 2]),
+                       ebm.data[[1, 0]][:, [5, 2]])
+    assert_false(isinstance(eb.get_data(trials=[1]), np.memmap))
+
+    ds = eep_dataset(fname, targets=[3], trials=[1], channels=['Pz', 'Cz'])
+    assert_equal(ds.shape, (1, 8))
+    assert_equal(list(np.unique(ds.fa.channels)), ['Cz', 'Pz'])
+    full = eep_dataset(ebm, targets=[1, 3])
+    ids = np.concatenate([np.where(full.fa.channels == c)[0]
+                          for c in ('Pz', 'Cz')])
+    assert_array_equal(ds.samples, full.samples[1:, ids])
+    assert_array_equal(ds.fa.timepoints, full.fa.timepoints[ids])
+
+    # in-place modification of mapped samples must not touch the file
+    ds = eep_dataset(fname, targets=[1, 2])
+    zscore(ds, chunks_attr=None)
+    assert_array_almost_equal(ds.samples.mean(axis=0), 0)
+    assert_array_equal(EEPBin(fname).data, ebm.data)
+
+
     # XXX put me back whenever there is a proper resamples()
 #     def test_resampling(self):
 #         ds = eep_dataset(os.path.join(pymvpa_dataroot, 'eep.bin'),
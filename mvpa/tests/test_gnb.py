@@ -14,6 +14,7 @@ from mvpa.testing import *
 from mvpa.testing.datasets import *
 
 from mvpa.clfs.gnb import GNB
+from mvpa.clfs.base import DegenerateInputError
 
 class GNBTests(unittest.TestCase):
 
@@ -57,6 +58,59 @@ class GNBTests(unittest.TestCase):
                         d1 = np.sum(v, axis=1) - 1.0
                         self.failUnless(np.max(np.abs(d1)) < 1e-5)
 
+
+    def test_gnb_stats(self):
+        ds = datasets['uni4medium']
+        gnb = GNB(common_variance=False)
+        gnb.train(ds)
+        for i, l in enumerate(ds.UT):
+            samples = ds.samples[ds.targets == l]
+            assert_array_almost_equal(gnb.means[i], samples.mean(axis=0))
+            assert_array_almost_equal(gnb.variances[i], samples.var(axis=0))
+
+
+    @sweepargs(cv=(True, False))
+    def test_gnb_partial_train(self, cv):
+        ds = datasets['uni4medium']
+        gnb = GNB(common_variance=cv, enable_ca=['estimates'])
+        gnb.train(ds)
+        p = gnb.predict(ds.samples)
+        estimates = gnb.ca.estimates
+
+        # train chunk by chunk, new labels appearing as we go
+        pgnb = GNB(common_variance=cv, enable_ca=['estimates'])
+        order = np.argsort(ds.targets, kind='mergesort')
+        for ids in np.array_split(order, 5):
+            pgnb.partial_train(ds[ids])
+        assert_array_equal(pgnb.ulabels, gnb.ulabels)
+        assert_equal(pgnb.ca.trained_nsamples, ds.nsamples)
+        assert_array_almost_equal(pgnb.means, gnb.means)
+        assert_array_almost_equal(pgnb.variances, gnb.variances)
+        assert_array_almost_equal(pgnb.priors, gnb.priors)
+        assert_equal(pgnb.predict(ds.samples), p)
+        assert_array_almost_equal(pgnb.ca.estimates, estimates)
+        # same bookkeeping as for regular training
+        ok_(pgnb.ca.is_set('training_time'))
+        self.failUnlessRaises(DegenerateInputError, pgnb.partial_train, ds[:0])
+        assert_equal(pgnb.ca.trained_nsamples, ds.nsamples)
+
+        # regular training starts from scratch
+        pgnb.train(ds[:10])
+        assert_equal(pgnb.ca.trained_nsamples, 10)
+
+
+    def test_gnb_blocks(self):
+        ds_tr = datasets['uni2medium_train']
+        ds_te = datasets['uni2medium_test']
+        for ls in (True, False):
+            gnb = GNB(logprob=ls, enable_ca=['estimates'])
+            bgnb = GNB(logprob=ls, block_size=3, enable_ca=['estimates'])
+            gnb.train(ds_tr)
+            bgnb.train(ds_tr)
+            assert_equal(gnb.predict(ds_te.samples),
+                         bgnb.predict(ds_te.samples))
+            assert_array_equal(gnb.ca.estimates, bgnb.ca.estimates)
+
 def suite():
     return unittest.makeSuite(GNBTests)
 
@@ -11,6 +11,7 @@
 from mvpa.misc import data_generators
 from mvpa.kernels.np import GeneralizedLinearKernel
 from mvpa.clfs.gpr import GPR
+from mvpa.datasets.base import dataset_wizard
 
 from mvpa.testing import *
 from mvpa.testing.tools import assert_array_equal, assert_array_almost_equal
@@ -32,6 +33,25 @@ class GPRTests(unittest.TestCase):
     def test_linear(self):
         pass
 
+    def test_retrain_sparse_change(self):
+        if not __debug__:
+            return
+        dataset = dataset_wizard(np.random.normal(size=(100, 30)),
+                                 targets=np.random.normal(size=100))
+        active = debug.active[:]
+        # has to be enabled before the classifier gets created
+        debug.active += ['CHECK_RETRAIN']
+        try:
+            clf = GPR(GeneralizedLinearKernel(), retrainable=True)
+            clf.train(dataset)
+            clf.train(dataset)
+            # a single element is not part of the fingerprint, but the
+            # full comparison notices the change
+            dataset.samples[0, 1] += 1
+            self.failUnlessRaises(RuntimeError, clf.train, dataset)
+        finally:
+            debug.active = active
+
 
 def suite():
     return unittest.makeSuite(GPRTests)
@@ -20,7 +20,7 @@ import os
 import tempfile
 
 from mvpa.base.dataset import AttrDataset
-from mvpa.base.hdf5 import h5save, h5load, obj2hdf
+from mvpa.base.hdf5 import h5save, h5load, obj2hdf, HDF5Samples
 from mvpa.misc.data_generators import load_example_fmri_dataset
 from mvpa.mappers.fx import mean_sample
 
@@ -105,3 +105,50 @@ def test_function_ptrs():
     # to the right one
     assert_array_equal(ds_loaded.a.mapper.forward(fresh),
                         ds.samples)
+
+
+def test_dataset_layout():
+    ds = datasets['uni2small'].copy()
+    ds.sa['targets'].__doc__ = 'what to predict'
+    f = tempfile.NamedTemporaryFile()
+    h5save(f.name, ds, chunks='features', compression='gzip')
+    hdf = h5py.File(f.name, 'r')
+    # samples and each attribute go separately
+    assert_equal(hdf['samples'].shape, ds.shape)
+    assert_equal(hdf['samples'].chunks[0], len(ds))
+    assert_equal(sorted(hdf['sa'].keys()), sorted(ds.sa.keys()))
+    assert_equal(sorted(hdf['fa'].keys()), sorted(ds.fa.keys()))
+    hdf.close()
+
+    for lazy in (False, True):
+        ds2 = h5load(f.name, lazy=lazy)
+        assert_equal(ds2.__class__, ds.__class__)
+        assert_equal(isinstance(ds2.samples, HDF5Samples), lazy)
+        assert_array_equal(np.asarray(ds2), ds.samples)
+        assert_array_equal(ds2.targets, ds.targets)
+        assert_equal(ds2.sa['targets'].__doc__, 'what to predict')
+        assert_equal(sorted(ds2.a.keys()), sorted(ds.a.keys()))
+
+
+def test_lazy_selection():
+    ds = AttrDataset(np.arange(60).reshape((6, 10)),
+                     sa={'targets': range(6)}, fa={'ids': range(10)})
+    f = tempfile.NamedTemporaryFile()
+    h5save(f.name, ds, chunks=(2, 3))
+    lds = h5load(f.name, lazy=True)
+    assert_equal(lds.shape, ds.shape)
+    for sel in [(slice(None), [0, 3, 4]),
+                ([5, 1], slice(2, 8)),
+                ([4, 1, 1], [9, 0, 0, 5]),
+                (ds.sa.targets > 2, slice(None, None, -2)),
+                (slice(1, 4), ds.fa.ids % 2 == 0),
+                ([-1], [-2, 3])]:
+        assert_array_equal(lds[sel].samples, ds[sel].samples)
+        assert_array_equal(lds[sel].fa.ids, ds[sel].fa.ids)
+        assert_array_equal(lds[sel].sa.targets, ds[sel].sa.targets)
+    # and plain indexing of the samples
+    assert_array_equal(lds.samples[2], ds.samples[2])
+    assert_array_equal(lds.samples[:, 3], ds.samples[:, 3])
+    assert_array_equal(lds.samples[1:3, [7, 2]], ds.samples[1:3, [7, 2]])
+    # deep copies end up in memory
+    assert_true(isinstance(lds.copy().samples, np.ndarray))
@@ -15,10 +15,12 @@ from mvpa.testing.datasets import datasets
 from mvpa.datasets.base import Dataset
 from mvpa.featsel.ifs import IFS
 from mvpa.algorithms.cvtranserror import CrossValidatedTransferError
+from mvpa.clfs.gnb import GNB
 from mvpa.clfs.transerror import TransferError
 from mvpa.datasets.splitters import NFoldSplitter
-from mvpa.featsel.helpers import FixedNElementTailSelector
+from mvpa.featsel.helpers import FixedNElementTailSelector, NStepsStopCrit
 from mvpa.mappers.fx import mean_sample
+from mvpa.misc.neighborhood import CandidateSets
 
 
 
@@ -75,6 +77,50 @@ class IFSTests(unittest.TestCase):
         sdata, stdata = ifs(signal, signal)
         self.failUnless((sdata.samples[:,0] == signal.samples[:,0]).all())
 
+    def test_ifs_nproc(self):
+        # measure which prefers features with large values
+        measure = lambda ds: -np.abs(ds.samples[:, -1]).sum()
+        data = self.get_data()
+        # the last feature is not selected before others are exhausted
+        data.samples[:, -1] = 0
+        errors = iter(range(10, 0, -1))
+        terr = lambda test, train: errors.next()
+        kwargs = dict(stopping_criterion=NStepsStopCrit(3),
+                      feature_selector=FixedNElementTailSelector(
+                          1, tail='lower', mode='select'))
+        sdata, stdata = IFS(measure, terr, **kwargs)(data, data)
+
+        errors = iter(range(10, 0, -1))
+        psdata, pstdata = IFS(measure, terr, nproc=2, **kwargs)(data, data)
+        assert_array_equal(sdata.samples, psdata.samples)
+        assert_array_equal(stdata.samples, pstdata.samples)
+        self.failIf(np.all(sdata.samples[:, -1] == 0))
+
+
+    def test_ifs_batched(self):
+        data = self.get_data()
+        # cross-validated GNB evaluates all candidates at once
+        measure = CrossValidatedTransferError(
+            TransferError(GNB()), NFoldSplitter(cvtype=1),
+            postproc=mean_sample())
+        candidates = range(data.nfeatures)
+        batched = measure.call_batched(
+            data, CandidateSets([3], candidates, data.nfeatures))
+        self.failUnlessEqual(batched.shape, (1, data.nfeatures))
+        assert_array_almost_equal(
+            batched.samples[0],
+            [np.asscalar(measure(data[:, [3, c]])) for c in candidates])
+
+        terr = lambda test, train: 0
+        kwargs = dict(stopping_criterion=NStepsStopCrit(3),
+                      feature_selector=FixedNElementTailSelector(
+                          1, tail='lower', mode='select'))
+        sdata, stdata = IFS(measure, terr, **kwargs)(data, data)
+        # the plain function is evaluated per candidate
+        sdata_serial, stdata = IFS(lambda ds: measure(ds), terr,
+                                   **kwargs)(data, data)
+        assert_array_equal(sdata.samples, sdata_serial.samples)
+
 
 def suite():
     return unittest.makeSuite(IFSTests)
@@ -19,7 +19,11 @@ from mvpa.clfs.distance import squared_euclidean_distance, \
      pnorm_w, pnorm_w_python
 
 import mvpa.kernels.np as npK
-from mvpa.kernels.base import PrecomputedKernel, CachedKernel
+from mvpa.kernels.base import PrecomputedKernel, CachedKernel, \
+     precompute_kernels
+from mvpa.misc.state import ClassWithCollections
+from mvpa.misc.param import Parameter
+from mvpa.misc.sampleslookup import SamplesLookup
 try:
     import mvpa.kernels.sg as sgK
     _has_sg = True
@@ -164,6 +168,98 @@ class KernelTests(unittest.TestCase):
                         "CachedKernel did not recompute old data which had\n" +\
                         "previously been computed, but had the cache overriden")
 
+        # in-place modification of the cached samples gets noticed
+        d.samples *= 2
+        self.failIf(ck.is_cached(d))
+        ck.compute(d[d.sa.chunks == 0])
+        self.failUnless(ck._recomputed,
+                        "CachedKernel did not recompute modified data")
+
+    def test_precompute_kernels(self):
+        class KernelMachine(ClassWithCollections):
+            kernel = Parameter(None)
+        class Wrapper(object):
+            def __init__(self, clf):
+                self.clf = clf
+
+        d = Dataset(np.random.randn(40, 12))
+        d.sa.chunks = np.arange(40) % 4
+        train, test = d[d.sa.chunks > 0], d[d.sa.chunks == 0]
+        rk = npK.RbfKernel(sigma=1.5)
+        ck = CachedKernel(kernel=npK.RbfKernel(sigma=1.5))
+        # found behind an arbitrary chain of 'clf' attributes
+        res = precompute_kernels([Wrapper(KernelMachine(kernel=ck))],
+                                 [train, None, test])
+        self.failUnless(ck._recomputed)
+        # given datasets are left alone, their identified copies are cached
+        self.failIf('origids' in train.sa or 'magic_id' in train.a)
+        self.failIf(ck.is_cached(train))
+        self.failUnlessEqual(len(res), 3)
+        self.failUnless(res[1] is None)
+        train, test = res[0], res[2]
+        self.failUnless(ck.is_cached(train) and ck.is_cached(test))
+        self.failUnless(train.a.magic_id == test.a.magic_id)
+        # datasets which can be identified already are used as they are
+        self.failUnless(precompute_kernels([KernelMachine(kernel=ck)],
+                                           [train])[0] is train)
+
+        # nothing gets recomputed for the subsets
+        self.failIf(ck.precompute(train, test))
+        for ds1, ds2 in ((train, None), (train, test),
+                         (test[::2], train[3:9])):
+            ck.compute(ds1, ds2)
+            rk.compute(ds1, ds2)
+            self.failIf(ck._recomputed)
+            self.kernel_equiv(rk, ck)
+
+        # permuted targets do not matter
+        ptrain = train.copy(deep=False)
+        ptrain.sa['targets'] = np.random.permutation(train.nsamples)
+        self.failUnless(ck.is_cached(ptrain))
+
+        # but a changed feature set does
+        fstrain = train[:, :5]
+        self.failIf(ck.is_cached(fstrain))
+        # even if the number of features is the same
+        self.failIf(ck.is_cached(train[:, ::-1]))
+        ptrain.samples = ptrain.samples.copy()
+        ptrain.samples[-1, -1] += 1
+        self.failIf(ck.is_cached(ptrain))
+        ck.compute(fstrain)
+        rk.compute(fstrain)
+        self.failUnless(ck._recomputed)
+        self.kernel_equiv(rk, ck)
+
+
+    def test_samples_lookup(self):
+        # string origids, dense and sparse integer ones
+        for ids, unknown in ((None, 'unknown'),
+                             (np.arange(20)[::-1], 20),
+                             (np.arange(20)[::-1] * 3, 1)):
+            d = Dataset(np.random.randn(20, 3))
+            if ids is None:
+                d.init_origids('samples')
+            else:
+                d.sa['origids'] = ids
+            d.a['magic_id'] = 1234
+            lookup = SamplesLookup(d)
+            sel = [3, 0, 17, 3]
+            assert_array_equal(lookup(d), np.arange(20))
+            assert_array_equal(lookup(d[sel]), sel)
+            assert_array_equal(lookup(d[:0]), [])
+            # index is shared by lookups of the same origids
+            lookup2 = SamplesLookup(d)
+            self.failUnless(lookup2._inverse is lookup._inverse
+                            and lookup2._sorted is lookup._sorted)
+            # unknown or foreign samples
+            other = d[:2].copy()
+            other.sa.origids = np.array([d.sa.origids[0], unknown])
+            self.failUnlessRaises(KeyError, lookup, other)
+            other = d[:2].copy()
+            other.a.magic_id = 4321
+            self.failUnlessRaises(KeyError, lookup, other)
+
+
     if _has_sg:
         # Unit tests which require shogun kernels
         # Note - there is a loss of precision from double to float32 in SG
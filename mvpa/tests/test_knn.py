@@ -63,6 +63,42 @@ class KNNTests(unittest.TestCase):
         self.failUnless(clf.ca.distances.fa['chunks'] is train.sa['chunks'])
         self.failUnless(clf.ca.distances.fa.chunks is train.sa.chunks)
 
+
+    @sweepargs(voting=('majority', 'weighted'))
+    def test_knn_blocks(self, voting):
+        train = pure_multivariate_signal(40, 3)
+        test = pure_multivariate_signal(20, 3)
+
+        clf = kNN(k=7, voting=voting)
+        clf.train(train)
+        clf.ca.enable(['estimates', 'distances'])
+        p = clf.predict(test.samples)
+        estimates = clf.ca.estimates
+        distances = clf.ca.distances.samples
+
+        # same results when computed in small blocks
+        bclf = kNN(k=7, voting=voting, block_size=7)
+        bclf.train(train)
+        bclf.ca.enable(['estimates', 'distances'])
+        assert_equal(bclf.predict(test.samples), p)
+        assert_array_equal(bclf.ca.estimates, estimates)
+        assert_array_equal(bclf.ca.distances.samples, distances)
+
+        # and the same as looping over the sorted neighbors of each sample
+        vfx = getattr(clf, 'get_%s_vote' % voting)
+        knns = distances.argsort(axis=1)[:, :7]
+        for i, knn in enumerate(knns):
+            label, votes = vfx(knn)
+            assert_equal(label, p[i])
+            assert_array_equal(votes, estimates[i])
+        self.failUnless(isinstance(estimates, np.ndarray))
+        assert_equal(estimates.shape, (len(test), len(train.UT)))
+
+        # more neighbors than training samples
+        clf = kNN(k=500, voting=voting)
+        clf.train(train)
+        assert_equal(len(clf.predict(test.samples)), len(test))
+
 def suite():
     return unittest.makeSuite(KNNTests)
 
@@ -12,7 +12,7 @@ import os.path
 
 from mvpa.testing import *
 from mvpa import pymvpa_dataroot
-from mvpa.misc.io.meg import TuebingenMEG
+from mvpa.misc.io.meg import TuebingenMEG, _is_seekable
 
 class MEGTests(unittest.TestCase):
 
@@ -35,6 +35,80 @@ class MEGTests(unittest.TestCase):
         self.failUnless(meg.data[0, 1, 4] == -2.318207982e-14)
         self.failUnless(meg.data[3, 0, 808] == -4.30692876e-12)
 
+    def test_tuebingen_meg_channels(self):
+        if not externals.exists('gzip'):
+            return
+        import gzip
+        from StringIO import StringIO
+
+        fname = os.path.join(pymvpa_dataroot, 'tueb_meg.dat.gz')
+        meg = TuebingenMEG(fname)
+
+        # subset of channels is read in the order of the file
+        sub = TuebingenMEG(fname, channels=['EEG02', 'BG1'])
+        self.failUnlessEqual(sub.channelids, ['BG1', 'EEG02'])
+        assert_array_equal(sub.data, meg.data[:, [0, 2]])
+        assert_array_equal(sub.timepoints, meg.timepoints)
+
+        # file-like objects with and without seek()
+        lines = gzip.open(fname).readlines()
+        for source in (StringIO(''.join(lines)), iter(lines),
+                       gzip.open(fname)):
+            m = TuebingenMEG(source, channels=['MLC11'])
+            self.failUnlessEqual(m.channelids, ['MLC11'])
+            assert_array_equal(m.data, meg.data[:, [1]])
+
+
+    def test_meg_seekable(self):
+        if not externals.exists('gzip'):
+            return
+        import gzip
+        from StringIO import StringIO
+
+        class Pipe(StringIO):
+            """Provides seek(), but fails like a pipe"""
+            def tell(self):
+                raise IOError("Illegal seek")
+
+        fname = os.path.join(pymvpa_dataroot, 'tueb_meg.dat.gz')
+        self.failUnless(_is_seekable(StringIO('')))
+        # compressed files and pipes are read in a single pass
+        self.failIf(_is_seekable(gzip.open(fname)))
+        self.failIf(_is_seekable(Pipe('')))
+        self.failIf(_is_seekable(iter([])))
+        meg = TuebingenMEG(Pipe(gzip.open(fname).read()))
+        assert_array_equal(meg.data, TuebingenMEG(fname).data)
+
+
+    def test_tuebingen_meg_cache(self):
+        if not externals.exists('gzip'):
+            return
+        import shutil
+        import tempfile
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tempdir, 'meg.dat.gz')
+            shutil.copy(os.path.join(pymvpa_dataroot, 'tueb_meg.dat.gz'),
+                        fname)
+            # no cache for partial reads
+            TuebingenMEG(fname, channels=['BG1'], cache=True)
+            self.failIf(os.path.exists(fname + '.npz'))
+
+            meg = TuebingenMEG(fname, cache=True)
+            self.failUnless(os.path.exists(fname + '.npz'))
+            for channels in (None, ['MLC11']):
+                cached = TuebingenMEG(fname, channels=channels, cache=True)
+                ids = [meg.channelids.index(c)
+                       for c in (channels or meg.channelids)]
+                self.failUnlessEqual(cached.channelids,
+                                     [meg.channelids[i] for i in ids])
+                assert_array_equal(cached.data, meg.data[:, ids])
+                assert_array_equal(cached.timepoints, meg.timepoints)
+                self.failUnlessEqual(cached.samplingrate, meg.samplingrate)
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
 
 def suite():
     return unittest.makeSuite(MEGTests)
@@ -196,3 +196,115 @@ def test_query_engine():
     assert_array_equal(qe_lit(s_ind=(0, 0, 0), lit=['roi1', 'ro2']),
                        [0, 1, 3, 9, 27, 28, 30, 36])
 
+
+
+def test_query_engine_index():
+    # 3D mask with a hole and two "time" points
+    ind = np.transpose((np.ones((3, 4, 5)).nonzero()))[1:]
+    nind = len(ind)
+    ds = Dataset(np.zeros((2, 2 * nind)),
+                 fa={'s_ind': np.concatenate((ind, ind)),
+                     't_ind': np.repeat([0, 1], nind)})
+    for sphere in (ne.Sphere(1), ne.Sphere(2, element_sizes=(1, 2, 1.5))):
+        qe = ne.IndexQueryEngine(s_ind=sphere, t_ind=None)
+        qe.train(ds)
+        nbh = qe.compute_index()
+        assert_equal(len(nbh), ds.nfeatures)
+        ok_(nbh.fids.dtype == np.int32)
+        for fid in xrange(ds.nfeatures):
+            assert_array_equal(nbh[fid], qe[fid])
+        assert_array_equal(nbh.roisizes,
+                           [len(qe[fid]) for fid in xrange(ds.nfeatures)])
+
+    # subset of centers
+    nbh = qe.compute_index([3, 17], block_size=1)
+    assert_equal(len(nbh), 2)
+    assert_array_equal(nbh[17], qe[17])
+    assert_raises(IndexError, nbh.query_byid, 4)
+
+    # sequential fallback for multiple generators must give the same
+    qe2 = ne.IndexQueryEngine(s_ind=ne.Sphere(1), t_ind=ne.Sphere(0))
+    qe2.train(ds)
+    nbh2 = qe2.compute_index()
+    for fid in xrange(ds.nfeatures):
+        assert_array_equal(nbh2[fid], qe2[fid])
+
+    # can serve as a query engine for another dataset with the same features
+    nbh.train(ds)
+    assert_raises(ValueError, nbh.train, ds[:, :5])
+    # query by coordinates of the centers, in all spaces
+    assert_array_equal(nbh(s_ind=ds.fa.s_ind[17], t_ind=0), qe[17])
+    assert_raises(IndexError, nbh.query, s_ind=ds.fa.s_ind[4], t_ind=0)
+    assert_equal(nbh(s_ind=(0, 0, 0), t_ind=0), [])
+    assert_raises(ValueError, nbh.query, s_ind=(0, 0, 1))
+
+    # and survives pickling
+    import cPickle
+    nbh_ = cPickle.loads(cPickle.dumps(nbh))
+    assert_array_equal(nbh_.fids, nbh.fids)
+    assert_array_equal(nbh_[17], nbh[17])
+
+
+def test_sphere_templates():
+    # custom distance function is treated the same as a known one
+    s = ne.Sphere(2.5, element_sizes=(1, 2, 1.5))
+    sc = ne.Sphere(2.5, element_sizes=(1, 2, 1.5),
+                   distance_func=lambda a, b: cartesian_distance(a, b))
+    assert_array_equal(s((3, 3, 3)), sc((3, 3, 3)))
+    hs = ne.HollowSphere(3, 1, distance_func=manhatten_distance)
+    hsc = ne.HollowSphere(3, 1, distance_func=lambda a, b: sum(abs(a - b)))
+    assert_array_equal(hs((0, 0)), hsc((0, 0)))
+    ok_(not (0, 0) in hs((0, 0)))
+
+    # templates are shared among spheres with identical parameters
+    s2 = ne.Sphere(2.5, element_sizes=[1, 2, 1.5])
+    ok_(s._get_increments(3) is s2._get_increments(3))
+    ok_(not s._get_increments(3) is sc._get_increments(3))
+    ok_(not hs._get_increments(2) is ne.HollowSphere(3, 0.5,
+            distance_func=manhatten_distance)._get_increments(2))
+    # and they are read-only
+    assert_raises(ValueError, s._get_increments(3).__setitem__, 0, 1)
+
+
+def test_sphere_get_neighbors():
+    s = ne.Sphere(1)
+    centers = np.array([(0, 0, 0), (1, 1, 1), (2, 1, 0)])
+    coords, valid = s.get_neighbors(centers)
+    assert_equal(coords.shape, (3, 7, 3))
+    ok_(np.all(valid))
+    for c, cc in zip(centers, coords):
+        assert_array_equal(cc, s(tuple(c)))
+
+    coords, valid = s.get_neighbors(centers, extent=(3, 2, 2))
+    assert_array_equal(valid.sum(axis=1), [4, 5, 4])
+    for c, cc, v in zip(centers, coords, valid):
+        assert_array_equal(cc[v],
+                           [x for x in s(tuple(c))
+                            if min(x) >= 0 and x[0] < 3 and max(x[1:]) < 2])
+
+    assert_raises(ValueError, s.get_neighbors, (1, 1, 1))
+
+
+def test_neighborhood_index_subset():
+    ds = Dataset(np.zeros((1, 10)), fa={'ind': np.arange(10)})
+    qe = ne.IndexQueryEngine(ind=ne.Sphere(2))
+    qe.train(ds)
+    nbh = qe.compute_index()
+    ok_(nbh.compute_index() is nbh)
+    sub = nbh.compute_index([9, 0, 4])
+    assert_array_equal(sub.center_ids, [9, 0, 4])
+    assert_array_equal(sub.roisizes, [3, 3, 5])
+    for c in (9, 0, 4):
+        assert_array_equal(sub[c], qe[c])
+    assert_array_equal(sub.fids, np.concatenate([qe[c] for c in (9, 0, 4)]))
+    # and it can be subset again, but not beyond its centers
+    assert_array_equal(sub.compute_index([4])[4], qe[4])
+    assert_raises(IndexError, sub.compute_index, [1])
+    # query by coordinates of the centers
+    assert_array_equal(sub(ind=4), qe(ind=4))
+    assert_equal(sub(ind=20), [])
+    assert_raises(IndexError, sub, ind=1)
+    assert_raises(ValueError, sub, foo=4)
+    assert_raises(ValueError, ne.NeighborhoodIndex(sub.center_ids,
+                                                   sub.offsets, sub.fids,
+                                                   10), ind=4)
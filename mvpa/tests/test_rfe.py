@@ -14,16 +14,17 @@ from mvpa.datasets.splitters import NFoldSplitter
 from mvpa.algorithms.cvtranserror import CrossValidatedTransferError
 from mvpa.datasets.base import Dataset
 from mvpa.mappers.fx import maxofabs_sample, mean_sample
-from mvpa.featsel.rfe import RFE
+from mvpa.featsel.rfe import RFE, _compact_features
 from mvpa.featsel.base import \
      SensitivityBasedFeatureSelection, \
-     FeatureSelectionPipeline
+     FeatureSelectionPipeline, _get_working_dataset
 from mvpa.featsel.helpers import \
      NBackHistoryStopCrit, FractionTailSelector, FixedErrorThresholdStopCrit, \
      MultiStopCrit, NStepsStopCrit, \
      FixedNElementTailSelector, BestDetector, RangeElementSelector
 
 from mvpa.clfs.meta import FeatureSelectionClassifier, SplitClassifier
+from mvpa.clfs.smlr import SMLR
 from mvpa.clfs.transerror import TransferError
 from mvpa.misc.attrmap import AttributeMap
 from mvpa.clfs.stats import MCNullDist
@@ -351,6 +352,73 @@ class RFETests(unittest.TestCase):
         # use the same classifier
 
 
+    def test_compact_features(self):
+        samples = np.arange(20).reshape((4, 5))
+        buf = samples.copy().ravel()
+        ids = np.array([0, 2, 3])
+        compacted = _compact_features(buf, samples.shape, ids)
+        assert_array_equal(compacted, samples[:, ids])
+        self.failUnless(compacted.flags['C_CONTIGUOUS'])
+        # and once again
+        compacted = _compact_features(buf, compacted.shape, [1, 2])
+        assert_array_equal(compacted, samples[:, [2, 3]])
+
+
+    def test_working_dataset(self):
+        ds = datasets['3dsmall'].copy()
+        ds.init_origids('samples')
+        ids = np.array([1, 4, 5])
+        samples = ds.samples[:, ids]
+        wds = _get_working_dataset(ds, samples, ids)
+        sds = ds[:, ids]
+        self.failUnless(wds.samples is samples)
+        assert_array_equal(wds.fa.myspace, sds.fa.myspace)
+        assert_array_equal(wds.sa.origids, ds.sa.origids)
+        # feature selection is appended to the mapper, like with slicing
+        self.failIf(wds.a.mapper is ds.a.mapper)
+        self.failUnlessEqual(len(wds.a.mapper), len(sds.a.mapper))
+        assert_array_equal(wds.a.mapper.reverse1(wds.samples[0]),
+                           sds.a.mapper.reverse1(sds.samples[0]))
+        assert_array_equal(wds.a.mapper.forward1(ds.a.mapper.reverse1(
+                                ds.samples[0])),
+                           samples[0])
+
+
+    @sweepargs(warm_start=(False, True))
+    def test_rfe_smlr(self, warm_start):
+        clf = SMLR(lm=0.5)
+        rfe = RFE(clf.get_sensitivity_analyzer(postproc=maxofabs_sample()),
+                  TransferError(clf),
+                  feature_selector=FractionTailSelector(
+                      0.2, mode='discard', tail='lower'),
+                  train_clf=False,
+                  warm_start=warm_start,
+                  enable_ca=['selected_ids'])
+        wdata = self.get_data()
+        tdata = self.get_data_t()
+        wsamples = wdata.samples.copy()
+        sdata, stdata = rfe(wdata, tdata)
+
+        # original samples are not modified
+        assert_array_equal(wdata.samples, wsamples)
+
+        # the selected features are returned in original order along with
+        # their attributes
+        selected_ids = rfe.ca.selected_ids
+        assert_array_equal(sdata.samples, wdata.samples[:, selected_ids])
+        assert_array_equal(stdata.samples, tdata.samples[:, selected_ids])
+        assert_array_equal(sdata.fa.targets,
+                           wdata.fa.targets[selected_ids])
+
+        # features which were present at the best step are selected
+        best = np.argmin(rfe.ca.errors)
+        self.failUnlessEqual(len(selected_ids), rfe.ca.nfeatures[best])
+        self.failUnless(np.all(rfe.ca.history[selected_ids] >= best))
+        # each step got timed
+        self.failUnlessEqual(len(rfe.ca.steps_time), len(rfe.ca.errors))
+        self.failUnless(np.all(np.array(rfe.ca.steps_time) >= 0))
+
+
     def test_james_problem(self):
         percent = 80
         dataset = datasets['uni2small']
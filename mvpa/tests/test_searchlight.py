@@ -8,6 +8,8 @@
 ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 """Unit tests for PyMVPA searchlight algorithm"""
 
+import os
+
 from mvpa.testing import *
 from mvpa.testing.clfs import *
 from mvpa.testing.datasets import *
@@ -20,6 +22,9 @@ from mvpa.datasets.splitters import NFoldSplitter
 from mvpa.algorithms.cvtranserror import CrossValidatedTransferError
 from mvpa.clfs.transerror import TransferError
 from mvpa.clfs.gnb import GNB
+from mvpa.measures.anova import OneWayAnova
+from mvpa.mappers.fx import FxMapper
+from mvpa.base.dataset import hstack
 
 
 class SearchlightTests(unittest.TestCase):
@@ -42,12 +47,14 @@ class SearchlightTests(unittest.TestCase):
                 transerror,
                 NFoldSplitter(cvtype=1))
 
-        sls = [sphere_searchlight(cv, radius=1,
+        sls = [sphere_searchlight(cv, radius=1, nproc=1,
+                         enable_ca=['roisizes', 'raw_results']),
+               sphere_searchlight(cv, radius=1, nproc=3, backend='native',
                          enable_ca=['roisizes', 'raw_results'])]
 
         if externals.exists('pprocess'):
             sls += [sphere_searchlight(cv, radius=1,
-                         nproc=2,
+                         nproc=2, backend='pprocess',
                          enable_ca=['roisizes', 'raw_results'])]
 
         all_results = []
@@ -72,13 +79,136 @@ class SearchlightTests(unittest.TestCase):
             # check base-class state
             self.failUnlessEqual(sl.ca.raw_results.nfeatures, 106)
 
+        # GNB results are computed for all spheres at once, must be the
+        # same as for the separate ones
+        qe = IndexQueryEngine(voxel_indices=Sphere(1))
+        qe.train(self.dataset)
+        all_results.append(hstack([cv(self.dataset[:, qe[c]])
+                                   for c in xrange(106)]))
+
         if len(all_results) > 1:
             # if we had multiple searchlights, we can check either they all
             # gave the same result (they should have)
             aresults = np.array([a.samples for a in all_results])
-            dresults = np.abs(aresults - aresults.mean(axis=0))
+            dresults = np.abs(aresults - aresults[0])
             dmax = np.max(dresults)
             self.failUnlessEqual(dmax, 0.0)
+            self.failUnlessEqual(sls[0].ca.roisizes, sls[1].ca.roisizes)
+
+    def test_native_searchlight_failure(self):
+        # failure in a worker process must be reported in the parent
+        def failing_measure(ds):
+            if ds.nfeatures < 7:
+                raise ValueError("Too small ROI")
+            return Dataset([[ds.nfeatures]])
+
+        sl = sphere_searchlight(lambda ds: Dataset([[ds.nfeatures]]),
+                                radius=1, nproc=2, backend='native')
+        res = sl(self.dataset)
+        self.failUnlessEqual(res.shape, (1, 106))
+        roisizes = res.samples[0]
+        self.failUnlessEqual(roisizes.max(), 7)
+
+        # first ROI is fine, but some other one will fail
+        center_ids = [roisizes.argmax(), roisizes.argmin()]
+        sl = sphere_searchlight(failing_measure, radius=1, nproc=2,
+                                backend='native', center_ids=center_ids)
+        self.failUnlessRaises(RuntimeError, sl, self.dataset)
+
+        # all workers failing at once with tracebacks exceeding the pipe
+        # buffer must not block each other
+        parent = os.getpid()
+        def verbose_failure(ds):
+            if os.getpid() != parent:
+                raise ValueError("x" * 100000)
+            return Dataset([[ds.nfeatures]])
+        sl = sphere_searchlight(verbose_failure, radius=1, nproc=4,
+                                backend='native')
+        self.failUnlessRaises(RuntimeError, sl, self.dataset)
+
+
+    def test_native_searchlight_results(self):
+        ds = self.dataset
+        center_ids = range(0, 106, 5)
+        # per-feature results with feature attributes, and random numbers
+        def measure(roi):
+            return Dataset(roi.samples[:, :2] + np.random.normal(),
+                           fa={'fids': roi.fa.voxel_indices[:2, 0]})
+        serial = sphere_searchlight(measure, radius=1,
+                                    center_ids=center_ids)
+        native = sphere_searchlight(measure, radius=1, nproc=2,
+                                    backend='native', center_ids=center_ids)
+        # serial by default
+        self.failUnlessEqual(serial._Searchlight__nproc, None)
+        np.random.seed(1)
+        res_serial = serial(ds)
+        np.random.seed(1)
+        res_native = native(ds)
+        self.failUnlessEqual(res_native.shape, res_serial.shape)
+        assert_array_equal(res_native.fa.fids, res_serial.fa.fids)
+        # workers do not share the random numbers, but are reproducible
+        noise = (res_native.samples - res_serial.samples)[0, ::2]
+        self.failUnless(len(np.unique(noise.round(10))) > 2)
+        np.random.seed(1)
+        assert_array_equal(native(ds).samples, res_native.samples)
+
+
+    def test_batched_searchlight(self):
+        ds = self.dataset
+        anova = OneWayAnova()
+        sl = sphere_searchlight(anova, radius=1, center_ids=[3, 50, 7],
+                                enable_ca=['roisizes'])
+        res = sl(ds)
+        # must be identical to the per-ROI computation
+        qe = IndexQueryEngine(voxel_indices=Sphere(1))
+        qe.train(ds)
+        target = hstack([anova(ds[:, qe[c]]) for c in [3, 50, 7]])
+        assert_array_equal(res.samples, target.samples)
+        self.failUnlessEqual(sl.ca.roisizes, [len(qe[c]) for c in [3, 50, 7]])
+        if 'fprob' in target.fa:
+            assert_array_equal(res.fa.fprob, target.fa.fprob)
+
+        # precomputed index can be used directly as well
+        nbh = qe.compute_index()
+        sl = Searchlight(anova, nbh, center_ids=[3, 50, 7])
+        assert_array_equal(sl(ds).samples, target.samples)
+
+        # reductions across the features of each ROI
+        nbh = nbh.compute_index([3, 50, 7])
+        for fx in (np.mean, np.max):
+            manova = OneWayAnova(postproc=FxMapper('features', fx))
+            res = manova.call_batched(ds, nbh)
+            target = hstack([manova(ds[:, qe[c]]) for c in [3, 50, 7]])
+            self.failUnlessEqual(res.shape, (1, 3))
+            assert_array_almost_equal(res.samples, target.samples)
+            if 'fprob' in target.fa:
+                self.failUnlessEqual(list(res.fa.fprob),
+                                     list(target.fa.fprob))
+        # but no arbitrary post-processing
+        self.failUnless(OneWayAnova(postproc=FxMapper('features', np.median)
+                                    ).call_batched(ds, nbh) is None)
+
+        # GNB is trained on all features once
+        for cv in (CrossValidatedTransferError(TransferError(GNB()),
+                                               NFoldSplitter()),
+                   CrossValidatedTransferError(
+                       TransferError(GNB(logprob=False)), NFoldSplitter(),
+                       postproc=FxMapper('samples', np.mean))):
+            res = cv.call_batched(ds, nbh)
+            target = hstack([cv(ds[:, qe[c]]) for c in [3, 50, 7]])
+            assert_array_equal(res.samples, target.samples)
+            assert_array_equal(res.sa.cv_fold, target.sa.cv_fold)
+        # neither for other classifiers
+        self.failUnless(
+            CrossValidatedTransferError(TransferError(sample_clf_lin),
+                                        NFoldSplitter()).call_batched(ds, nbh)
+            is None)
+        # nor if results of each ROI have to be stored
+        cv = CrossValidatedTransferError(TransferError(GNB()),
+                                         NFoldSplitter(),
+                                         enable_ca=['confusion'])
+        self.failUnless(cv.call_batched(ds, nbh) is None)
+
 
     def test_partial_searchlight_with_full_report(self):
         # compute N-1 cross-validation for each sphere
@@ -67,6 +67,68 @@ class SMLRTests(unittest.TestCase):
         sens = clf.get_sensitivity_analyzer(force_training=False)()
         self.failUnless(sens.shape == (len(data.UT) - 1, data.nfeatures))
 
+    @sweepargs(impl=['C', 'Python'])
+    def test_smlr_path(self, impl):
+        data = normal_feature_dataset(perlabel=10, nlabels=3, nfeatures=6,
+                                      nonbogus_features=[0, 1, 2], snr=3)
+        lms = [1.0, 0.5, 0.1]
+        clf = SMLR(implementation=impl)
+        weights = clf.train_path(data, lms)
+        self.failUnlessEqual(len(weights), len(lms))
+        self.failUnlessEqual(clf.params.lm, lms[-1])
+        # the classifier ends up trained with the last lm
+        assert_array_equal(weights[-1], clf.weights)
+        # less penalty -- more non-zero weights
+        nonzero = [(w != 0).sum() for w in weights]
+        self.failUnless(nonzero[0] <= nonzero[-1])
+
+        # warm started solution has to be close to the cold one
+        cold = SMLR(implementation=impl, lm=lms[-1], convergence_tol=1e-5)
+        cold.train(data)
+        clf = SMLR(implementation=impl, convergence_tol=1e-5)
+        weights = clf.train_path(data, lms)
+        # up to the convergence of the cold start
+        self.failUnless(np.abs(weights[-1] - cold.weights).max()
+                        < 0.05 * np.abs(cold.weights).max())
+        assert_array_equal(clf.predict(data), cold.predict(data))
+
+        # callback gets the trained classifier
+        res = clf.train_path(data, lms, callback=lambda c: c.params.lm)
+        self.failUnlessEqual(res, lms)
+
+
+    def test_smlr_init_weights(self):
+        data = normal_feature_dataset(perlabel=10, nlabels=2, nfeatures=6,
+                                      nonbogus_features=[0, 1], snr=3)
+        clf = SMLR(convergence_tol=1e-5)
+        clf.train(data)
+        w = clf.weights.copy()
+
+        # starting from the solution gives the same solution
+        clf.set_init_weights()
+        clf.train(data)
+        assert_array_almost_equal(clf.weights, w, decimal=2)
+
+        # restricted to a subset of features
+        ids = [0, 1, 3]
+        clf.set_init_weights(feature_ids=ids)
+        clf.train(data[:, ids])
+        self.failUnlessEqual(clf.weights.shape, (len(ids), 2))
+
+        # non-matching weights get ignored
+        clf.set_init_weights(np.ones((2, 2)))
+        clf.train(data)
+        assert_array_almost_equal(clf.weights, w, decimal=2)
+
+        # warm start from the previous training
+        clf = SMLR(warm_start=True)
+        clf.train(data)
+        clf.train(data[2:])
+        self.failUnless(clf.trained)
+
+        # untrained classifier has nothing to offer
+        self.failUnlessRaises(RuntimeError, SMLR().set_init_weights)
+
 
 def suite():
     return unittest.makeSuite(SMLRTests)
@@ -408,6 +408,43 @@ class SplitterTests(unittest.TestCase):
             assert_true(s[1].samples.base is step_ds.samples)
 
 
+    def test_split_indices(self):
+        for spl in (NFoldSplitter(), OddEvenSplitter(), HalfSplitter(),
+                    NFoldSplitter(cvtype=2, discard_boundary=(1, 0)),
+                    NFoldSplitter(reverse=True), NoneSplitter()):
+            splits = list(spl(self.data))
+            indices = list(spl.split_indices(self.data))
+            assert_equal(len(splits), len(indices))
+            for split, idx in zip(splits, indices):
+                for ds, ids in zip(split, idx):
+                    if ds is None:
+                        ok_(ids is None)
+                    else:
+                        assert_array_equal(ds.samples,
+                                           self.data.samples[ids])
+
+        # ids are cached as long as the split attribute stays the same
+        spl = NFoldSplitter()
+        idx1 = list(spl.split_indices(self.data))
+        idx2 = list(spl.split_indices(self.data.copy()))
+        for i1, i2 in zip(idx1, idx2):
+            ok_(i1[0] is i2[0])
+            ok_(i1[1] is i2[1])
+        # but recomputed whenever it changes
+        ds = self.data.copy()
+        ds.sa.chunks = ds.sa.chunks[::-1]
+        idx3 = list(spl.split_indices(ds))
+        assert_array_equal(idx3[0][1], np.arange(90, 100))
+        # cached ids cannot be modified
+        self.failUnlessRaises(ValueError, idx3[0][1].__setitem__, 0, 1)
+
+        # string attributes work as well
+        ds.sa['literal'] = np.array(['a', 'b'])[ds.sa.chunks % 2]
+        idx = list(NFoldSplitter(attr='literal').split_indices(ds))
+        assert_equal(len(idx), 2)
+        assert_array_equal(idx[0][1], np.where(ds.sa.chunks % 2 == 0)[0])
+
+
 def suite():
     return unittest.makeSuite(SplitterTests)
 
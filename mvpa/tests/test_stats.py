@@ -13,8 +13,10 @@ from mvpa.testing.datasets import datasets
 
 from mvpa import cfg
 from mvpa.base import externals
-from mvpa.clfs.stats import MCNullDist, FixedNullDist, NullDist
+from mvpa.clfs.stats import MCNullDist, FixedNullDist, NullDist, \
+     Nonparametric
 from mvpa.datasets import Dataset
+from mvpa.datasets.miscfx import get_permutations
 from mvpa.measures.glm import GLM
 from mvpa.measures.anova import OneWayAnova, CompoundOneWayAnova
 from mvpa.misc.fx import double_gamma_hrf, single_gamma_hrf
@@ -77,6 +79,51 @@ class StatsTests(unittest.TestCase):
             self.failUnlessRaises(ValueError, null.p, [5, 3, 4])
 
 
+    def test_nonparametric(self):
+        samples = np.random.normal(size=(50, 7))
+        samples[3, 2] = samples[4, 2] # ties
+        x = np.random.normal(size=7)
+        x[2] = samples[3, 2]
+        x[5] = np.nan
+        expected = [(samples[:, i] <= v).mean() for i, v in enumerate(x)]
+        d = Nonparametric(samples, elementwise=True)
+        assert_array_equal(d.cdf(x), expected)
+        for i in xrange(len(x)):
+            assert_equal(Nonparametric(samples[:, i]).cdf(x[i]), expected[i])
+        self.failUnlessRaises(ValueError, d.cdf, x[:3])
+
+
+    def test_permutations(self):
+        chunks = np.array([2, 0, 1, 0, 2, 1, 1, 0, 2, 2])
+        perms = get_permutations(chunks, 20)
+        assert_equal(perms.shape, (20, len(chunks)))
+        for perm in perms:
+            # all samples are used, and only within their chunks
+            assert_array_equal(np.sort(perm), np.arange(len(chunks)))
+            assert_array_equal(chunks[perm], chunks)
+        # actually permuted
+        ok_(len(set([tuple(p) for p in perms])) > 1)
+        perms = get_permutations(None, 5, nsamples=4)
+        assert_equal(perms.shape, (5, 4))
+
+
+    def test_mcnulldist_nproc(self):
+        ds = datasets['uni2small']
+        dists = []
+        for nproc in (1, 2):
+            null = MCNullDist(permutations=10, chunks_attr='chunks',
+                              nproc=nproc, enable_ca=['dist_samples'])
+            # same permutations in both cases
+            np.random.seed(42)
+            null.fit(OneWayAnova(), ds)
+            dists.append(null)
+        assert_array_equal(dists[0].ca.dist_samples,
+                           dists[1].ca.dist_samples)
+        assert_equal(dists[0].ca.dist_samples.shape, (10, 1, ds.nfeatures))
+        x = np.random.normal(size=ds.nfeatures)
+        assert_array_equal(dists[0].p(x), dists[1].p(x))
+
+
     def test_anova(self):
         """Do some extended testing of OneWayAnova
 
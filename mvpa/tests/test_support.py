@@ -145,6 +145,27 @@ class SupportFxTests(unittest.TestCase):
         self.failUnless(a_2 != a_3, msg="Idhash must change after slicing")
 
 
+    def test_fingerprint(self):
+        a = np.random.normal(size=(300, 20))
+        fp = fingerprint(a)
+        self.failUnlessEqual(fp, fingerprint(a))
+        self.failIfEqual(fp, fingerprint(a.copy()))
+        self.failIfEqual(fp, fingerprint(a.T))
+        self.failIfEqual(fp, fingerprint(a, version=1))
+        # views of the same memory differ in their layout
+        self.failIfEqual(fingerprint(a[:, :10]), fingerprint(a[:, 10:]))
+        a[:] += 1
+        self.failIfEqual(fp, fingerprint(a))
+        # small arrays are hashed completely
+        b = np.arange(10)
+        fp = fingerprint(b)
+        b[3] = 100
+        self.failIfEqual(fp, fingerprint(b))
+        # everything else is handled by idhash
+        l = [1, 2]
+        self.failUnlessEqual(fingerprint(l), idhash(l))
+
+
     def test_asobjarray(self):
         for i in ([1, 2, 3], ['a', 2, '3'],
                   ('asd')):
@@ -160,6 +160,112 @@ class SVMTests(unittest.TestCase):
 
 
 
+    def test_libsvm_batch_prediction(self):
+        skip_if_no_external('libsvm')
+        from mvpa.clfs.libsvmc.svm import SVM
+        for svm_impl, kwargs, ds in (
+            ('C_SVC', {'probability': 1}, datasets['uni3small']),
+            ('NU_SVC', {}, datasets['uni2small']),
+            ('EPSILON_SVR', {}, datasets['chirp_linear'])):
+            regression = svm_impl == 'EPSILON_SVR'
+            clf = SVM(svm_impl=svm_impl,
+                      enable_ca=['estimates', 'probabilities'], **kwargs)
+            clf.train(ds)
+            model = clf.model
+            samples = ds.samples.astype(float)
+            labels, values, probs = model.predict_batch(
+                samples, probability=model.probability)
+            # identical to predictions of the single samples
+            assert_array_equal(labels, [model.predict(s) for s in samples])
+            assert_array_almost_equal(
+                values, [model.predict_values_raw(s) for s in samples])
+            if probs is None:
+                ok_(not model.probability)
+            else:
+                assert_array_almost_equal(
+                    probs, [[model.predict_probability(s)[1][l]
+                             for l in model.labels] for s in samples])
+                assert_array_almost_equal(probs.sum(axis=1), 1)
+            # and the classifier reports them consistently
+            predictions = clf.predict(ds)
+            assert_equal(len(clf.ca.estimates), len(ds))
+            estimates = clf.ca.estimates
+            if regression:
+                assert_array_almost_equal(predictions, estimates)
+            elif len(model.labels) > 2:
+                assert_equal(estimates[0], model.predict_values(samples[0]))
+            else:
+                # sign of the binary estimates is aligned with the targets
+                assert_array_equal(np.asarray(estimates) > 0,
+                                   np.asarray(predictions)
+                                   == clf.ca.trained_targets[1])
+                if kwargs.get('probability'):
+                    assert_equal(len(clf.ca.probabilities), len(ds))
+        self.failUnlessRaises(TypeError, model.predict_batch, samples,
+                              probability=True)
+
+
+    def test_libsvm_dense_problem(self):
+        skip_if_no_external('libsvm')
+        from mvpa.clfs.libsvmc import _svm
+        from mvpa.clfs.libsvmc.svm import SVM
+        from mvpa.kernels.base import precompute_kernels
+        ds = datasets['uni2small'].copy()
+        samples = ds.samples.astype(float)
+        labels = (ds.targets == ds.targets[0]).astype(float)
+        # dense problem is identical to the one converted sample by sample
+        param = _svm.SVMParameter(kernel_type=_svm.LINEAR)
+        sparse = _svm.SVMModel(_svm.SVMProblem(labels, list(samples)), param)
+        dense = _svm.SVMModel(_svm.SVMProblem(labels, samples), param)
+        assert_array_almost_equal(sparse.get_sv(), dense.get_sv())
+        assert_array_almost_equal(sparse.get_sv_coef(), dense.get_sv_coef())
+        # and can be setup for any subset of the same nodes
+        nodes = _svm.SVMNodes(samples)
+        rows = np.arange(1, len(ds), 2)
+        subset = _svm.SVMModel(
+            _svm.SVMProblem(labels[rows], None, nodes=nodes, rows=rows), param)
+        direct = _svm.SVMModel(_svm.SVMProblem(labels[rows], samples[rows]),
+                               param)
+        assert_array_almost_equal(subset.get_sv(), direct.get_sv())
+        assert_array_almost_equal(subset.get_rho(), direct.get_rho())
+        self.failUnlessRaises(ValueError, _svm.SVMProblem, labels[:3], None,
+                              nodes=nodes, rows=rows)
+        self.failUnlessRaises(IndexError, nodes.matrix, [len(ds)])
+
+        # classifier converts the samples once for all folds
+        clf = SVM()
+        ds = precompute_kernels([clf], [ds])[0]
+        predictions = []
+        cached = None
+        for fold in (ds[ds.chunks != 0], ds[ds.chunks != 1]):
+            clf.train(fold)
+            if cached is None:
+                cached = clf.model.prob.nodes
+            ok_(clf.model.prob.nodes is cached)
+            assert_equal(cached.nsamples, len(ds))
+            predictions.append(clf.predict(ds))
+        # untraining releases them
+        clf.untrain()
+        self.failUnlessRaises(KeyError, clf._lookup_nodes, ds)
+        # same results without any caching, where nodes are not kept
+        for fold, p in zip((ds[ds.chunks != 0], ds[ds.chunks != 1]),
+                           predictions):
+            clf.train(fold)
+            ok_(not clf.model.prob.nodes is cached)
+            assert_equal(clf.model.prob.nodes.nsamples, len(fold))
+            assert_array_equal(clf.predict(ds), p)
+            self.failUnlessRaises(KeyError, clf._lookup_nodes, fold)
+        # nodes are not reused after features were changed
+        clf.precompute_samples(ds)
+        clf.train(ds[:, :2])
+        assert_equal(clf.model.prob.nodes.nfeatures, 2)
+        # even if their number is the same
+        self.failUnlessRaises(KeyError, clf._lookup_nodes, ds[:, ::-1])
+        assert_array_equal(clf._lookup_nodes(ds[::2]),
+                           np.arange(0, len(ds), 2))
+        clf.precompute_samples()
+
+
     def test_sillyness(self):
         """Test if we raise exceptions on incorrect specifications
         """
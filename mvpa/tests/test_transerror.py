@@ -133,6 +133,44 @@ class ErrorsTests(unittest.TestCase):
             self.failUnless(l in s)
 
 
+    def test_confusion_matrix_incremental(self):
+        reg = [1,1,1,2,2,2,3,3,3]
+        regl = [1,2,1,2,2,2,3,2,1]
+        cm_sets = ConfusionMatrix(sets=[(reg, regl), (regl, reg)])
+        cm = ConfusionMatrix()
+        cm.add(reg, regl)
+        self.failUnless((cm.matrix == [[2,0,1],[1,3,1],[0,0,1]]).all())
+        # labels unseen so far extend the matrix
+        cm.add(regl + [4], reg + [4])
+        self.failUnlessEqual(cm.labels, [1, 2, 3, 4])
+        self.failUnless((cm.matrix[:3, :3] == cm_sets.matrix).all())
+        self.failUnlessEqual(cm.matrix[3, 3], 1)
+        # copies keep their own counts
+        cm_copy = copy(cm)
+        cm.add([1], [1])
+        self.failUnlessEqual(cm.matrix[0, 0], 5)
+        self.failUnlessEqual(cm_copy.matrix[0, 0], 4)
+        # reset forgets the counts but, as before, not the labels seen
+        cm.reset()
+        cm.add([1, 2], [1, 1])
+        self.failUnlessEqual(cm.labels, [1, 2, 3, 4])
+        self.failUnlessEqual(cm.matrix.sum(), 2)
+        self.failUnless((cm.matrix[0, :2] == [1, 1]).all())
+
+
+    def test_rank_aucs(self):
+        from mvpa.clfs.transerror import _rank_aucs
+        targets = np.array([1, 0, 1, 0, 1, 0], dtype=bool)[:, None]
+        # a tie between a positive and a negative counts half
+        estimates = np.array([3., 1., 2., 2., 0., 5.])[:, None]
+        aucs = _rank_aucs(targets, estimates,
+                          np.array([0, 0, 0, 0, 1, 1]), 3)
+        self.failUnlessEqual(aucs.shape, (3, 1))
+        self.failUnlessAlmostEqual(aucs[0, 0], 3.5 / 4)
+        self.failUnlessAlmostEqual(aucs[1, 0], 0.)
+        self.failUnless(np.isnan(aucs[2, 0]))
+
+
 
     @sweepargs(l_clf=clfswh['linear', 'svm'])
     def test_confusion_based_error(self, l_clf):
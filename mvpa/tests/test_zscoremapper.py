@@ -125,3 +125,70 @@ def test_zscore():
     zm = ZScoreMapper(params={0: (2,1), 1: (12,1)})
     zm.train(ds)                        # train
     assert_array_almost_equal(zm.forward(ds), np.transpose([check + check]))
+
+
+def test_zscore_blocks():
+    ds = datasets['uni4medium'].copy()
+    ds.samples += 10
+    ref = ZScoreMapper()
+    ref.train(ds)
+    refds = ref.forward(ds)
+    # regular numpy estimates
+    for c in ds.sa['chunks'].unique:
+        ids = ds.chunks == c
+        assert_array_almost_equal(refds.samples[ids],
+                                  (ds.samples[ids] - ds.samples[ids].mean(0))
+                                  / ds.samples[ids].std(0))
+
+    # float samples are not modified
+    ok_(not np.all(refds.samples == ds.samples))
+
+    # blockwise, in parallel, and from chunks presented one after another
+    for kwargs in (dict(block_size=3), dict(nproc=2),
+                   dict(block_size=2, nproc=3)):
+        zm = ZScoreMapper(**kwargs)
+        zm.train(ds)
+        assert_array_almost_equal(zm.forward(ds), refds)
+
+        zm = ZScoreMapper(**kwargs)
+        ids = np.arange(len(ds))
+        np.random.shuffle(ids)
+        # multiple portions per chunk
+        for part in np.array_split(ids, 4):
+            zm.partial_train(ds[np.sort(part)])
+        assert_array_almost_equal(zm.forward(ds), refds)
+
+    # global estimates
+    zm = ZScoreMapper(chunks_attr=None, block_size=5, nproc=2)
+    zm.train(ds)
+    assert_array_almost_equal(zm.forward(ds.samples),
+                              (ds.samples - ds.samples.mean(0))
+                              / ds.samples.std(0))
+
+
+def test_zscore_readonly():
+    ds = datasets['uni4medium'].copy()
+    ds.samples += 10
+    ref = ZScoreMapper()
+    ref.train(ds)
+    refds = ref.forward(ds)
+    # interleaved chunks are Z-scored through non-contiguous ids
+    ids = np.argsort(np.arange(len(ds)) % 4)
+    for order in (np.arange(len(ds)), ids):
+        sds = ds[order]
+        sds.samples.flags.writeable = False
+        zscore(sds)
+        assert_array_almost_equal(sds.samples, refds.samples[order])
+
+    if not externals.exists('h5py'):
+        return
+    import tempfile
+    from mvpa.base.hdf5 import h5save, h5load, HDF5Samples
+    for order in (np.arange(len(ds)), ids):
+        f = tempfile.NamedTemporaryFile()
+        h5save(f.name, ds[order])
+        lds = h5load(f.name, lazy=True)
+        ok_(isinstance(lds.samples, HDF5Samples))
+        zscore(lds, chunks_attr='chunks')
+        ok_(isinstance(lds.samples, np.ndarray))
+        assert_array_almost_equal(lds.samples, refds.samples[order])